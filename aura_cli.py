@@ -0,0 +1,221 @@
+"""
+Aura Downloader Pro — headless command line.
+
+Downloads every URL given on the command line, in a file or on stdin with the
+same engine as the GUI, and prints one JSON object per line for each event:
+
+    python aura_cli.py -i urls.txt -o ./downloads -j 4
+    tail -f urls.txt | python aura_cli.py -i - --limit 5M
+    python aura_cli.py -i urls.txt --rate 1M --host-rate cdn.example.com=4M
+    python aura_cli.py -o /mnt/nas --write-buffer 64 --fsync end URL
+
+A line of a URL list may follow the URL with mirrors of the same file and
+its checksum ("https://a/file.iso https://b/file.iso sha256:9f86d0...");
+ranges are then spread over the mirrors, and a file that doesn't match fails.
+A "rate=2M" token caps that line's download, overriding --rate. A URL.sha256
+sidecar published next to a direct file is checked like a given checksum
+(with --hash md5, a URL.md5 one too). With --hash, finished direct downloads
+report their digests.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from aura_engine import (CHECKSUM_ALGORITHMS, DownloadEngine, FSYNC_POLICIES, FSYNC_POLICY, MAX_CONCURRENT_DL,
+                         WRITE_BEHIND_BYTES, YTDLP_DEFAULT_FORMAT, clean_url, is_direct_file_url, is_manifest_url,
+                         is_url)
+
+PROGRESS_INTERVAL = 1.0   # Default seconds between progress lines per download
+
+
+def parse_rate(text):
+    """Parse a rate such as '500K', '2M' or '1.5G' (bytes/s). None or '0' means unlimited."""
+    if not text:
+        return None
+    text = text.strip().upper().rstrip('/S').rstrip('B')
+    scale = 1
+    if text and text[-1] in 'KMG':
+        scale = 1024 ** ('KMG'.index(text[-1]) + 1)
+        text = text[:-1]
+    rate = int(float(text) * scale)
+    return rate or None
+
+
+def parse_host_rate(text):
+    """Parse 'HOST=RATE' into (host, bytes/s)."""
+    host, sep, rate = text.partition('=')
+    if not sep or not host.strip():
+        raise ValueError(text)
+    return host.strip().lower(), parse_rate(rate)
+
+
+def read_urls(stream):
+    """Yield URLs from a text stream as they arrive, skipping blanks and # comments."""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def read_url_file(path):
+    with open(path, encoding='utf-8') as f:
+        yield from read_urls(f)
+
+
+class JsonReporter:
+    """Engine listener printing JSON lines; progress is throttled per download."""
+
+    def __init__(self, out=sys.stdout, interval=PROGRESS_INTERVAL):
+        self.out = out
+        self.interval = interval
+        self.counts = {"complete": 0, "failed": 0, "cancelled": 0}
+        self._lock = threading.Lock()
+        self._last_progress = {}
+        self._active = {}          # Task id -> task not finished yet; dropped on its final event
+
+    def track(self, task):
+        """Hold on to a submitted task until it completes, fails or is cancelled."""
+        with self._lock:
+            if task.state not in self.counts:
+                self._active[task.id] = task
+
+    def in_flight(self):
+        with self._lock:
+            return list(self._active.values())
+
+    def emit(self, record):
+        record.setdefault('time', round(time.time(), 3))
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def __call__(self, task, event):
+        if event == "progress":
+            now = time.monotonic()
+            if now - self._last_progress.get(task.id, 0.0) < self.interval:
+                return
+            self._last_progress[task.id] = now
+        elif event in self.counts:
+            self._last_progress.pop(task.id, None)
+            with self._lock:
+                self.counts[event] += 1
+                self._active.pop(task.id, None)
+        record = {'event': event}
+        record.update(task.to_dict())
+        self.emit(record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download URLs without the GUI, reporting JSON lines.")
+    parser.add_argument('urls', nargs='*', help="URLs to download")
+    parser.add_argument('-i', '--input', help="File with one URL per line ('-' reads stdin until EOF)")
+    parser.add_argument('-o', '--output', help="Download directory (default: ~/Downloads)")
+    parser.add_argument('-j', '--jobs', type=int, default=MAX_CONCURRENT_DL, help="Downloads running at once")
+    parser.add_argument('--limit', help="Global speed limit, e.g. 500K, 2M (default: unlimited)")
+    parser.add_argument('--rate', help="Speed limit for each download, e.g. 1M (default: unlimited)")
+    parser.add_argument('--host-rate', action='append', default=[], metavar='HOST=RATE',
+                        help="Speed limit shared by downloads from HOST, e.g. cdn.example.com=2M (repeatable)")
+    parser.add_argument('--standard', action='store_true', help="Single connection for direct files")
+    parser.add_argument('--format', default=YTDLP_DEFAULT_FORMAT, help="yt-dlp format for non-file URLs")
+    parser.add_argument('--mp3', action='store_true', help="Extract MP3 audio from non-file URLs (needs ffmpeg)")
+    parser.add_argument('--interval', type=float, default=PROGRESS_INTERVAL,
+                        help="Seconds between progress lines per download")
+    parser.add_argument('--hash', action='append', default=[], choices=sorted(set(CHECKSUM_ALGORITHMS.values())),
+                        help="Digest every direct download with this algorithm and also look for a "
+                             "URL.<algorithm> sidecar (repeatable; default: only expected checksums and URL.sha256)")
+    parser.add_argument('--no-sidecar', action='store_true',
+                        help="Don't look for sidecar checksum files such as URL.sha256 next to direct URLs")
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default=FSYNC_POLICY,
+                        help="When chunked downloads are synced to disk (default: %(default)s)")
+    parser.add_argument('--write-buffer', type=int, default=WRITE_BEHIND_BYTES // (1024 * 1024),
+                        help="MB of received data a download may hold for a slow disk (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        rate = parse_rate(args.limit)
+    except ValueError:
+        parser.error(f"invalid --limit: {args.limit}")
+    try:
+        task_rate = parse_rate(args.rate)
+    except ValueError:
+        parser.error(f"invalid --rate: {args.rate}")
+    try:
+        host_rates = [parse_host_rate(value) for value in args.host_rate]
+    except ValueError as e:
+        parser.error(f"invalid --host-rate: {e}")
+
+    reporter = JsonReporter(interval=args.interval)
+    engine = DownloadEngine(args.output, max_active=max(1, args.jobs), listener=reporter)
+    engine.set_speed_limit(rate)
+    for host, host_rate in host_rates:
+        engine.set_host_speed_limit(host, host_rate)
+    engine.hash_algorithms = tuple(dict.fromkeys(args.hash))
+    engine.verify_sidecars = not args.no_sidecar
+    engine.fsync = args.fsync
+    engine.write_buffer = max(1, args.write_buffer) * 1024 * 1024
+
+    def submit(line):
+        url, *extra = line.split()
+        mirrors = [token for token in extra if is_url(token)]
+        options = [token for token in extra if not is_url(token)]
+        rates = [token[5:] for token in options if token.lower().startswith('rate=')]
+        checksum = next((token for token in options if not token.lower().startswith('rate=')), None)
+        if not is_url(url):
+            reporter.emit({'event': 'skipped', 'url': url, 'error': "not an http(s) URL"})
+            return None
+        url = clean_url(url)
+        try:
+            line_rate = parse_rate(rates[-1]) if rates else task_rate
+            if is_manifest_url(url):
+                task = engine.submit_stream(url, checksum=checksum)
+            elif is_direct_file_url(url):
+                task = engine.submit_direct(url, chunked=not args.standard, checksum=checksum, mirrors=mirrors)
+            else:
+                task = engine.submit_ytdlp(url, args.format, is_mp3=args.mp3)
+        except ValueError as e:
+            reporter.emit({'event': 'skipped', 'url': url, 'error': str(e)})
+            return None
+        task.set_rate_limit(line_rate)
+        return task
+
+    sources = [iter(args.urls)]
+    if args.input == '-':
+        sources.append(read_urls(sys.stdin))
+    elif args.input:
+        sources.append(read_url_file(args.input))
+    elif not args.urls and not sys.stdin.isatty():
+        sources.append(read_urls(sys.stdin))
+
+    started = time.time()
+    submitted = 0
+    interrupted = False
+    try:
+        for source in sources:
+            for url in source:
+                task = submit(url)
+                if task:
+                    reporter.track(task)
+                    submitted += 1
+        while not engine.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        interrupted = True
+        # Direct downloads keep their partial file and journal, so running this again resumes them
+        for task in reporter.in_flight():
+            task.cancel()
+        engine.wait()
+    finally:
+        engine.close()
+
+    reporter.emit({'event': 'summary', 'total': submitted, **reporter.counts,
+                   'elapsed': round(time.time() - started, 3)})
+    if interrupted:
+        return 130
+    return 0 if reporter.counts["complete"] == submitted else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4359 @@
+"""
+Aura download engine — everything that runs without a window.
+URL helpers, the chunked downloader, the scheduler and the yt-dlp glue live
+here so the GUI (main.py) and the command line (aura_cli.py) share one engine.
+yt-dlp is imported on first use only.
+"""
+import os
+import threading
+import re
+import urllib.parse
+import time
+import json
+import random
+import email.utils
+import hashlib
+import copy
+import http.cookies
+import shutil
+import subprocess
+import math
+import socket
+import zlib
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# ==============================================================================
+#  CONSTANTS
+# ==============================================================================
+CHUNK_COUNT = 8           # Starting number of parallel connections for accelerated downloads
+MAX_CONNECTIONS = 32      # Upper bound when connections are tuned per host
+HOST_CONNECTIONS = MAX_CONNECTIONS  # Connections all downloads from one host may share
+PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW = 0, 1, 2  # Queue priorities (lower runs first)
+MAX_CONCURRENT_DL = 3     # Max concurrent downloads in the queue
+GLOBAL_CONNECTIONS = 64   # Connection budget shared by all active downloads
+SPEED_SAMPLE_INTERVAL = 0.25  # Seconds between throughput samples of a direct download
+SPEED_EWMA_ALPHA = 0.3        # Weight of the newest sample in the smoothed speed
+JOURNAL_SUFFIX = ".aura"  # Sidecar progress journal kept next to partial downloads
+JOURNAL_INTERVAL = 2.0    # Seconds between journal checkpoints per chunk
+MIN_SEGMENT_SIZE = 1024 * 1024  # Smallest range an idle connection will split off and steal
+POOL_MAX_HOSTS = 32       # Hosts whose keep-alive connections are kept warm at once
+POOL_PER_HOST = MAX_CONNECTIONS  # Idle keep-alive connections kept per host
+MAX_RETRIES = 5           # Retries per segment before the download fails
+RETRY_BACKOFF_BASE = 1.0  # Seconds before the first retry (doubles every attempt)
+RETRY_BACKOFF_MAX = 30.0  # Upper bound for the exponential backoff
+TUNE_INTERVAL = 3.0       # Seconds between connection-count tuning steps
+TUNE_MIN_GAIN = 0.10      # Extra connections must add at least 10% throughput to be kept
+RATE_BURST_SECONDS = 0.1  # Token-bucket depth, in seconds of the rate limit
+SEGMENT_WORKERS = 8       # Segments of an HLS / DASH stream fetched at once
+SEGMENT_WINDOW = 32       # Segments fetched ahead of the writer (bounds the reorder buffer)
+POSTPROCESS_WORKERS = os.cpu_count() or 2  # ffmpeg jobs (merges, MP3) run at once, apart from the download slots
+MP3_BITRATE = "192k"      # Bitrate of MP3 conversions
+HASH_PIECE_SIZE = 8 * 1024 * 1024  # Piece size of hashed downloads: pieces go out in file order so the hash keeps up
+CHECKSUM_SIDECAR_MAX = 64 * 1024   # Largest .sha256 (.md5, ...) sidecar file worth reading
+HASH_ALGORITHMS = ()               # Digests computed for every direct download, e.g. ('sha256',); opt-in
+RECV_BUFFER_SIZE = 256 * 1024  # Bytes read from a socket at once, into a pooled buffer (<= MIN_SEGMENT_SIZE: see _read_range)
+RECV_BUFFER_COUNT = 256        # Receive buffers shared by every connection and write-behind queue (64 MB at most)
+WRITE_BEHIND_BYTES = 16 * 1024 * 1024  # Received data a download may queue for its disk writer before reads wait
+WRITE_BATCH_MAX = 512          # Buffers coalesced into one pwritev() call
+FSYNC_POLICIES = ('none', 'end', 'periodic')
+FSYNC_POLICY = 'periodic'      # 'periodic': fsync before every journal checkpoint; 'end': once at the end; 'none': never
+FSYNC_BYTES = 32 * 1024 * 1024  # 'periodic' also syncs after this much, so the final sync stays short
+MIRROR_MAX_FAILURES = 3       # Failed requests in a row before a mirror is dropped
+MIRROR_SLOW_FRACTION = 0.25   # A mirror slower per connection than this share of the best one is dropped
+MIRROR_MIN_SAMPLES = 4        # Speed samples a mirror needs before it can be judged too slow
+PREFETCH_WORKERS = 4      # Links resolved in the background at once
+PREFETCH_MAX_LINKS = 500  # Resolved links kept in memory (least recently used are dropped)
+INFO_CACHE_MAX_ENTRIES = 200  # yt-dlp info dicts kept on disk (least recently used are evicted)
+INFO_CACHE_TTL = 3 * 3600     # Seconds a cached info dict is trusted (stream URLs expire after a few hours)
+DOWNLOAD_CACHE_MAX_ENTRIES = 5000  # Finished downloads remembered for conditional re-downloads
+YTDLP_DEFAULT_FORMAT = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"  # Smart-download format
+
+# Known direct-download file extensions
+DIRECT_FILE_EXTENSIONS = {
+    '.exe', '.msi', '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz',
+    '.iso', '.img', '.dmg',
+    '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm',
+    '.mp3', '.flac', '.wav', '.aac', '.ogg',
+    '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx',
+    '.apk', '.deb', '.rpm', '.appimage',
+    '.bin', '.dat', '.torrent',
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp', '.ico', '.tiff',
+}
+
+# Streaming manifests handled by the native segment engine
+MANIFEST_EXTENSIONS = {'.m3u8', '.mpd'}
+
+
+# ==============================================================================
+#  HELPER FUNCTIONS
+# ==============================================================================
+
+def get_default_download_location():
+    if os.name == 'nt':
+        user_profile = os.environ.get('USERPROFILE')
+        if user_profile:
+            return os.path.join(user_profile, 'Downloads')
+    return os.path.join(os.path.expanduser('~'), 'Downloads')
+
+
+def get_app_data_dir():
+    """Directory for Aura's own state (host profiles, caches). Created on demand."""
+    if os.name == 'nt' and os.environ.get('APPDATA'):
+        base = os.path.join(os.environ['APPDATA'], 'AuraDownloaderPro')
+    else:
+        base = os.path.join(os.path.expanduser('~'), '.aura_downloader')
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+def clean_url(url):
+    """
+    Remove playlist parameters from YouTube URLs so it focuses on the single video.
+    Strips: list, index, start_radio, etc.
+    """
+    url = url.strip()
+    parsed = urllib.parse.urlparse(url)
+
+    # Only strip for YouTube domains
+    yt_domains = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'youtu.be')
+    if parsed.hostname and parsed.hostname.lower() in yt_domains:
+        params = urllib.parse.parse_qs(parsed.query)
+        # Remove playlist-related params
+        for key in ['list', 'index', 'start_radio', 'rdm', 'playnext']:
+            params.pop(key, None)
+        clean_query = urllib.parse.urlencode(params, doseq=True)
+        parsed = parsed._replace(query=clean_query)
+        url = urllib.parse.urlunparse(parsed)
+    return url
+
+
+def is_direct_file_url(url):
+    """Check if a URL points to a direct downloadable file."""
+    try:
+        parsed = urllib.parse.urlparse(url)
+        path = parsed.path.lower()
+        return any(path.endswith(ext) for ext in DIRECT_FILE_EXTENSIONS)
+    except Exception:
+        return False
+
+
+def is_manifest_url(url):
+    """Check if a URL points to an HLS (.m3u8) or DASH (.mpd) manifest."""
+    try:
+        path = urllib.parse.urlparse(url).path.lower()
+        return any(path.endswith(ext) for ext in MANIFEST_EXTENSIONS)
+    except Exception:
+        return False
+
+
+def get_filename_from_url(url):
+    """Extract a filename from a URL."""
+    parsed = urllib.parse.urlparse(url)
+    path = parsed.path
+    name = os.path.basename(path)
+    if not name:
+        name = "downloaded_file"
+    return urllib.parse.unquote(name)
+
+
+def is_url(text):
+    """Check if text looks like a URL."""
+    text = text.strip()
+    return bool(re.match(r'^https?://', text, re.IGNORECASE))
+
+
+def format_speed(bytes_per_sec):
+    """Format a transfer rate the way yt-dlp does, e.g. '3.40MiB/s'."""
+    if not bytes_per_sec:
+        return "N/A"
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if bytes_per_sec < 1024 or unit == 'GiB':
+            return f"{bytes_per_sec:.2f}{unit}/s"
+        bytes_per_sec /= 1024
+
+
+def format_eta(seconds):
+    """Format an ETA the way yt-dlp does: MM:SS, or H:MM:SS past an hour."""
+    if seconds is None:
+        return "N/A"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def retry_delay(error, attempt, backoff_base=RETRY_BACKOFF_BASE, backoff_max=RETRY_BACKOFF_MAX):
+    """Seconds to wait before retry number `attempt` after `error`, or None if retrying is pointless."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        status = response.status_code
+        if status in (429, 503):
+            retry_after = parse_retry_after(response.headers.get('retry-after'))
+            if retry_after is not None:
+                return retry_after
+        elif 400 <= status < 500 and status != 408:
+            return None
+    backoff = min(backoff_max, backoff_base * (2 ** attempt))
+    return random.uniform(backoff / 2, backoff)
+
+
+def resolve_save_path(directory, filename, url, in_use=()):
+    """
+    Pick the output path for a direct or stream download.
+    Reuses a partial file whose journal belongs to the same URL so the download
+    resumes, otherwise picks a free name (name_1.ext, name_2.ext, ...).
+    Paths in `in_use` are being written by another download and are skipped.
+    """
+    save_path = os.path.join(directory, filename)
+    base, ext = os.path.splitext(save_path)
+    counter = 1
+    while os.path.exists(save_path) or save_path in in_use:
+        if save_path not in in_use:
+            journal = load_journal(save_path)
+            if journal and journal.url == url:
+                return save_path
+        save_path = f"{base}_{counter}{ext}"
+        counter += 1
+    return save_path
+
+
+# ==============================================================================
+#  CONNECTION POOL — keep-alive HTTP sessions shared by every download
+# ==============================================================================
+
+class ConnectionPool:
+    """
+    Thread-safe keep-alive HTTP connections shared across chunks and downloads.
+    A single adapter keeps one urllib3 pool per host (up to `per_host`
+    connections each); every thread gets its own Session mounted on that
+    adapter, so chunk workers and later downloads from the same host reuse
+    warm TCP/TLS connections instead of handshaking for every request.
+    """
+
+    def __init__(self, per_host=POOL_PER_HOST, max_hosts=POOL_MAX_HOSTS):
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=max_hosts, pool_maxsize=per_host
+        )
+        self._local = threading.local()
+
+    def session(self):
+        """The calling thread's Session, bound to the shared connection pools."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            self._local.session = session
+        return session
+
+    def get(self, url, **kwargs):
+        return self.session().get(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.session().head(url, **kwargs)
+
+    def close(self):
+        """Drop every pooled connection."""
+        self._adapter.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_connection_pool():
+    """The process-wide ConnectionPool used when a downloader isn't given one."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+# ==============================================================================
+#  RECEIVE BUFFERS — socket reads straight into reusable buffers
+# ==============================================================================
+
+class BufferPool:
+    """
+    A bounded set of reusable receive buffers. Buffers are created on first
+    use, up to `count`; after that acquire() waits for one to be released,
+    so receive memory stays fixed however many connections are running.
+    `size` is capped at MIN_SEGMENT_SIZE, the most a chunk worker may read
+    between two updates of its position.
+    """
+
+    def __init__(self, size=RECV_BUFFER_SIZE, count=RECV_BUFFER_COUNT):
+        self.size = min(size, MIN_SEGMENT_SIZE)
+        self.count = count
+        self._free = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while not self._free and self._created >= self.count:
+                self._cond.wait()
+            if self._free:
+                return self._free.pop()
+            self._created += 1
+        return bytearray(self.size)
+
+    def release(self, buffer):
+        with self._cond:
+            self._free.append(buffer)
+            self._cond.notify()
+
+
+_default_buffers = None
+
+
+def default_buffer_pool():
+    """The process-wide BufferPool used when a downloader isn't given one."""
+    global _default_buffers
+    with _default_pool_lock:
+        if _default_buffers is None:
+            _default_buffers = BufferPool()
+        return _default_buffers
+
+
+def body_reader(resp):
+    """
+    A readinto(view) for the body of a streamed requests response. Plain
+    bodies go from the socket straight into the caller's buffer, without
+    the bytes object iter_content allocates for every read; compressed ones
+    are decoded by urllib3 and copied in. Returns 0 at the end of the body;
+    raises IOError if the connection closes before Content-Length is met.
+    """
+    raw = resp.raw
+    fp = getattr(raw, '_fp', None)   # The http.client response under urllib3
+    if fp is not None and hasattr(fp, 'readinto') and \
+            resp.headers.get('content-encoding', 'identity').lower() == 'identity':
+        def read_plain(view):
+            n = fp.readinto(view)
+            if not n and len(view) and fp.length:
+                # http.client reports an early close as the end of the body; urllib3 would raise
+                raise IOError(f"connection closed with {fp.length} bytes of the body missing")
+            return n
+        return read_plain
+
+    pending = b''   # Decoded bytes that didn't fit the last buffer (urllib3 1.x can overshoot amt)
+
+    def readinto(view):
+        nonlocal pending
+        data = pending or raw.read(len(view), decode_content=True)
+        n = min(len(data), len(view))
+        view[:n] = data[:n]
+        pending = data[n:]
+        return n
+    return readinto
+
+
+def release_body(resp):
+    """Hand a fully read response's connection back to the pool (its body was read past urllib3)."""
+    fp = getattr(resp.raw, '_fp', None)
+    if fp is not None and fp.isclosed():
+        resp.raw.release_conn()
+
+
+# ==============================================================================
+#  WRITE-BEHIND — a disk writer thread between the network reads and the file
+# ==============================================================================
+
+class DiskWriter:
+    """
+    Writes received buffers to a file on its own thread, so socket reads never
+    wait on disk latency (a NAS share, a busy HDD). write() queues a filled
+    BufferPool buffer and returns at once; it only blocks while `max_bytes`
+    of buffers are already waiting, which is the backpressure that slows the
+    readers down to what the disk takes. Each pass writes everything queued,
+    merging adjacent buffers into one pwritev() call, and returns each run's
+    buffers to the pool as soon as it is written.
+    `fsync` is one of FSYNC_POLICIES. Every JOURNAL_INTERVAL (and on close)
+    `checkpoint(ends)` is called with {target: end of its written bytes};
+    under 'periodic' only after an fsync that covers them, so a journal
+    never records bytes that aren't on disk. 'periodic' also syncs every
+    FSYNC_BYTES. Checkpoints run on a helper thread, so writing goes on
+    while the disk flushes.
+    A write error is kept in `error` and raised from later write() calls.
+    """
+
+    def __init__(self, path, buffers, max_bytes=WRITE_BEHIND_BYTES, fsync=FSYNC_POLICY,
+                 checkpoint=None, truncate=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        flags = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+        if truncate:
+            flags |= os.O_CREAT | os.O_TRUNC
+        self._fd = os.open(path, flags, 0o666)
+        self.buffers = buffers
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.checkpoint = checkpoint
+        self.error = None
+        self.bytes_written = 0
+        self._ends = {}            # Target -> end of its bytes written so far
+        self._queue = []           # (offset, buffer, length, target) waiting for the writer
+        self._queued = 0           # Buffer memory held by the queue and the run being written
+        self._closing = False
+        self._syncer = None        # Helper thread running the current checkpoint
+        lock = threading.Lock()
+        self._work = threading.Condition(lock)   # Wakes the writer thread
+        self._room = threading.Condition(lock)   # Wakes readers waiting for queue space
+        self._thread = threading.Thread(target=self._run, name="disk-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, offset, buffer, length, target=None):
+        """
+        Queue buffer[:length] for offset and hand the buffer over (it goes
+        back to the pool once written). Once the bytes are written,
+        target.written is moved to their end.
+        """
+        with self._room:
+            while self._queued and self._queued + len(buffer) > self.max_bytes and not self.error:
+                self._room.wait()
+            if self.error:
+                self.buffers.release(buffer)
+                raise self.error
+            self._queue.append((offset, buffer, length, target))
+            self._queued += len(buffer)
+            if len(self._queue) == 1:
+                self._work.notify()
+
+    def close(self):
+        """Write what is queued, sync as the policy says, checkpoint and close the file."""
+        with self._work:
+            self._closing = True
+            self._work.notify()
+        self._thread.join()
+        if self._syncer:
+            self._syncer.join()
+        try:
+            self._sync(dict(self._ends), self.fsync != 'none')
+        finally:
+            os.close(self._fd)
+
+    def _sync(self, ends, fsync):
+        try:
+            if fsync and not self.error:
+                os.fsync(self._fd)
+        except OSError as e:
+            self._fail(e)
+            return
+        if self.checkpoint:
+            try:
+                self.checkpoint(ends)
+            except OSError:
+                pass
+
+    def _run(self):
+        last_checkpoint, checkpointed = time.monotonic(), 0
+        while True:
+            with self._work:
+                while not self._queue and not self._closing:
+                    self._work.wait(JOURNAL_INTERVAL)
+                    if time.monotonic() - last_checkpoint >= JOURNAL_INTERVAL:
+                        break
+                batch, self._queue = self._queue, []
+                closing = self._closing and not batch
+            if batch:
+                self._write_batch(batch)
+            if closing:
+                return
+            due = time.monotonic() - last_checkpoint >= JOURNAL_INTERVAL or (
+                self.fsync == 'periodic' and self.bytes_written - checkpointed >= FSYNC_BYTES)
+            if (due and not self.error and self.bytes_written != checkpointed
+                    and not (self._syncer and self._syncer.is_alive())):
+                checkpointed, last_checkpoint = self.bytes_written, time.monotonic()
+                self._syncer = threading.Thread(target=self._sync, args=(dict(self._ends), self.fsync == 'periodic'),
+                                                name="disk-sync", daemon=True)
+                self._syncer.start()
+
+    def _write_batch(self, batch):
+        """Write a batch as runs of adjacent buffers, giving each run's buffers back as soon as it is written."""
+        batch.sort(key=lambda item: item[0])
+        runs, run = [], [batch[0]]
+        for item in batch[1:]:
+            if len(run) < WRITE_BATCH_MAX and item[0] == run[-1][0] + run[-1][2]:
+                run.append(item)
+            else:
+                runs.append(run)
+                run = [item]
+        runs.append(run)
+        for run in runs:
+            try:
+                if not self.error:
+                    self._write_run(run)
+                    for offset, _, length, target in run:
+                        if target is not None:
+                            target.written = self._ends[target] = offset + length
+            except OSError as e:
+                self._fail(e)
+            finally:
+                for _, buffer, _, _ in run:
+                    self.buffers.release(buffer)
+                with self._room:
+                    self._queued -= sum(len(buffer) for _, buffer, _, _ in run)
+                    self._room.notify(len(run))
+
+    def _write_run(self, run):
+        offset = run[0][0]
+        views = [memoryview(buffer)[:length] for _, buffer, length, _ in run]
+        try:
+            if hasattr(os, 'pwritev'):
+                while views:
+                    written = os.pwritev(self._fd, views, offset)
+                    offset += written
+                    self.bytes_written += written
+                    while views and written >= len(views[0]):
+                        written -= len(views.pop(0))
+                    if views and written:
+                        views[0] = views[0][written:]
+            else:   # Windows: only this thread moves the file position
+                os.lseek(self._fd, offset, os.SEEK_SET)
+                for view in views:
+                    while view:
+                        written = os.write(self._fd, view)
+                        self.bytes_written += written
+                        view = view[written:]
+        finally:
+            for view in views:
+                view.release()
+
+    def _fail(self, error):
+        with self._room:
+            self.error = self.error or error
+            self._room.notify_all()
+
+
+# ==============================================================================
+#  DOWNLOAD JOURNAL — crash-safe record of partial chunked downloads
+# ==============================================================================
+
+class Segment:
+    """A byte range [start, end] of the output file and how much of it is on disk."""
+
+    def __init__(self, start, end, pos=None):
+        self.start = start
+        self.end = end
+        self.pos = start if pos is None else pos   # Next byte to receive
+        self.written = self.pos                    # Bytes handed to the file by the disk writer
+        self.committed = self.pos                  # Bytes written and journaled
+        self.active = False                        # A worker is currently downloading it
+
+    @property
+    def remaining(self):
+        return self.end + 1 - self.pos
+
+
+class DownloadJournal:
+    """
+    Sidecar file (<save_path>.aura) recording the URL, total size, ETag /
+    Last-Modified validators and the committed byte ranges of a chunked
+    download, so it can continue after a crash, reboot or cancel.
+    """
+
+    VERSION = 1
+
+    def __init__(self, save_path, url, total_size, etag=None, last_modified=None):
+        self.save_path = save_path
+        self.path = save_path + JOURNAL_SUFFIX
+        self.url = url
+        self.total_size = total_size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.segments = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, save_path):
+        """Read the journal for save_path. Returns None if missing or unreadable."""
+        try:
+            with open(save_path + JOURNAL_SUFFIX, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != cls.VERSION:
+                return None
+            journal = cls(save_path, data['url'], int(data['total_size']),
+                          data.get('etag'), data.get('last_modified'))
+            journal.segments = [Segment(int(s), int(e), int(p)) for s, e, p in data['segments']]
+            return journal
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches(self, url, total_size, etag, last_modified):
+        """True if the remote file still looks like the one this journal describes."""
+        if self.url != url or self.total_size != total_size:
+            return False
+        if self.etag and etag and self.etag != etag:
+            return False
+        if self.last_modified and last_modified and self.last_modified != last_modified:
+            return False
+        try:
+            return os.path.getsize(self.save_path) == total_size
+        except OSError:
+            return False
+
+    @property
+    def if_range(self):
+        """Validator for If-Range: a strong ETag if there is one, else Last-Modified."""
+        if self.etag and not self.etag.startswith('W/'):
+            return self.etag
+        return self.last_modified
+
+    def save(self):
+        """Atomically rewrite the journal with the committed position of every segment."""
+        with self._lock:
+            data = {
+                'version': self.VERSION,
+                'url': self.url,
+                'total_size': self.total_size,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'segments': [[seg.start, seg.end, seg.committed] for seg in self.segments],
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def delete(self):
+        with self._lock:
+            for path in (self.path, self.path + ".tmp"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class SegmentJournal(DownloadJournal):
+    """
+    Journal of a segmented (HLS / DASH) download: segments are written in
+    order, so the next segment index and the bytes on disk are all it takes
+    to resume. `fingerprint` identifies the segment list, so a changed
+    playlist starts over instead of splicing two different streams.
+    """
+
+    KIND = "segments"
+
+    def __init__(self, save_path, url, part_count, fingerprint):
+        super().__init__(save_path, url, 0)
+        self.part_count = part_count
+        self.fingerprint = fingerprint
+        self.next_index = 0      # First segment not yet on disk
+        self.offset = 0          # Bytes of the output file holding segments [0, next_index)
+
+    @classmethod
+    def load(cls, save_path):
+        try:
+            with open(save_path + JOURNAL_SUFFIX, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != cls.VERSION or data.get('kind') != cls.KIND:
+                return None
+            journal = cls(save_path, data['url'], int(data['part_count']), data['fingerprint'])
+            journal.next_index = int(data['next_index'])
+            journal.offset = int(data['offset'])
+            return journal
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches(self, url, part_count, fingerprint):
+        """True if this journal belongs to the same segment list and its bytes are still on disk."""
+        if self.url != url or self.part_count != part_count or self.fingerprint != fingerprint:
+            return False
+        try:
+            return os.path.getsize(self.save_path) >= self.offset
+        except OSError:
+            return False
+
+    def save(self):
+        with self._lock:
+            data = {
+                'version': self.VERSION,
+                'kind': self.KIND,
+                'url': self.url,
+                'part_count': self.part_count,
+                'fingerprint': self.fingerprint,
+                'next_index': self.next_index,
+                'offset': self.offset,
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+
+def load_journal(save_path):
+    """The chunked or segmented journal kept for save_path, or None."""
+    return DownloadJournal.load(save_path) or SegmentJournal.load(save_path)
+
+
+# ==============================================================================
+#  BANDWIDTH LIMITING — token buckets shared by every transfer
+# ==============================================================================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. consume(n) blocks until n bytes may pass at
+    `rate` bytes/s. The bucket holds at most RATE_BURST_SECONDS worth of
+    tokens, so throughput stays smooth instead of stop-start. A rate of
+    None/0 means unlimited; set_rate() also applies to threads already waiting.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate or None
+        self._cond = threading.Condition()
+        self._tokens = 0.0
+        self._last = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._cond:
+            self._refill()
+            self.rate = rate or None
+            self._tokens = min(self._tokens, 0.0) if self.rate else 0.0
+            self._cond.notify_all()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            capacity = self.rate * RATE_BURST_SECONDS
+            self._tokens = min(capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def consume(self, n, cancel_event=None):
+        """Wait until n bytes' worth of tokens are available, then take them."""
+        if not self.rate:
+            return
+        with self._cond:
+            while self.rate:
+                self._refill()
+                # Reads bigger than the bucket go through once it is full and leave it in debt
+                need = min(n, max(self.rate * RATE_BURST_SECONDS, 1.0))
+                if self._tokens >= need:
+                    self._tokens -= n
+                    return
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                self._cond.wait(min(0.25, (need - self._tokens) / self.rate))
+
+
+class BandwidthLimiter:
+    """A global token bucket plus optional per-host buckets; every chunk worker and yt-dlp draw from it."""
+
+    def __init__(self, global_rate=None):
+        self.global_bucket = TokenBucket(global_rate)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def set_global_rate(self, rate):
+        self.global_bucket.set_rate(rate)
+
+    def set_host_rate(self, host, rate):
+        with self._lock:
+            bucket = self._hosts.get(host)
+            if bucket is None:
+                if not rate:
+                    return
+                self._hosts[host] = TokenBucket(rate)
+                return
+        bucket.set_rate(rate)
+
+    def consume(self, host, n, cancel_event=None):
+        self.global_bucket.consume(n, cancel_event)
+        bucket = self._hosts.get(host)
+        if bucket is not None:
+            bucket.consume(n, cancel_event)
+
+    def is_limited(self, host):
+        """True if a global or per-host rate currently applies to host."""
+        bucket = self._hosts.get(host)
+        return bool(self.global_bucket.rate or (bucket is not None and bucket.rate))
+
+
+# ==============================================================================
+#  SPEED METER — sampled EWMA throughput and ETA
+# ==============================================================================
+
+class SpeedMeter:
+    """
+    Smoothed throughput from per-connection byte counters.
+    Each sample() diffs the counters against the previous sample and folds the
+    rates into an EWMA, for the whole transfer and for every connection.
+    """
+
+    def __init__(self, alpha=SPEED_EWMA_ALPHA):
+        self.alpha = alpha
+        self.speed = 0.0
+        self.connection_speeds = []
+        self._last_counts = None
+        self._last_time = None
+
+    def sample(self, counts, now=None):
+        """Take a sample of the cumulative byte counters. Returns the smoothed speed."""
+        now = time.monotonic() if now is None else now
+        counts = list(counts)
+        if self._last_counts is None:
+            self._last_counts, self._last_time = counts, now
+            self.connection_speeds = [0.0] * len(counts)
+            return self.speed
+        # Connections may have been added since the last sample
+        self._last_counts += [0] * (len(counts) - len(self._last_counts))
+        self.connection_speeds += [0.0] * (len(counts) - len(self.connection_speeds))
+        dt = now - self._last_time
+        if dt <= 0:
+            return self.speed
+        rates = [(c - p) / dt for c, p in zip(counts, self._last_counts)]
+        a = self.alpha
+        if self.speed == 0.0:
+            self.speed = sum(rates)   # Seed with the first real rate instead of ramping from zero
+            self.connection_speeds = rates
+        else:
+            self.speed = a * sum(rates) + (1 - a) * self.speed
+            self.connection_speeds = [a * r + (1 - a) * s for r, s in zip(rates, self.connection_speeds)]
+        self._last_counts, self._last_time = counts, now
+        return self.speed
+
+    def eta(self, remaining_bytes):
+        """Seconds left at the smoothed speed, or None while the speed is unknown."""
+        if self.speed <= 0:
+            return None
+        return remaining_bytes / self.speed
+
+
+# ==============================================================================
+#  CONNECTION TUNING — learned connection count per host
+# ==============================================================================
+
+class HostProfiles:
+    """Best connection count learned for each host, persisted as JSON in the app data dir."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_app_data_dir(), "hosts.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._hosts = json.load(f)
+        except (OSError, ValueError):
+            self._hosts = {}
+
+    def connections(self, host, default):
+        with self._lock:
+            entry = self._hosts.get(host)
+        if entry:
+            return max(1, min(MAX_CONNECTIONS, int(entry.get('connections', default))))
+        return default
+
+    def remember(self, host, connections):
+        with self._lock:
+            self._hosts[host] = {'connections': connections, 'updated': int(time.time())}
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._hosts, f, indent=1)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+
+_default_profiles = None
+
+
+def default_host_profiles():
+    """The process-wide HostProfiles used when a downloader isn't given one."""
+    global _default_profiles
+    with _default_pool_lock:
+        if _default_profiles is None:
+            _default_profiles = HostProfiles()
+        return _default_profiles
+
+
+class ConnectionTuner:
+    """
+    Hill-climbs the connection count of one download. It adds connections
+    while each step still buys at least TUNE_MIN_GAIN more throughput, falls
+    back to the last good count when gains level off or retries rise, and
+    remembers the settled count for the host. Once `persist` is cleared
+    (throughput was held down by a rate cap) nothing is remembered.
+    """
+
+    def __init__(self, host, profiles, start, maximum=MAX_CONNECTIONS):
+        self.host = host
+        self.profiles = profiles
+        self.count = start
+        self.maximum = maximum
+        self.settled = False
+        self.persist = True
+        self._good_count = start
+        self._good_speed = 0.0
+
+    def step(self, speed, new_errors):
+        """Feed one measurement interval; returns the connection count to run next."""
+        if new_errors:
+            # The host is pushing back: drop to the last count that worked without errors
+            fallback = self._good_count if self._good_count < self.count else self.count - max(1, self.count // 4)
+            self.count = max(1, fallback)
+            self._settle()
+        elif self.settled:
+            pass
+        elif speed > self._good_speed * (1 + TUNE_MIN_GAIN):
+            self._good_speed = speed
+            self._good_count = self.count
+            if self.count >= self.maximum:
+                self._settle()
+            else:
+                self.count = min(self.maximum, self.count + max(1, self.count // 2))
+        else:
+            # Gains levelled off: the last step didn't pay for itself
+            self.count = self._good_count
+            self._settle()
+        return self.count
+
+    def finish(self):
+        """Download ended: keep what was learned so far if tuning never settled."""
+        if not self.settled and self._good_speed > 0 and self.persist:
+            self.profiles.remember(self.host, self.count)
+
+    def _settle(self):
+        self.settled = True
+        self._good_count = self.count
+        if self.persist:
+            self.profiles.remember(self.host, self.count)
+
+
+# ==============================================================================
+#  INTEGRITY — checksums computed while the bytes stream in
+# ==============================================================================
+
+CHECKSUM_ALGORITHMS = {8: 'crc32', 32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}  # Hex length -> algorithm
+
+
+class StreamHasher:
+    """Running digests (sha256, md5, crc32, ...) over bytes fed in file order."""
+
+    def __init__(self, algorithms=('sha256',)):
+        self._hashes = {name: hashlib.new(name) for name in algorithms if name != 'crc32'}
+        self._crc = 0 if 'crc32' in algorithms else None
+        self.offset = 0            # Bytes hashed so far
+
+    def update(self, data):
+        for digest in self._hashes.values():
+            digest.update(data)   # Releases the GIL for large buffers
+        if self._crc is not None:
+            self._crc = zlib.crc32(data, self._crc)
+        self.offset += len(data)
+
+    def update_from_file(self, f, end, block_size=1024 * 1024):
+        """Hash f from the current offset up to byte `end` (exclusive)."""
+        f.seek(self.offset)
+        while self.offset < end:
+            data = f.read(min(block_size, end - self.offset))
+            if not data:
+                raise IOError("file is shorter than the bytes written")
+            self.update(data)
+
+    def hexdigests(self):
+        digests = {name: digest.hexdigest() for name, digest in self._hashes.items()}
+        if self._crc is not None:
+            digests['crc32'] = f"{self._crc:08x}"
+        return digests
+
+
+def parse_checksum(text):
+    """
+    Parse an expected checksum: 'sha256:HEX', 'md5=HEX' or a bare HEX digest
+    (algorithm picked by its length). Returns (algorithm, hex); raises ValueError.
+    """
+    name, sep, value = text.strip().replace('=', ':', 1).partition(':')
+    if not sep:
+        name, value = '', name
+    value = value.strip().lower()
+    if not re.fullmatch(r'[0-9a-f]+', value):
+        raise ValueError(f"not a hex digest: {text!r}")
+    name = name.strip().lower().replace('-', '') or CHECKSUM_ALGORITHMS.get(len(value), '')
+    if name not in CHECKSUM_ALGORITHMS.values() or CHECKSUM_ALGORITHMS.get(len(value)) != name:
+        raise ValueError(f"unsupported checksum: {text!r}")
+    return name, value
+
+
+def parse_checksum_file(text, filename):
+    """
+    The digest for filename in a sha256sum-style listing ("HEX  name" per line)
+    or a file holding just the digest. None if the file isn't listed.
+    """
+    bare = None
+    for line in text.splitlines():
+        fields = line.strip().split()
+        if not fields or not re.fullmatch(r'[0-9a-fA-F]{8,128}', fields[0]):
+            continue
+        if len(fields) == 1:
+            bare = bare or fields[0].lower()
+        elif os.path.basename(fields[1].lstrip('*')) == filename:
+            return fields[0].lower()
+    return bare
+
+
+# ==============================================================================
+#  MIRRORS — equivalent URLs of one file, ranked by measured throughput
+# ==============================================================================
+
+def abort_response(resp):
+    """
+    Cut a streaming response from another thread. Shutting the socket down
+    makes a read blocked on a stalled connection fail now instead of at
+    the timeout (closing the response alone would wait for the read).
+    """
+    sock = getattr(getattr(resp.raw, '_connection', None), 'sock', None)
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Mirror:
+    """One URL a multi-source download may fetch ranges from, and how it has performed."""
+
+    def __init__(self, url, primary=False):
+        self.url = url
+        self.host = urllib.parse.urlparse(url).hostname or ''
+        self.primary = primary     # The URL the download was queued with
+        self.speed = None          # Smoothed bytes/s of one connection to this mirror
+        self.samples = 0
+        self.active = 0            # Connections currently fetching from it
+        self.failures = 0          # Failed requests in a row
+        self.dropped = None        # Why it was dropped, if it was
+
+    def sample(self, connection_speeds):
+        """Take the mean speed of connections to this mirror (live ones, or a request that just finished)."""
+        self.speed = sum(connection_speeds) / len(connection_speeds)
+        self.samples += 1
+
+
+# ==============================================================================
+#  CHUNKED DOWNLOADER ENGINE — with Pause / Resume / Cancel
+# ==============================================================================
+
+class ChunkedDownloader:
+    """
+    Downloads a file from a direct URL using multiple concurrent connections.
+    Splits the file into CHUNK_COUNT parts and downloads them in parallel,
+    each worker writing its range straight into the preallocated output file.
+    A worker that runs out of work steals the back half of the largest
+    unfinished range, so every connection stays busy until the last byte.
+    Failed ranges are retried with exponential backoff and continue from
+    the last byte written. Each connection counts its own bytes without
+    locking; a sampler thread turns the counters into speed and ETA.
+    With adaptive=True the connection count starts from what was learned
+    for the host and is tuned while the download runs. With a budget, the
+    first connection is covered by the scheduler's slot and every extra one
+    is taken from (and returned to) the shared ConnectionBudget, under the
+    host of the mirror it is fetching from. With own_slot=True (a second
+    stream of the same task) the first connection is waited for from the
+    budget as well. Reads are
+    paced by the shared BandwidthLimiter and an optional per-download cap.
+    Progress is journaled next to the file, so an interrupted download
+    continues with Range requests for only the missing bytes.
+    `headers` go on every request; `request_size` caps the bytes asked for
+    per Range request (for servers that throttle long ranges), and
+    `source_url` is the URL recorded in the journal when `url` is a
+    short-lived resolved stream URL.
+    With `hash_algorithms` (e.g. ('sha256',)) the file is hashed while it
+    downloads: ranges are planned as HASH_PIECE_SIZE pieces handed out in
+    file order, and a follower thread reads back and hashes the contiguous
+    prefix already written, so only the last few pieces are left to hash at
+    the end. That is a second read of every byte (usually from the page
+    cache, but not on a network share), which is why it is opt-in; the
+    single-stream path hashes its buffers as they arrive instead.
+    The results land in `digests`.
+    `mirrors` are other URLs of the same file. Once their Content-Length and
+    ETag agree with the main URL, each Range request goes to the mirror with
+    the most throughput per connection left to give; a mirror that keeps
+    failing, ignores ranges or falls far behind the others is dropped
+    mid-transfer and its ranges continue elsewhere.
+    Bodies are read from the socket into receive buffers taken from
+    `buffers` (a BufferPool, the shared one by default), so a transfer
+    allocates nothing per read. Full buffers go to a DiskWriter thread,
+    which holds up to `write_buffer` bytes for slow storage and syncs the
+    file as `fsync` says ('periodic', 'end' or 'none').
+    Supports pause, resume, and cancel.
+    """
+
+    def __init__(self, url, save_path, num_chunks=CHUNK_COUNT,
+                 progress_callback=None, status_callback=None, preallocate=True,
+                 max_retries=MAX_RETRIES, backoff_base=RETRY_BACKOFF_BASE,
+                 backoff_max=RETRY_BACKOFF_MAX, pool=None,
+                 adaptive=False, max_connections=MAX_CONNECTIONS, host_profiles=None,
+                 budget=None, limiter=None, rate_limit=None,
+                 headers=None, request_size=None, source_url=None, hash_algorithms=None,
+                 mirrors=None, buffers=None, write_buffer=WRITE_BEHIND_BYTES, fsync=FSYNC_POLICY,
+                 own_slot=False):
+        self.url = url
+        self.mirrors = [Mirror(url, primary=True)] + [Mirror(m) for m in (mirrors or ()) if m != url]
+        self._streams = {}         # Worker index -> (mirror, response) of requests in flight, with mirrors
+        self.source_url = source_url or url
+        self.headers = dict(headers or {})
+        self.request_size = request_size
+        self.host = urllib.parse.urlparse(url).hostname or ''
+        self.save_path = save_path
+        self.num_chunks = num_chunks
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.preallocate = preallocate
+        self.pool = pool or default_connection_pool()
+        self.buffers = buffers or default_buffer_pool()
+        if self.buffers.size > MIN_SEGMENT_SIZE:
+            raise ValueError(f"receive buffers larger than MIN_SEGMENT_SIZE: {self.buffers.size}")
+        self.write_buffer = write_buffer
+        self.fsync = fsync
+        self.writer = None
+        self.adaptive = adaptive
+        self.max_connections = max_connections
+        self.host_profiles = host_profiles
+        self.budget = budget
+        self.own_slot = own_slot and budget is not None
+        self.limiter = limiter
+        self.rate_bucket = TokenBucket(rate_limit)
+        self.tuner = None
+        self._slot_hosts = {}      # Live worker index -> host its budget slot is charged to (None: the scheduler's slot)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0           # Total retries across all segments
+        self.error = None          # Reason for the final failure, if any
+        self.total_size = 0
+        self.etag = None           # Validators the server sent for the file
+        self.last_modified = None
+        self.downloaded_bytes = [0] * num_chunks   # Bytes fetched by each worker (one writer per slot)
+        self.resumed_bytes = 0                     # Bytes already on disk from a previous session
+        self.segments = []
+        self.journal = None
+        self.cancelled = False
+        self._remote_changed = False
+        self._restarted = False
+        self._failed = False
+        self._pause_event = threading.Event()
+        self._pause_event.set()  # Start in un-paused state
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self.meter = SpeedMeter()
+        self._sampler_stop = threading.Event()
+        self._sampler_thread = None
+        self._threads = []
+        self._target_connections = num_chunks
+        self.hash_algorithms = tuple(hash_algorithms or ())
+        self.digests = {}          # Algorithm -> hex digest, set when a hashed download completes
+        self._hasher = None
+        self._hash_stop = threading.Event()
+        self._hash_abort = False
+        self._hash_thread = None
+
+    def pause(self):
+        """Pause the download."""
+        self._pause_event.clear()
+        self._report_status("⏸️ Paused")
+
+    def resume(self):
+        """Resume the download."""
+        self._pause_event.set()
+        self._report_status("⏳ Resuming...")
+
+    def cancel(self):
+        """Cancel the download."""
+        self.cancelled = True
+        self._cancel_event.set()  # Cut short any retry backoff
+        self._pause_event.set()  # Unblock any paused threads
+
+    @property
+    def is_paused(self):
+        return not self._pause_event.is_set()
+
+    def set_rate_limit(self, rate):
+        """Cap this download at `rate` bytes/s (None for unlimited); applies immediately."""
+        self.rate_bucket.set_rate(rate)
+
+    def _is_capped(self):
+        """True while a per-download, global or host rate holds this transfer down."""
+        if self.rate_bucket.rate:
+            return True
+        return bool(self.limiter and any(self.limiter.is_limited(m.host) for m in self.mirrors))
+
+    def _throttle(self, n, host=None):
+        if self.limiter:
+            self.limiter.consume(host or self.host, n, self._cancel_event)
+        self.rate_bucket.consume(n, self._cancel_event)
+
+    def _report_status(self, text):
+        if self.status_callback:
+            self.status_callback(text)
+
+    @property
+    def bytes_done(self):
+        return self.resumed_bytes + sum(self.downloaded_bytes)
+
+    def stats(self):
+        """Snapshot of progress: bytes done/total, smoothed speed, per-connection speeds, ETA."""
+        done = self.bytes_done
+        return {
+            'downloaded': done,
+            'total': self.total_size,
+            'speed': self.meter.speed,
+            'connection_speeds': list(self.meter.connection_speeds),
+            'eta': self.meter.eta(self.total_size - done) if self.total_size else None,
+        }
+
+    def _report_progress(self):
+        if self.progress_callback:
+            self.progress_callback(self.bytes_done, self.total_size)
+
+    def _start_sampler(self):
+        """Sample the byte counters a few times per second, report progress and tune connections."""
+        def _run():
+            next_tune = time.monotonic() + TUNE_INTERVAL
+            retries_seen = self.retries
+            while not self._sampler_stop.wait(SPEED_SAMPLE_INTERVAL):
+                self.meter.sample(self.downloaded_bytes)
+                self._report_progress()
+                if len(self.mirrors) > 1:
+                    self._check_mirrors()
+                if time.monotonic() >= next_tune:
+                    next_tune = time.monotonic() + TUNE_INTERVAL
+                    new_errors = self.retries - retries_seen
+                    retries_seen = self.retries
+                    if self.tuner and not self.tuner.settled:
+                        self._tune(new_errors)
+                    self._top_up()
+
+        self._sampler_stop.clear()
+        self._sampler_thread = threading.Thread(target=_run, daemon=True)
+        self._sampler_thread.start()
+
+    def _tune(self, new_errors):
+        """One tuning step: measure, then add or retire connections."""
+        if self.is_paused or self.cancelled:
+            return
+        if self._is_capped():
+            # Throughput says nothing about the host while it is rate limited
+            self.tuner.persist = False
+            if not new_errors:
+                return
+        remaining = self.total_size - self.bytes_done
+        if remaining < 4 * self.connections * MIN_SEGMENT_SIZE and not new_errors:
+            return   # Too little left to split; a measurement now would undercount
+        before = self._target_connections
+        target = self.tuner.step(self.meter.speed, new_errors)
+        if target == before:
+            return
+        self._target_connections = target
+        self._report_status(f"⚙️ Tuning: {before} → {target} connections")
+        for host in self._acquire_extra(target - self.connections):
+            self._spawn_worker(host)
+
+    def _top_up(self):
+        """Grow back towards the target count when the budget frees slots up mid-download."""
+        if (self.budget is None or self.is_paused or self.cancelled or self._failed
+                or self._remote_changed or not self._threads):
+            return
+        remaining = self.total_size - self.bytes_done
+        want = min(self._target_connections - self.connections,
+                   remaining // (2 * MIN_SEGMENT_SIZE))
+        for host in self._acquire_extra(want):
+            self._spawn_worker(host)
+
+    def _acquire_extra(self, want):
+        """
+        Take up to `want` extra connection slots from the shared budget, from
+        the main host first, then from the live mirrors' hosts. Returns the
+        host of each slot granted (None for each one without a budget).
+        """
+        if want <= 0:
+            return []
+        if self.budget is None:
+            return [None] * want
+        with self._lock:
+            hosts = list(dict.fromkeys([self.host] + [m.host for m in self.mirrors if not m.dropped]))
+        granted = []
+        for host in hosts:
+            granted += [host] * self.budget.acquire(host, want - len(granted))
+        return granted
+
+    def _move_slot(self, worker_index, host):
+        """Charge a worker's extra slot to host instead. Returns False if host has no slot free."""
+        if not self.budget.acquire(host, 1):
+            return False
+        with self._lock:
+            old = self._slot_hosts.get(worker_index)
+            if old is not None:
+                self._slot_hosts[worker_index] = host
+        self.budget.release(old if old is not None else host, 1)   # The worker may have just inherited the scheduler's slot
+        return True
+
+    def _release_slot(self, worker_index):
+        """
+        A worker exited: hand its slot back to the budget. If the scheduler's
+        slot covered it, that cover passes to a worker holding a budget slot,
+        and that slot is handed back instead.
+        """
+        with self._lock:
+            host = self._slot_hosts.pop(worker_index, None)
+            if host is None:
+                heir = next((i for i, h in self._slot_hosts.items() if h is not None), None)
+                if heir is None:
+                    return
+                host, self._slot_hosts[heir] = self._slot_hosts[heir], None
+        if self.budget is not None:
+            self.budget.release(host, 1)
+
+    @property
+    def connections(self):
+        """Number of worker threads still running."""
+        return sum(1 for t in self._threads if t.is_alive())
+
+    def _spawn_worker(self, slot_host=None):
+        with self._lock:
+            worker_index = len(self.downloaded_bytes)
+            self.downloaded_bytes.append(0)
+            self._slot_hosts[worker_index] = slot_host
+            thread = threading.Thread(target=self._worker_main, args=(worker_index,), daemon=True)
+            self._threads.append(thread)
+        thread.start()
+
+    def _run_workers(self, count):
+        """Run `count` workers (more may be added by tuning) until the segments are done."""
+        self._threads = []
+        self.downloaded_bytes = []
+        self._slot_hosts = {}
+        for host in [None] + self._acquire_extra(count - 1):
+            self._spawn_worker(host)
+        while True:
+            with self._lock:
+                alive = [t for t in self._threads if t.is_alive()]
+            if alive:
+                alive[0].join()
+                continue
+            # All workers stopped; revive one if retiring left work behind
+            if (self.cancelled or self._failed or self._remote_changed
+                    or all(seg.remaining <= 0 for seg in self.segments)):
+                return
+            self._spawn_worker()
+
+    def _stop_sampler(self):
+        self._sampler_stop.set()
+        if self._sampler_thread:
+            self._sampler_thread.join()
+            self._sampler_thread = None
+        self._report_progress()
+
+    def _allocate_output(self):
+        """Create the output file at its final size so chunks can be written in place."""
+        with open(self.save_path, 'wb') as f:
+            if self.preallocate and hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(f.fileno(), 0, self.total_size)
+            else:
+                f.truncate(self.total_size)
+
+    def _next_segment(self):
+        """
+        Claim work for an idle worker: an unstarted segment if there is one,
+        otherwise the back half of the largest range another worker is still on.
+        """
+        with self._lock:
+            for seg in self.segments:
+                if not seg.active and seg.remaining > 0:
+                    seg.active = True
+                    return seg
+            victim = max((seg for seg in self.segments if seg.active),
+                         key=lambda seg: seg.remaining, default=None)
+            if victim is None or victim.remaining < 2 * MIN_SEGMENT_SIZE:
+                return None
+            split = victim.pos + victim.remaining // 2
+            stolen = Segment(split, victim.end)
+            stolen.active = True
+            # Append before shrinking so a concurrent journal save never loses the range
+            self.segments.append(stolen)
+            victim.end = split - 1
+            return stolen
+
+    def _worker_main(self, worker_index):
+        try:
+            self._worker(worker_index)
+        finally:
+            self._release_slot(worker_index)
+
+    def _worker(self, worker_index):
+        """Download segments until none are left to claim or steal."""
+        seg = self._next_segment()
+        while seg is not None:
+            ok = self._download_with_retries(worker_index, seg)
+            with self._lock:
+                seg.active = False
+            if not ok:
+                return False
+            if self.cancelled or self._failed:
+                return False
+            if self._retire(worker_index):
+                return True
+            seg = self._next_segment()
+        return True
+
+    def _retire(self, worker_index):
+        """True if tuning lowered the connection count and this worker should stop."""
+        with self._lock:
+            if self.connections > self._target_connections:
+                self._threads = [t for t in self._threads if t is not threading.current_thread()]
+                return True
+        return False
+
+    def _download_with_retries(self, worker_index, seg):
+        """Download a segment, retrying from the last byte written after transient errors."""
+        attempt = 0
+        while True:
+            pos_before = seg.pos
+            try:
+                return self._download_segment(worker_index, seg)
+            except Exception as e:
+                if self.cancelled or self._failed:
+                    return False
+                if seg.pos > pos_before:
+                    attempt = 0   # The connection made progress, so start the backoff over
+                disk_failed = self.writer is not None and self.writer.error is not None
+                delay = None if self._remote_changed or disk_failed else self._retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    with self._lock:
+                        self.error = f"{e}" if attempt == 0 else f"{e} (after {attempt} retries)"
+                    self._failed = True
+                    self._report_status(f"Connection {worker_index + 1} failed: {self.error}")
+                    return False
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                self._report_status(
+                    f"🔁 Connection {worker_index + 1}: retry {attempt}/{self.max_retries} "
+                    f"in {delay:.1f}s ({e})"
+                )
+                if self._cancel_event.wait(delay):
+                    return False
+
+    def _retry_delay(self, error, attempt):
+        return retry_delay(error, attempt, self.backoff_base, self.backoff_max)
+
+    def _download_segment(self, worker_index, seg):
+        """
+        Download the missing part of one segment straight into its slot in the output file.
+        Returns False if cancelled; raises on network or disk errors.
+        """
+        while seg.remaining > 0:
+            end = seg.end
+            if self.request_size:
+                end = min(end, seg.pos + self.request_size - 1)
+            if not self._download_range(worker_index, seg, end):
+                return False
+        return True
+
+    def _download_range(self, worker_index, seg, end):
+        """One Range request for seg.pos..end from the best mirror. Returns False if cancelled."""
+        mirror = self._pick_mirror(worker_index)
+        started, pos_before = time.monotonic(), seg.pos
+        try:
+            result = self._fetch_range(worker_index, seg, end, mirror)
+        except Exception as e:
+            if len(self.mirrors) > 1 and not self.cancelled and (self._mirror_failed(mirror, e) or mirror.dropped):
+                return True   # The mirror is gone; the rest of the range goes to another one
+            raise
+        finally:
+            with self._lock:
+                mirror.active -= 1
+        mirror.failures = 0
+        elapsed = time.monotonic() - started
+        if len(self.mirrors) > 1 and seg.pos > pos_before and elapsed > 0 and not self.is_paused:
+            with self._lock:
+                mirror.sample([(seg.pos - pos_before) / elapsed])   # Short requests finish between sampler ticks
+        return result
+
+    def _fetch_range(self, worker_index, seg, end, mirror):
+        """
+        Fetch seg.pos..end from mirror into the output file. Returns False if
+        cancelled; stops early (returning True) if the mirror is dropped.
+        With mirrors the response is registered, so dropping its mirror can
+        close it and unblock a stalled read.
+        """
+        headers = dict(self.headers)
+        headers['Range'] = f'bytes={seg.pos}-{end}'
+        validator = self.journal.if_range
+        if not mirror.primary and validator != self.journal.etag:
+            validator = None   # Mirrors only share the (verified) ETag; their Last-Modified dates may differ
+        if validator:
+            headers['If-Range'] = validator
+        with self.pool.get(mirror.url, headers=headers, stream=True, timeout=60) as resp:
+            if len(self.mirrors) > 1:
+                with self._lock:
+                    self._streams[worker_index] = (mirror, resp)
+            try:
+                return self._read_range(worker_index, seg, end, mirror, resp, validator)
+            finally:
+                with self._lock:
+                    self._streams.pop(worker_index, None)
+
+    def _read_range(self, worker_index, seg, end, mirror, resp, validator):
+        """Read one Range response into receive buffers and queue each full one for the disk writer."""
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            if not mirror.primary:
+                self._drop_mirror(mirror, "ignored the Range request")
+            elif validator:
+                self._remote_changed = True
+            raise IOError("server ignored the Range request")
+        readinto = body_reader(resp)
+        buffer, filled = None, 0
+        try:
+            while True:
+                # Check pause
+                self._pause_event.wait()
+                if self.cancelled:
+                    return False
+                if buffer is None:
+                    buffer, filled = self.buffers.acquire(), 0
+                # No lock needed: only this worker moves seg.pos, and a thief
+                # always splits at least MIN_SEGMENT_SIZE past the position it
+                # saw, which no buffer exceeds, so this read never crosses it.
+                with memoryview(buffer) as view:
+                    n = readinto(view[filled:filled + min(len(view) - filled, seg.remaining)])
+                if not n:
+                    break
+                filled += n
+                seg.pos += n
+                self.downloaded_bytes[worker_index] += n
+                self._throttle(n, mirror.host)
+                if filled == len(buffer) or seg.remaining <= 0:
+                    self.writer.write(seg.pos - filled, buffer, filled, seg)
+                    buffer = None
+                if mirror.dropped:
+                    return True   # The rest of the range goes to another mirror
+                if seg.remaining <= 0 or seg.pos > end:
+                    break
+        finally:
+            if buffer is not None:
+                if filled:
+                    self.writer.write(seg.pos - filled, buffer, filled, seg)
+                else:
+                    self.buffers.release(buffer)
+        release_body(resp)
+        if seg.remaining > 0 and seg.pos <= end:
+            raise IOError("connection closed before the range was complete")
+        return True
+
+    def _verify_mirrors(self, etag):
+        """HEAD every extra mirror and keep those serving the same file: same Content-Length and ETag, with ranges."""
+        def check(mirror):
+            try:
+                head = self.pool.head(mirror.url, headers=self.headers, allow_redirects=True, timeout=15)
+                head.raise_for_status()
+            except Exception as e:
+                return f"unreachable ({e})"
+            if head.headers.get('accept-ranges', 'none').lower() != 'bytes':
+                return "no Range support"
+            if int(head.headers.get('content-length', 0)) != self.total_size:
+                return "size differs"
+            if head.headers.get('etag') != etag:
+                return "ETag differs"
+            return None
+
+        for mirror in self.mirrors:
+            mirror.dropped, mirror.failures = None, 0
+        extra = self.mirrors[1:]
+        with ThreadPoolExecutor(max_workers=len(extra)) as executor:
+            reasons = list(executor.map(check, extra))
+        for mirror, reason in zip(extra, reasons):
+            if reason:
+                mirror.dropped = reason
+                self._report_status(f"🪞 Skipping mirror {mirror.host}: {reason}")
+        live = sum(1 for mirror in self.mirrors if not mirror.dropped)
+        if live > 1:
+            self._report_status(f"🪞 Downloading from {live} mirrors...")
+
+    def _pick_mirror(self, worker_index):
+        """
+        The live mirror with the most per-connection throughput to spare whose
+        host the worker's budget slot is charged to, or can be moved to;
+        counts the new connection on it.
+        """
+        with self._lock:
+            live = [m for m in self.mirrors if not m.dropped] or self.mirrors[:1]
+            best = max((m.speed for m in live if m.speed), default=None) or 1.0
+            ranked = sorted(live, key=lambda m: (m.speed or best) / (m.active + 1), reverse=True)
+        mirror = ranked[0]
+        if len(ranked) > 1 and self.budget is not None:
+            for candidate in ranked:
+                held = self._slot_hosts.get(worker_index)
+                if held is None or candidate.host == held or self._move_slot(worker_index, candidate.host):
+                    mirror = candidate
+                    break
+            # Otherwise every host is full: use the best mirror, charged where the slot already is
+        with self._lock:
+            mirror.active += 1
+        return mirror
+
+    def _drop_mirror(self, mirror, reason):
+        """Stop using a mirror (never the last one left) and cut its open requests. Returns True if dropped."""
+        with self._lock:
+            if mirror.dropped or sum(1 for m in self.mirrors if not m.dropped) <= 1:
+                return False
+            mirror.dropped = reason
+            responses = [resp for m, resp in self._streams.values() if m is mirror]
+        self._report_status(f"🪞 Dropped mirror {mirror.host}: {reason}")
+        for resp in responses:
+            abort_response(resp)
+        return True
+
+    def _mirror_failed(self, mirror, error):
+        """Count a failed request; drop the mirror after too many, or at once on an error retrying can't fix."""
+        with self._lock:
+            mirror.failures += 1
+            failures = mirror.failures
+        if retry_delay(error, 0) is None:
+            return self._drop_mirror(mirror, str(error))
+        if failures >= MIRROR_MAX_FAILURES:
+            return self._drop_mirror(mirror, f"{failures} failed requests in a row ({error})")
+        return False
+
+    def _check_mirrors(self):
+        """
+        Measure each mirror from the connections on it, then drop those far
+        slower per connection than the best one (not while paused or rate limited).
+        """
+        speeds = self.meter.connection_speeds
+        on_mirror = {}
+        with self._lock:
+            for worker_index, (mirror, _) in self._streams.items():
+                if worker_index < len(speeds) and speeds[worker_index] > 0:   # 0 until its first bytes arrive
+                    on_mirror.setdefault(mirror, []).append(speeds[worker_index])
+            for mirror, connection_speeds in on_mirror.items():
+                mirror.sample(connection_speeds)
+        if self.is_paused or self._is_capped():
+            return
+        with self._lock:
+            measured = [m for m in self.mirrors if not m.dropped and m.samples]
+        if len(measured) < 2:
+            return
+        best = max(m.speed for m in measured)
+        for mirror in measured:
+            if mirror.samples >= MIRROR_MIN_SAMPLES and mirror.speed < best * MIRROR_SLOW_FRACTION:
+                self._drop_mirror(mirror, f"too slow ({mirror.speed / 1024:.0f} KB/s per connection, "
+                                          f"best {best / 1024:.0f} KB/s)")
+
+    def _checkpoint(self, ends):
+        """Record the bytes the disk writer has on disk, {segment: end}, in the journal."""
+        for seg, end in ends.items():
+            seg.committed = end
+        self.journal.save()
+
+    def _prepare_segments(self, etag, last_modified, count):
+        """Resume from a matching journal, or allocate the file and plan fresh segments."""
+        journal = DownloadJournal.load(self.save_path)
+        if journal and journal.matches(self.source_url, self.total_size, etag, last_modified):
+            self.journal = journal
+            self.segments = journal.segments
+            done = sum(seg.pos - seg.start for seg in self.segments)
+            self._report_status(f"⏳ Resuming: {done / (1024*1024):.1f} MB already on disk...")
+        else:
+            if journal:
+                journal.delete()
+            if self.hash_algorithms:
+                count = max(count, math.ceil(self.total_size / HASH_PIECE_SIZE))   # Pieces in file order
+            self._report_status(f"Splitting into {count} chunks ({self.total_size / (1024*1024):.1f} MB)...")
+            self._allocate_output()
+            chunk_size = self.total_size // count
+            self.segments = []
+            for i in range(count):
+                start = i * chunk_size
+                end = (start + chunk_size - 1) if i < count - 1 else self.total_size - 1
+                self.segments.append(Segment(start, end))
+            self.journal = DownloadJournal(self.save_path, self.source_url, self.total_size, etag, last_modified)
+            self.journal.segments = self.segments
+            self.journal.save()
+        self.resumed_bytes = sum(seg.pos - seg.start for seg in self.segments)
+
+    def _written_prefix(self):
+        """End of the contiguous run of bytes from offset 0 that are already written."""
+        with self._lock:
+            ranges = sorted((seg.start, seg.written, seg.end) for seg in self.segments)
+        prefix = 0
+        for start, written, end in ranges:
+            if start > prefix:
+                break
+            prefix = max(prefix, written)
+            if written <= end:
+                break
+        return prefix
+
+    def _start_hasher(self):
+        """Hash the written prefix of the file in the background while the workers fill in the rest."""
+        hasher = self._hasher = StreamHasher(self.hash_algorithms)
+        self._hash_stop.clear()
+        self._hash_abort = False
+
+        def _run():
+            try:
+                with open(self.save_path, 'rb', buffering=0) as f:   # No read-ahead past the written bytes
+                    while not self._hash_abort:
+                        stopping = self._hash_stop.is_set()
+                        prefix = self._written_prefix()
+                        if prefix > hasher.offset:
+                            hasher.update_from_file(f, min(prefix, hasher.offset + HASH_PIECE_SIZE))
+                        elif stopping:
+                            return
+                        else:
+                            self._hash_stop.wait(SPEED_SAMPLE_INTERVAL)
+            except Exception as e:
+                self._hasher = None
+                self._report_status(f"Checksum error: {e}")
+
+        self._hash_thread = threading.Thread(target=_run, daemon=True)
+        self._hash_thread.start()
+
+    def _finish_hasher(self, complete):
+        """Stop the follower; once the download is complete, let it hash what is left first."""
+        if self._hash_thread is None:
+            return
+        self._hash_abort = not complete
+        self._hash_stop.set()
+        self._hash_thread.join()
+        self._hash_thread = None
+        hasher, self._hasher = self._hasher, None
+        if complete and hasher and hasher.offset == self.total_size:
+            self.digests = hasher.hexdigests()
+
+    def download(self):
+        """Execute the chunked download. Returns True on success."""
+        if self.own_slot:
+            self._report_status("⏳ Waiting for a free connection...")
+            if not self.budget.wait_acquire(self.host, self._cancel_event):
+                return False
+        try:
+            return self._download()
+        finally:
+            if self.own_slot:
+                self.budget.release(self.host, 1)
+
+    def _download(self):
+        self._report_status("Analyzing file...")
+
+        attempt = 0
+        while True:
+            try:
+                head = self.pool.head(self.url, headers=self.headers, allow_redirects=True, timeout=30)
+                if head.status_code >= 500 or head.status_code == 429:
+                    head.raise_for_status()   # Worth another try; other refusals fall back to a plain GET
+                break
+            except Exception as e:
+                delay = None if self.cancelled else self._retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    self.error = f"{e}" if attempt == 0 else f"{e} (after {attempt} retries)"
+                    self._report_status(f"Error: {self.error}")
+                    return False
+                attempt += 1
+                self.retries += 1
+                self._report_status(f"🔁 Retry {attempt}/{self.max_retries} in {delay:.1f}s ({e})")
+                if self._cancel_event.wait(delay):
+                    return False
+        self.total_size = int(head.headers.get('content-length', 0))
+        accept_ranges = head.headers.get('accept-ranges', 'none').lower()
+        etag = self.etag = head.headers.get('etag')
+        last_modified = self.last_modified = head.headers.get('last-modified')
+
+        if accept_ranges != 'bytes' or self.total_size < 1024 * 1024:
+            return self._single_stream_download(resumable=accept_ranges == 'bytes')
+        if len(self.mirrors) > 1:
+            self._verify_mirrors(etag)
+
+        connections = self.num_chunks
+        if self.adaptive:
+            profiles = self.host_profiles or default_host_profiles()
+            connections = profiles.connections(self.host, self.num_chunks)
+            self.tuner = ConnectionTuner(self.host, profiles, connections, self.max_connections)
+        self._target_connections = connections
+
+        try:
+            self._prepare_segments(etag, last_modified, connections)
+        except OSError as e:
+            self.error = f"Disk error: {e}"
+            self._report_status(self.error)
+            return False
+
+        try:
+            self.writer = DiskWriter(self.save_path, self.buffers, self.write_buffer, self.fsync,
+                                     checkpoint=self._checkpoint)
+        except OSError as e:
+            self.error = f"Disk error: {e}"
+            self._report_status(self.error)
+            return False
+        if self.hash_algorithms:
+            self._start_hasher()
+        self._start_sampler()
+        try:
+            self._run_workers(connections)
+        finally:
+            self._stop_sampler()
+            self.writer.close()
+            if self.writer.error and not self.cancelled:
+                self.error = f"Disk error: {self.writer.error}"
+                self._failed = True
+                self._report_status(self.error)
+            if self.tuner and not self.cancelled:
+                self.tuner.finish()
+            complete = not (self.cancelled or self._failed or self._remote_changed
+                            or any(seg.written <= seg.end for seg in self.segments))
+            if complete and self._hash_thread:
+                self._report_status("🔎 Verifying checksum...")
+            self._finish_hasher(complete)
+
+        if self._remote_changed and not self.cancelled and not self._restarted:
+            # The file changed on the server since the journal was written
+            self._report_status("Remote file changed — restarting download...")
+            self.journal.delete()
+            self._remote_changed = False
+            self._failed = False
+            self.error = None
+            self._restarted = True
+            return self._download()
+
+        if not complete:
+            return False
+        if self.hash_algorithms and not self.digests:
+            self.error = "could not compute the checksum"
+            return False
+
+        self.journal.delete()
+        self._report_status("✅ Download complete!")
+        return True
+
+    @property
+    def is_resumable(self):
+        """True if a journal for the partial file is on disk."""
+        return self.journal is not None and os.path.exists(self.journal.path)
+
+    def _single_stream_download(self, resumable=False):
+        """
+        Fallback for small files and servers without ranges: one connection,
+        retried with backoff like the ranged workers. With `resumable` (the
+        server accepts ranges) a retry continues from the first missing byte,
+        with If-Range so a changed file comes back whole; otherwise it starts over.
+        """
+        self._report_status("Downloading (single stream)...")
+        stale = DownloadJournal.load(self.save_path)
+        if stale:
+            stale.delete()
+        self.downloaded_bytes = [0]
+        self._hasher = StreamHasher(self.hash_algorithms) if self.hash_algorithms else None
+        try:
+            self.writer = DiskWriter(self.save_path, self.buffers, self.write_buffer, self.fsync, truncate=True)
+        except OSError as e:
+            self.error = f"Disk error: {e}"
+            self._report_status(self.error)
+            return False
+        self._start_sampler()
+        attempt = 0
+        try:
+            while True:
+                done_before = self.downloaded_bytes[0]
+                try:
+                    if not self._stream_body(resumable):
+                        return False
+                    break
+                except Exception as e:
+                    if self.cancelled:
+                        return False
+                    if self.downloaded_bytes[0] > done_before:
+                        attempt = 0   # The connection made progress, so start the backoff over
+                    delay = None if self.writer.error else self._retry_delay(e, attempt)
+                    if delay is None or attempt >= self.max_retries:
+                        self.error = f"{e}" if attempt == 0 else f"{e} (after {attempt} retries)"
+                        self._report_status(f"Download error: {self.error}")
+                        return False
+                    attempt += 1
+                    self.retries += 1
+                    self._report_status(f"🔁 Retry {attempt}/{self.max_retries} in {delay:.1f}s ({e})")
+                    if self._cancel_event.wait(delay):
+                        return False
+        finally:
+            self._stop_sampler()
+            self.writer.close()
+        if self.writer.error:
+            self.error = f"Disk error: {self.writer.error}"
+            self._report_status(self.error)
+            return False
+        try:
+            if os.path.getsize(self.save_path) > self.downloaded_bytes[0]:
+                os.truncate(self.save_path, self.downloaded_bytes[0])   # A restart got a shorter body
+        except OSError as e:
+            self.error = f"Disk error: {e}"
+            return False
+        if self._hasher:
+            self.digests = self._hasher.hexdigests()
+        return True
+
+    def _stream_body(self, resumable):
+        """
+        One GET for the rest of the file into the disk writer, from the first
+        missing byte when resumable. Returns False if cancelled; raises on
+        network or disk errors.
+        """
+        offset = self.downloaded_bytes[0]
+        headers = dict(self.headers)
+        if offset and resumable:
+            headers['Range'] = f'bytes={offset}-'
+            validator = self.etag if self.etag and not self.etag.startswith('W/') else self.last_modified
+            if validator:
+                headers['If-Range'] = validator
+        with self.pool.get(self.url, headers=headers, stream=True, timeout=120) as resp:
+            resp.raise_for_status()
+            if offset and resp.status_code != 206:
+                # No ranges after all, or the file changed: the whole body is coming again
+                self._report_status("Downloading (single stream) from the start...")
+                offset = self.downloaded_bytes[0] = 0
+                self.meter = SpeedMeter()
+                self._hasher = StreamHasher(self.hash_algorithms) if self.hash_algorithms else None
+            if not offset:
+                self.total_size = int(resp.headers.get('content-length', 0))
+                self.etag = resp.headers.get('etag')
+                self.last_modified = resp.headers.get('last-modified')
+
+            readinto = body_reader(resp)
+            buffer, filled = None, 0
+            try:
+                while True:
+                    self._pause_event.wait()
+                    if self.cancelled:
+                        return False
+                    if buffer is None:
+                        buffer, filled = self.buffers.acquire(), 0
+                    with memoryview(buffer) as view:
+                        n = readinto(view[filled:])
+                        if self._hasher:
+                            self._hasher.update(view[filled:filled + n])
+                    if not n:
+                        break
+                    filled += n
+                    self.downloaded_bytes[0] += n
+                    self._throttle(n)
+                    if filled == len(buffer):
+                        self.writer.write(offset, buffer, filled)
+                        offset += filled
+                        buffer = None
+            finally:
+                if buffer is not None:
+                    if filled:
+                        self.writer.write(offset, buffer, filled)
+                    else:
+                        self.buffers.release(buffer)
+        return True
+
+
+# ==============================================================================
+#  STREAM MANIFESTS — HLS (.m3u8) and DASH (.mpd) segment lists
+# ==============================================================================
+
+class ManifestError(Exception):
+    """A manifest the native stream engine leaves to yt-dlp (live, DRM, unsupported layout)."""
+
+
+class SegmentKey:
+    """AES-128 key of HLS segments: where to fetch it and the IV to use."""
+
+    def __init__(self, uri, iv=None):
+        self.uri = uri
+        self.iv = iv               # 16 bytes, or None to use the segment's media sequence number
+
+
+class MediaSegment:
+    """One piece of a stream: a URL, optionally a byte range of it, and its decryption key."""
+
+    def __init__(self, url, byte_range=None, key=None, sequence=0):
+        self.url = url
+        self.byte_range = byte_range   # (first, last) byte, inclusive, or None for the whole URL
+        self.key = key
+        self.sequence = sequence       # Media sequence number (the default AES IV)
+
+
+class MediaTrack:
+    """The ordered segments of one rendition; written back to back they form a playable file."""
+
+    def __init__(self, track_id, kind, ext, segments, init=None, bandwidth=0, duration=None):
+        self.id = track_id
+        self.kind = kind               # "video", "audio" or "av" (muxed)
+        self.ext = ext
+        self.segments = segments
+        self.init = init               # Initialization segment (fMP4 / DASH), or None
+        self.bandwidth = bandwidth
+        self.duration = duration       # Seconds, when the manifest says
+
+    @property
+    def parts(self):
+        """Everything to fetch, in file order: the init segment first."""
+        return ([self.init] if self.init else []) + self.segments
+
+    @property
+    def is_single_file(self):
+        """True if the track is one plain file (DASH SegmentBase), best left to the chunked engine."""
+        parts = self.parts
+        return len(parts) == 1 and parts[0].byte_range is None and parts[0].key is None
+
+    @property
+    def fingerprint(self):
+        """Identifies the segment list regardless of per-request tokens in the URLs' query strings."""
+        digest = hashlib.sha1()
+        for part in self.parts:
+            digest.update(f"{urllib.parse.urlparse(part.url).path}{part.byte_range}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+
+HLS_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+DASH_TEMPLATE_RE = re.compile(r'\$(RepresentationID|Number|Time|Bandwidth)(?:%0(\d+)d)?\$')
+ISO_DURATION_RE = re.compile(
+    r'P(?:(\d+(?:\.\d+)?)D)?(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?'
+)
+
+
+def _hls_attributes(line):
+    _, _, attrs = line.partition(':')
+    return {name: value.strip('"') for name, value in HLS_ATTRIBUTE_RE.findall(attrs)}
+
+
+def parse_hls_master(text, base_url):
+    """
+    Pick the highest-bandwidth variant of an HLS master playlist.
+    Returns (variant playlist URL, audio rendition URL or None when the
+    variant carries its own audio).
+    """
+    variants, audio_groups = [], {}
+    stream_inf = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            stream_inf = _hls_attributes(line)
+        elif line.startswith('#EXT-X-MEDIA:'):
+            attrs = _hls_attributes(line)
+            if attrs.get('TYPE') == 'AUDIO':
+                audio_groups.setdefault(attrs.get('GROUP-ID'), []).append(attrs)
+        elif line and not line.startswith('#') and stream_inf is not None:
+            variants.append((stream_inf, urllib.parse.urljoin(base_url, line)))
+            stream_inf = None
+    if not variants:
+        raise ManifestError("master playlist lists no variants")
+    attrs, url = max(variants, key=lambda v: int(v[0].get('BANDWIDTH') or 0))
+    renditions = audio_groups.get(attrs.get('AUDIO')) or []
+    audio = next((r for r in renditions if r.get('DEFAULT') == 'YES'), renditions[0] if renditions else None)
+    if audio is None or not audio.get('URI'):
+        return url, None      # Audio is muxed into the variant itself
+    return url, urllib.parse.urljoin(base_url, audio['URI'])
+
+
+def parse_hls_media(text, base_url, track_id="video", kind="av"):
+    """Parse an HLS media playlist into a MediaTrack. Raises ManifestError for live or DRM playlists."""
+    segments, init, key = [], None, None
+    sequence = 0
+    duration = 0.0
+    byte_range = None
+    range_end = {}            # URL -> offset after its last sub-range (EXT-X-BYTERANGE without @offset)
+    ended = False
+
+    def sub_range(spec, url):
+        length, _, offset = spec.partition('@')
+        start = int(offset) if offset else range_end.get(url, 0)
+        range_end[url] = start + int(length)
+        return start, start + int(length) - 1
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            sequence = int(line.partition(':')[2])
+        elif line.startswith('#EXTINF:'):
+            duration += float(line.partition(':')[2].split(',')[0] or 0)
+        elif line.startswith('#EXT-X-KEY:'):
+            attrs = _hls_attributes(line)
+            method = attrs.get('METHOD', 'NONE')
+            if method == 'NONE':
+                key = None
+            elif method == 'AES-128' and attrs.get('KEYFORMAT', 'identity') == 'identity':
+                iv = attrs.get('IV')
+                key = SegmentKey(urllib.parse.urljoin(base_url, attrs['URI']),
+                                 bytes.fromhex(iv[2:].zfill(32)) if iv else None)
+            else:
+                raise ManifestError(f"{method} encryption is not supported")
+        elif line.startswith('#EXT-X-MAP:'):
+            attrs = _hls_attributes(line)
+            url = urllib.parse.urljoin(base_url, attrs['URI'])
+            rng = sub_range(attrs['BYTERANGE'], url) if attrs.get('BYTERANGE') else None
+            if init is not None and (init.url, init.byte_range) != (url, rng):
+                raise ManifestError("playlist switches initialization segments")
+            init = MediaSegment(url, rng, key)
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            byte_range = line.partition(':')[2]
+        elif line.startswith('#EXT-X-ENDLIST'):
+            ended = True
+        elif not line.startswith('#'):
+            url = urllib.parse.urljoin(base_url, line)
+            rng = sub_range(byte_range, url) if byte_range else None
+            byte_range = None
+            segments.append(MediaSegment(url, rng, key, sequence))
+            sequence += 1
+
+    if not ended:
+        raise ManifestError("live stream (playlist has no #EXT-X-ENDLIST)")
+    if not segments:
+        raise ManifestError("playlist has no segments")
+    if init is not None:
+        ext = 'm4a' if kind == 'audio' else 'mp4'
+    else:
+        ext = os.path.splitext(urllib.parse.urlparse(segments[0].url).path)[1].lower().lstrip('.')
+        ext = ext if ext in ('aac', 'mp3', 'ac3', 'ec3') else 'ts'
+    return MediaTrack(track_id, kind, ext, segments, init, duration=duration or None)
+
+
+def parse_iso_duration(value):
+    """Seconds in an ISO 8601 duration such as PT1H2M3.5S, or None."""
+    match = ISO_DURATION_RE.fullmatch((value or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes, seconds = (float(g or 0) for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def _xml_children(element, name):
+    return [child for child in element if child.tag.rsplit('}', 1)[-1] == name]
+
+
+def _xml_child(element, name):
+    children = _xml_children(element, name)
+    return children[0] if children else None
+
+
+def _dash_base_url(element, base_url):
+    base = _xml_child(element, 'BaseURL')
+    if base is not None and base.text and base.text.strip():
+        return urllib.parse.urljoin(base_url, base.text.strip())
+    return base_url
+
+
+def _dash_range(spec):
+    if not spec:
+        return None
+    first, _, last = spec.partition('-')
+    return int(first), int(last)
+
+
+def parse_dash_manifest(text, base_url):
+    """
+    Parse a static single-period DASH manifest into MediaTracks: the
+    highest-bandwidth video and audio representations. Raises ManifestError
+    for live, multi-period or DRM-protected manifests.
+    """
+    root = ET.fromstring(text)
+    if root.get('type') == 'dynamic':
+        raise ManifestError("live stream (dynamic MPD)")
+    periods = _xml_children(root, 'Period')
+    if len(periods) != 1:
+        raise ManifestError("multi-period manifests are not supported")
+    period = periods[0]
+    duration = parse_iso_duration(period.get('duration') or root.get('mediaPresentationDuration'))
+    base = _dash_base_url(period, _dash_base_url(root, base_url))
+
+    best = {}   # kind -> (bandwidth, AdaptationSet, Representation, mime type)
+    for adaptation in _xml_children(period, 'AdaptationSet'):
+        for rep in _xml_children(adaptation, 'Representation'):
+            mime = rep.get('mimeType') or adaptation.get('mimeType') or ''
+            kind = rep.get('contentType') or adaptation.get('contentType') or mime.split('/')[0]
+            bandwidth = int(rep.get('bandwidth') or 0)
+            if kind in ('video', 'audio') and (kind not in best or bandwidth > best[kind][0]):
+                best[kind] = (bandwidth, adaptation, rep, mime)
+    if not best:
+        raise ManifestError("manifest has no audio or video")
+    return [_dash_track(kind, *best[kind], period, base, duration) for kind in ('video', 'audio') if kind in best]
+
+
+def _dash_track(kind, bandwidth, adaptation, rep, mime, period, base_url, duration):
+    if _xml_children(adaptation, 'ContentProtection') or _xml_children(rep, 'ContentProtection'):
+        raise ManifestError("DRM-protected stream")
+    rep_id = rep.get('id', '')
+    base = _dash_base_url(rep, _dash_base_url(adaptation, base_url))
+    ext = {'video/mp4': 'mp4', 'audio/mp4': 'm4a', 'video/webm': 'webm', 'audio/webm': 'webm'}.get(
+        mime, 'mp4' if kind == 'video' else 'm4a')
+
+    # SegmentTemplate / SegmentList may sit on the Period, AdaptationSet or Representation;
+    # the innermost attributes win
+    template, timeline, segment_list = {}, None, None
+    for element in (period, adaptation, rep):
+        tpl = _xml_child(element, 'SegmentTemplate')
+        if tpl is not None:
+            template.update(tpl.attrib)
+            if _xml_child(tpl, 'SegmentTimeline') is not None:
+                timeline = _xml_child(tpl, 'SegmentTimeline')
+        if _xml_child(element, 'SegmentList') is not None:
+            segment_list = _xml_child(element, 'SegmentList')
+
+    def fill(pattern, number=0, time=0):
+        def sub(match):
+            name, width = match.group(1), int(match.group(2) or 0)
+            if name == 'RepresentationID':
+                return rep_id
+            return str({'Number': number, 'Time': time, 'Bandwidth': bandwidth}[name]).zfill(width)
+        return urllib.parse.urljoin(base, DASH_TEMPLATE_RE.sub(sub, pattern).replace('$$', '$'))
+
+    init, segments = None, []
+    if template.get('media'):
+        if template.get('initialization'):
+            init = MediaSegment(fill(template['initialization']))
+        number = int(template.get('startNumber', 1))
+        timescale = int(template.get('timescale', 1))
+        if timeline is not None:
+            time_pos = 0
+            period_end = int(template.get('presentationTimeOffset', 0)) + (duration or 0) * timescale
+            for s in _xml_children(timeline, 'S'):
+                time_pos = int(s.get('t', time_pos))
+                length = int(s.get('d'))
+                repeat = int(s.get('r', 0))
+                if repeat < 0:   # Repeat until the end of the period
+                    repeat = max(0, math.ceil((period_end - time_pos) / length) - 1)
+                for _ in range(repeat + 1):
+                    segments.append(MediaSegment(fill(template['media'], number, time_pos), sequence=number))
+                    time_pos += length
+                    number += 1
+        else:
+            if not template.get('duration') or not duration:
+                raise ManifestError("segment count is unknown")
+            count = math.ceil(duration * timescale / int(template['duration']))
+            segments = [MediaSegment(fill(template['media'], n), sequence=n) for n in range(number, number + count)]
+    elif segment_list is not None:
+        init_element = _xml_child(segment_list, 'Initialization')
+        if init_element is not None:
+            init = MediaSegment(urllib.parse.urljoin(base, init_element.get('sourceURL') or ''),
+                                _dash_range(init_element.get('range')))
+        for i, seg in enumerate(_xml_children(segment_list, 'SegmentURL')):
+            segments.append(MediaSegment(urllib.parse.urljoin(base, seg.get('media') or ''),
+                                         _dash_range(seg.get('mediaRange')), sequence=i))
+    else:
+        segments = [MediaSegment(base)]   # SegmentBase or a bare BaseURL: one plain file
+    if not segments:
+        raise ManifestError("representation has no segments")
+    track_id = re.sub(r'[^\w.-]', '_', rep_id) or kind
+    return MediaTrack(track_id, kind, ext, segments, init, bandwidth, duration)
+
+
+def has_fast_aes():
+    """True if pycryptodome(x) is installed; yt-dlp's pure-Python AES is far too slow for whole streams."""
+    try:
+        from yt_dlp.dependencies import Cryptodome
+        return bool(Cryptodome.AES)
+    except Exception:
+        return False
+
+
+def load_manifest(url, pool=None, headers=None):
+    """
+    Fetch an HLS or DASH manifest and return the MediaTracks to download:
+    the best video, plus the audio track when it is separate. Raises
+    ManifestError for streams the native engine leaves to yt-dlp.
+    """
+    pool = pool or default_connection_pool()
+
+    def fetch(manifest_url):
+        resp = pool.get(manifest_url, headers=headers, timeout=30)
+        resp.raise_for_status()
+        return resp.text, resp.url
+
+    text, final_url = fetch(url)
+    try:
+        if text.lstrip('\ufeff \r\n').startswith('#EXTM3U'):
+            if '#EXT-X-STREAM-INF' not in text:
+                return [parse_hls_media(text, final_url)]
+            video_url, audio_url = parse_hls_master(text, final_url)
+            tracks = [parse_hls_media(*fetch(video_url), "video", "video" if audio_url else "av")]
+            if audio_url:
+                tracks.append(parse_hls_media(*fetch(audio_url), "audio", "audio"))
+            return tracks
+        if '<MPD' in text[:4096]:
+            return parse_dash_manifest(text, final_url)
+    except (ValueError, KeyError, ET.ParseError) as e:
+        raise ManifestError(f"unreadable manifest: {e}")
+    raise ManifestError("not an HLS or DASH manifest")
+
+
+# ==============================================================================
+#  SEGMENTED DOWNLOADER — parallel HLS / DASH segments, written in order
+# ==============================================================================
+
+class SegmentedDownloader:
+    """
+    Downloads the segments of one MediaTrack over several pooled
+    connections and writes them to a single file in playlist order.
+    Workers claim segments in order and may run up to `window` segments
+    ahead of the writer; finished segments wait in a reorder buffer until
+    every earlier one is on disk, so memory stays bounded however long the
+    playlist is. AES-128 segments are decrypted as they arrive. The
+    journal records how many segments are on disk, so an interrupted
+    download resumes at the next segment index. Failed segments are
+    retried with exponential backoff. Same progress, pause / resume /
+    cancel and budget / limiter / own_slot interface as ChunkedDownloader; the total
+    size is estimated from the segments fetched so far until the last one.
+    With `hash_algorithms` the writer hashes the file as it writes it
+    (after re-reading the part already on disk when resuming).
+    """
+
+    def __init__(self, track, save_path, workers=SEGMENT_WORKERS, window=SEGMENT_WINDOW,
+                 progress_callback=None, status_callback=None,
+                 max_retries=MAX_RETRIES, backoff_base=RETRY_BACKOFF_BASE,
+                 backoff_max=RETRY_BACKOFF_MAX, pool=None,
+                 budget=None, limiter=None, rate_limit=None,
+                 headers=None, source_url=None, hash_algorithms=None, own_slot=False):
+        self.track = track
+        self.parts = track.parts
+        self.source_url = source_url or self.parts[0].url
+        self.headers = dict(headers or {})
+        self.host = urllib.parse.urlparse(self.parts[0].url).hostname or ''
+        self.save_path = save_path
+        self.workers = workers
+        self.window = window
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.pool = pool or default_connection_pool()
+        self.budget = budget
+        self.own_slot = own_slot and budget is not None
+        self.limiter = limiter
+        self.rate_bucket = TokenBucket(rate_limit)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.error = None
+        self.downloaded_bytes = []     # Bytes fetched by each worker (one writer per slot)
+        self.resumed_bytes = 0         # Bytes already on disk from a previous session
+        self.journal = None
+        self.cancelled = False
+        self.next_index = 0            # Next segment to write
+        self.offset = 0                # Bytes written so far
+        self._resumed_parts = 0
+        self._claim_index = 0          # Next segment to hand to a worker
+        self._buffer = {}              # Segment index -> bytes, waiting for earlier segments
+        self._fetched_parts = 0
+        self._fetched_bytes = 0
+        self._wasted_bytes = 0         # Bytes of attempts that failed and were fetched again
+        self._keys = {}                # Key URI -> AES key
+        self.hash_algorithms = tuple(hash_algorithms or ())
+        self.digests = {}              # Algorithm -> hex digest, set when a hashed download completes
+        self._hasher = None
+        self._failed = False
+        self._pause_event = threading.Event()
+        self._pause_event.set()
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self.meter = SpeedMeter()
+        self._sampler_stop = threading.Event()
+        self._sampler_thread = None
+
+    def pause(self):
+        """Pause the download."""
+        self._pause_event.clear()
+        self._report_status("⏸️ Paused")
+
+    def resume(self):
+        """Resume the download."""
+        self._pause_event.set()
+        self._report_status("⏳ Resuming...")
+
+    def cancel(self):
+        """Cancel the download."""
+        self.cancelled = True
+        self._cancel_event.set()
+        self._pause_event.set()
+
+    @property
+    def is_paused(self):
+        return not self._pause_event.is_set()
+
+    def set_rate_limit(self, rate):
+        """Cap this download at `rate` bytes/s (None for unlimited); applies immediately."""
+        self.rate_bucket.set_rate(rate)
+
+    def _throttle(self, n):
+        if self.limiter:
+            self.limiter.consume(self.host, n, self._cancel_event)
+        self.rate_bucket.consume(n, self._cancel_event)
+
+    def _report_status(self, text):
+        if self.status_callback:
+            self.status_callback(text)
+
+    @property
+    def bytes_done(self):
+        if self.next_index >= len(self.parts):
+            return self.offset
+        return self.resumed_bytes + sum(self.downloaded_bytes) - self._wasted_bytes
+
+    @property
+    def total_size(self):
+        """Exact once every segment is written; until then extrapolated from the segments fetched so far."""
+        if self.next_index >= len(self.parts):
+            return self.offset
+        parts = self._resumed_parts + self._fetched_parts
+        if not parts:
+            return 0
+        estimate = (self.resumed_bytes + self._fetched_bytes) * len(self.parts) // parts
+        return max(estimate, self.bytes_done)
+
+    def stats(self):
+        """Snapshot of progress: bytes done/total, smoothed speed, per-connection speeds, ETA."""
+        done, total = self.bytes_done, self.total_size
+        return {
+            'downloaded': done,
+            'total': total,
+            'speed': self.meter.speed,
+            'connection_speeds': list(self.meter.connection_speeds),
+            'eta': self.meter.eta(total - done) if total else None,
+        }
+
+    def _report_progress(self):
+        if self.progress_callback:
+            self.progress_callback(self.bytes_done, self.total_size)
+
+    def _start_sampler(self):
+        def _run():
+            while not self._sampler_stop.wait(SPEED_SAMPLE_INTERVAL):
+                self.meter.sample(self.downloaded_bytes)
+                self._report_progress()
+
+        self._sampler_stop.clear()
+        self._sampler_thread = threading.Thread(target=_run, daemon=True)
+        self._sampler_thread.start()
+
+    def _stop_sampler(self):
+        self._sampler_stop.set()
+        if self._sampler_thread:
+            self._sampler_thread.join()
+            self._sampler_thread = None
+        self._report_progress()
+
+    @property
+    def is_resumable(self):
+        """True if a journal for the partial file is on disk."""
+        return self.journal is not None and os.path.exists(self.journal.path)
+
+    def _open_output(self):
+        """Open the output file, positioned after the segments a matching journal says are on disk."""
+        fingerprint = self.track.fingerprint
+        journal = SegmentJournal.load(self.save_path)
+        if journal and journal.matches(self.source_url, len(self.parts), fingerprint):
+            f = open(self.save_path, 'r+b')
+            f.truncate(journal.offset)   # Drop whatever was written after the last checkpoint
+            if self._hasher:
+                self._hasher.update_from_file(f, journal.offset)
+            f.seek(journal.offset)
+            self.journal = journal
+            self.next_index = self._claim_index = self._resumed_parts = journal.next_index
+            self.offset = self.resumed_bytes = journal.offset
+            self._report_status(f"⏳ Resuming at segment {journal.next_index + 1}/{len(self.parts)}...")
+            return f
+        stale = load_journal(self.save_path)
+        if stale:
+            stale.delete()
+        f = open(self.save_path, 'wb')
+        self.journal = SegmentJournal(self.save_path, self.source_url, len(self.parts), fingerprint)
+        self.journal.save()
+        return f
+
+    def download(self):
+        """Fetch every segment and write them in order. Returns True on success."""
+        if self.own_slot:
+            self._report_status("⏳ Waiting for a free connection...")
+            if not self.budget.wait_acquire(self.host, self._cancel_event):
+                return False
+        try:
+            return self._download()
+        finally:
+            if self.own_slot:
+                self.budget.release(self.host, 1)
+
+    def _download(self):
+        self._hasher = StreamHasher(self.hash_algorithms) if self.hash_algorithms else None
+        try:
+            f = self._open_output()
+        except OSError as e:
+            self.error = f"Disk error: {e}"
+            self._report_status(self.error)
+            return False
+
+        wanted = max(1, min(self.workers, len(self.parts) - self.next_index))
+        extra = wanted - 1
+        if self.budget is not None and extra:
+            extra = self.budget.acquire(self.host, extra)
+        self.downloaded_bytes = [0] * (1 + extra)
+        self._report_status(f"Downloading {len(self.parts)} segments over {1 + extra} connections...")
+        threads = [threading.Thread(target=self._worker, args=(i,), daemon=True) for i in range(1 + extra)]
+        complete = False
+        self._start_sampler()
+        try:
+            for thread in threads:
+                thread.start()
+            with f:
+                complete = self._write_parts(f, threads)
+        except OSError as e:
+            self.error = f"Disk error: {e}"
+            self._failed = True
+            complete = False
+        finally:
+            if not complete:
+                with self._cond:
+                    self._failed = self._failed or not self.cancelled   # Stop the workers
+                    self._cond.notify_all()
+                self._pause_event.set()
+            for thread in threads:
+                thread.join()
+            self._buffer.clear()
+            if self.budget is not None and extra:
+                self.budget.release(self.host, extra)
+            self._stop_sampler()
+
+        if not complete:
+            return False
+        if self._hasher:
+            self.digests = self._hasher.hexdigests()
+        self.journal.delete()
+        self._report_status("✅ Download complete!")
+        return True
+
+    def _write_parts(self, f, threads):
+        """Write segments to f as they become available, in order. Returns True once all are written."""
+        last_checkpoint = time.monotonic()
+        try:
+            while self.next_index < len(self.parts):
+                with self._cond:
+                    while self.next_index not in self._buffer:
+                        if self.cancelled or self._failed or not any(t.is_alive() for t in threads):
+                            return False
+                        self._cond.wait(0.5)
+                    data = self._buffer.pop(self.next_index)
+                f.write(data)
+                if self._hasher:
+                    self._hasher.update(data)
+                with self._cond:
+                    self.offset += len(data)
+                    self.next_index += 1
+                    self._cond.notify_all()   # The window moved on
+                if time.monotonic() - last_checkpoint >= JOURNAL_INTERVAL:
+                    self._checkpoint(f)
+                    last_checkpoint = time.monotonic()
+            return True
+        finally:
+            self._checkpoint(f)
+
+    def _checkpoint(self, f):
+        """Flush the written segments to disk, then record them in the journal."""
+        try:
+            f.flush()
+            os.fsync(f.fileno())
+            self.journal.next_index = self.next_index
+            self.journal.offset = self.offset
+            self.journal.save()
+        except (OSError, ValueError):
+            pass
+
+    def _worker(self, worker_index):
+        """Claim the next segment (staying within the window), fetch it and hand it to the writer."""
+        while True:
+            self._pause_event.wait()
+            with self._cond:
+                while (self._claim_index < len(self.parts) and not self.cancelled and not self._failed
+                       and self._claim_index >= self.next_index + self.window):
+                    self._cond.wait(0.5)
+                if self.cancelled or self._failed or self._claim_index >= len(self.parts):
+                    return
+                index = self._claim_index
+                self._claim_index += 1
+            data = self._fetch_with_retries(worker_index, index)
+            if data is None:
+                return
+            with self._cond:
+                self._buffer[index] = data
+                self._fetched_parts += 1
+                self._fetched_bytes += len(data)
+                self._cond.notify_all()
+
+    def _fetch_with_retries(self, worker_index, index):
+        """Fetch one segment, retrying after transient errors. Returns None if cancelled or failed."""
+        attempt = 0
+        while True:
+            counted = self.downloaded_bytes[worker_index]
+            try:
+                return self._fetch_part(worker_index, self.parts[index])
+            except Exception as e:
+                with self._lock:
+                    self._wasted_bytes += self.downloaded_bytes[worker_index] - counted
+                if self.cancelled or self._failed:
+                    return None
+                delay = retry_delay(e, attempt, self.backoff_base, self.backoff_max)
+                if delay is None or attempt >= self.max_retries:
+                    with self._cond:
+                        self.error = f"{e}" if attempt == 0 else f"{e} (after {attempt} retries)"
+                        self._failed = True
+                        self._cond.notify_all()
+                    self._report_status(f"Segment {index + 1} failed: {self.error}")
+                    return None
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                self._report_status(
+                    f"🔁 Segment {index + 1}: retry {attempt}/{self.max_retries} in {delay:.1f}s ({e})"
+                )
+                if self._cancel_event.wait(delay):
+                    return None
+
+    def _fetch_part(self, worker_index, part):
+        """Download one segment into memory and decrypt it. Returns None if cancelled."""
+        headers = dict(self.headers)
+        if part.byte_range:
+            headers['Range'] = 'bytes=%d-%d' % part.byte_range
+        with self.pool.get(part.url, headers=headers, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            expected = int(resp.headers.get('content-length') or 0)
+            if resp.headers.get('content-encoding'):
+                expected = 0   # Length of the encoded body, not of the decoded bytes
+            data = self._read_part(worker_index, resp, expected)
+            if data is None:
+                return None
+            release_body(resp)
+            partial = resp.status_code == 206
+        if expected and len(data) < expected:
+            raise IOError("connection closed before the segment was complete")
+        if part.byte_range and not partial:
+            data = data[part.byte_range[0]:part.byte_range[1] + 1]   # Server ignored the Range header
+        if part.key:
+            data = self._decrypt(part, data)
+        return data
+
+    def _read_part(self, worker_index, resp, expected):
+        """
+        Read a segment body. With its length known it goes from the socket
+        straight into one bytearray of that size; otherwise in
+        RECV_BUFFER_SIZE reads appended to a growing one.
+        """
+        readinto = body_reader(resp)
+        data = bytearray(expected or RECV_BUFFER_SIZE)
+        view = memoryview(data)
+        filled = 0
+        try:
+            while True:
+                self._pause_event.wait()
+                if self.cancelled:
+                    return None
+                if filled == len(data):
+                    if expected:
+                        break
+                    view.release()
+                    data.extend(bytes(len(data)))   # Unknown length: double the buffer
+                    view = memoryview(data)
+                n = readinto(view[filled:filled + RECV_BUFFER_SIZE])
+                if not n:
+                    break
+                filled += n
+                self.downloaded_bytes[worker_index] += n
+                self._throttle(n)
+        finally:
+            view.release()
+        del data[filled:]
+        return data
+
+    def _decrypt(self, part, data):
+        from yt_dlp.aes import aes_cbc_decrypt_bytes, unpad_pkcs7   # pycryptodomex under the hood (see has_fast_aes)
+        iv = part.key.iv or part.sequence.to_bytes(16, 'big')
+        return unpad_pkcs7(aes_cbc_decrypt_bytes(data, self._key(part.key.uri), iv))
+
+    def _key(self, uri):
+        """The AES key at uri, fetched once per download."""
+        with self._lock:
+            key = self._keys.get(uri)
+        if key is None:
+            resp = self.pool.get(uri, headers=self.headers, timeout=30)
+            resp.raise_for_status()
+            key = resp.content
+            if len(key) != 16:
+                raise IOError(f"AES-128 key is {len(key)} bytes, expected 16")
+            with self._lock:
+                self._keys[uri] = key
+        return key
+
+
+# ==============================================================================
+#  DOWNLOAD SCHEDULER — priorities plus global / per-host connection budgets
+# ==============================================================================
+
+class ConnectionBudget:
+    """Global and per-host connection limits shared by every active download."""
+
+    def __init__(self, total=GLOBAL_CONNECTIONS, per_host=HOST_CONNECTIONS):
+        self.total = total
+        self.per_host = per_host
+        self.on_release = None      # Called (outside the lock) whenever slots free up
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._by_host = {}
+
+    def available(self, host):
+        with self._lock:
+            return self._available(host)
+
+    def _available(self, host):
+        return max(0, min(self.total - self._in_use, self.per_host - self._by_host.get(host, 0)))
+
+    def acquire(self, host, want):
+        """Take up to `want` connection slots for host without waiting. Returns how many were granted."""
+        with self._lock:
+            granted = min(want, self._available(host))
+            if granted > 0:
+                self._in_use += granted
+                self._by_host[host] = self._by_host.get(host, 0) + granted
+            return granted
+
+    def wait_acquire(self, host, cancel_event):
+        """Wait for one slot for host. Returns False if cancel_event is set first."""
+        while not self.acquire(host, 1):
+            if cancel_event.wait(SPEED_SAMPLE_INTERVAL):
+                return False
+        return True
+
+    def release(self, host, count):
+        if count <= 0:
+            return
+        with self._lock:
+            self._in_use -= count
+            left = self._by_host.get(host, 0) - count
+            if left > 0:
+                self._by_host[host] = left
+            else:
+                self._by_host.pop(host, None)
+        if self.on_release:
+            self.on_release()
+
+
+class DownloadJob:
+    """A queued download: the function to run, its host and its place in the queue."""
+
+    def __init__(self, func, host, priority=PRIORITY_NORMAL):
+        self.func = func
+        self.host = host
+        self.priority = priority
+        self.state = "pending"     # pending -> running -> done, or cancelled
+
+
+class DownloadScheduler:
+    """
+    Runs queued downloads under a global connection budget and per-host caps.
+    Pending jobs are ordered by priority, then queue order. The first job whose
+    host still has a free connection starts whenever a download slot opens, so
+    downloads from different hosts run side by side while downloads from the
+    same host share that host's connections. Each running job holds one
+    connection slot; downloaders take extra slots from `budget` themselves.
+    """
+
+    def __init__(self, max_active=MAX_CONCURRENT_DL, budget=None):
+        self.max_active = max_active
+        self.budget = budget or ConnectionBudget()
+        self.budget.on_release = self._dispatch
+        self._lock = threading.RLock()
+        self._pending = []
+        self._active = 0
+
+    def submit(self, func, host, priority=PRIORITY_NORMAL):
+        """Queue func(job) to run for host. Returns the DownloadJob."""
+        job = DownloadJob(func, host, priority)
+        with self._lock:
+            index = len(self._pending)
+            while index > 0 and self._pending[index - 1].priority > priority:
+                index -= 1
+            self._pending.insert(index, job)
+        self._dispatch()
+        return job
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending)
+
+    def cancel(self, job):
+        """Drop a job that hasn't started. Returns False if it is already running."""
+        with self._lock:
+            if job.state != "pending":
+                return False
+            self._pending.remove(job)
+            job.state = "cancelled"
+            return True
+
+    def move(self, job, offset):
+        """Move a pending job up (negative offset) or down the queue, adopting its new neighbour's priority."""
+        with self._lock:
+            if job.state != "pending":
+                return False
+            index = self._pending.index(job)
+            new_index = max(0, min(len(self._pending) - 1, index + offset))
+            if new_index == index:
+                return False
+            self._pending.remove(job)
+            self._pending.insert(new_index, job)
+            neighbour = self._pending[new_index + 1] if offset < 0 else self._pending[new_index - 1]
+            job.priority = neighbour.priority
+            return True
+
+    def run_next(self, job):
+        """Put a pending job at the head of the queue with high priority."""
+        with self._lock:
+            if job.state != "pending":
+                return False
+            self._pending.remove(job)
+            self._pending.insert(0, job)
+            job.priority = PRIORITY_HIGH
+        self._dispatch()
+        return True
+
+    def _dispatch(self):
+        """Start as many pending jobs as the slot and connection budgets allow."""
+        with self._lock:
+            for job in list(self._pending):
+                if self._active >= self.max_active:
+                    break
+                if not self.budget.acquire(job.host, 1):
+                    continue   # Host is saturated; let a job for another host go first
+                self._pending.remove(job)
+                job.state = "running"
+                self._active += 1
+                threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            job.func(job)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                job.state = "done"
+                self._active -= 1
+            self.budget.release(job.host, 1)   # Also re-dispatches
+
+
+# ==============================================================================
+#  METADATA CACHE — persistent LRU + TTL cache of yt-dlp info dicts
+# ==============================================================================
+
+class InfoCache:
+    """
+    yt-dlp info dicts keyed by clean_url(), persisted in the app data dir.
+    Each entry is its own JSON file; a small index keeps the LRU order and
+    the time each entry was stored. Entries older than `ttl` are misses.
+    """
+
+    DROP_KEYS = ('thumbnails', 'subtitles', 'automatic_captions', 'heatmap')   # Large and never used here
+
+    def __init__(self, path=None, max_entries=INFO_CACHE_MAX_ENTRIES, ttl=INFO_CACHE_TTL):
+        self.path = path or os.path.join(get_app_data_dir(), "info_cache")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index = OrderedDict()   # key -> stored_at, least recently used first
+        try:
+            with open(os.path.join(self.path, "index.json"), 'r', encoding='utf-8') as f:
+                for key, stored_at in json.load(f):
+                    self._index[key] = stored_at
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".json")
+
+    def get(self, url):
+        """The cached info dict for url, or None if missing or expired."""
+        key = clean_url(url)
+        with self._lock:
+            stored_at = self._index.get(key)
+            if stored_at is None:
+                return None
+            if time.time() - stored_at > self.ttl:
+                self._remove(key)
+                self._save_index()
+                return None
+            self._index.move_to_end(key)
+            try:
+                with open(self._file(key), 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+
+    def put(self, url, info):
+        """Store a (sanitized, JSON-safe) info dict for url."""
+        key = clean_url(url)
+        info = {k: v for k, v in info.items() if k not in self.DROP_KEYS}
+        with self._lock:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                tmp_path = self._file(key) + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(info, f)
+                os.replace(tmp_path, self._file(key))
+            except (OSError, TypeError, ValueError):
+                return
+            self._index[key] = time.time()
+            self._index.move_to_end(key)
+            while len(self._index) > self.max_entries:
+                self._remove(next(iter(self._index)))
+            self._save_index()
+
+    def invalidate(self, url):
+        with self._lock:
+            if self._remove(clean_url(url)):
+                self._save_index()
+
+    def _remove(self, key):
+        if self._index.pop(key, None) is None:
+            return False
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+        return True
+
+    def _save_index(self):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = os.path.join(self.path, "index.json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self._index.items()), f)
+            os.replace(tmp_path, os.path.join(self.path, "index.json"))
+        except OSError:
+            pass
+
+
+# ==============================================================================
+#  DOWNLOAD CACHE — finished files by URL, validators and content hash
+# ==============================================================================
+
+class DownloadCache:
+    """
+    Finished direct downloads, persisted as JSON in the app data dir:
+    clean URL -> ETag, Last-Modified, size, SHA-256 and path. An entry is
+    only trusted while its file is still on disk with the recorded size and
+    modification time, so a moved or edited file is downloaded again.
+    """
+
+    def __init__(self, path=None, max_entries=DOWNLOAD_CACHE_MAX_ENTRIES):
+        self.path = path or os.path.join(get_app_data_dir(), "downloads.json")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> entry, oldest first
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries.update(json.load(f))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    @staticmethod
+    def _is_intact(entry):
+        try:
+            st = os.stat(entry['path'])
+        except (OSError, KeyError, TypeError):
+            return False
+        return st.st_size == entry.get('size') and st.st_mtime_ns == entry.get('mtime')
+
+    def lookup(self, url):
+        """The entry for url if its file is intact, else None (stale entries are dropped)."""
+        key = clean_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self._is_intact(entry):
+                del self._entries[key]
+                self._save()
+                return None
+            return dict(entry)
+
+    def find_hash(self, sha256):
+        """Path of an intact cached file with this SHA-256, or None."""
+        with self._lock:
+            for entry in reversed(self._entries.values()):
+                if entry.get('sha256') == sha256 and self._is_intact(entry):
+                    return entry['path']
+        return None
+
+    def remember(self, url, path, etag=None, last_modified=None, sha256=None):
+        """Record a finished download of url at path."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        key = clean_url(url)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                'path': path, 'size': st.st_size, 'mtime': st.st_mtime_ns,
+                'etag': etag, 'last_modified': last_modified, 'sha256': sha256,
+                'stored': int(time.time()),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+def link_or_copy(source, destination):
+    """Hardlink source to destination, copying when the filesystem can't link (other drive, FAT, ...)."""
+    try:
+        os.link(source, destination)
+    except (OSError, AttributeError):
+        shutil.copy2(source, destination)
+
+
+# ==============================================================================
+#  YT-DLP — metadata and downloads for YouTube and 1000s of other sites
+# ==============================================================================
+
+def extract_info(url, cache=None):
+    """
+    Fetch yt-dlp metadata for a single video (playlists are not expanded).
+    With an InfoCache, a fresh cached copy is returned without touching the
+    network, and new results are stored sanitized (JSON-safe).
+    """
+    if cache is not None:
+        info = cache.get(url)
+        if info is not None:
+            return info
+    from yt_dlp import YoutubeDL
+    ydl_opts_info = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': "in_playlist",
+        'format': YTDLP_DEFAULT_FORMAT,
+        'nocheckcertificate': True,
+        'no_playlist': True,
+        'simulate': True,
+    }
+    with YoutubeDL(ydl_opts_info) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if cache is not None and info.get('_type', 'video') == 'video':
+        info = YoutubeDL.sanitize_info(info, remove_private_keys=True)
+        cache.put(url, info)
+    return info
+
+
+def list_video_formats(info):
+    """The mp4 video formats in info, one per resolution, highest first."""
+    video_formats = []
+    for f in info.get('formats', []):
+        if f.get('vcodec') != 'none' and f.get('resolution') and f.get('ext') == 'mp4':
+            fps = f.get('fps', '')
+            filesize = f.get('filesize') or f.get('filesize_approx')
+            video_formats.append({
+                'format_id': f.get('format_id'),
+                'resolution': f.get('resolution'),
+                'height': f.get('height', 0),
+                'fps': f"{fps}fps" if fps else "",
+                'size_str': f"{filesize / (1024*1024):.2f} MB" if filesize else "Size Unknown",
+                'ext': f.get('ext')
+            })
+
+    unique_res = {}
+    for f in video_formats:
+        if f['height'] not in unique_res:
+            unique_res[f['height']] = f
+    return sorted(unique_res.values(), key=lambda x: x['height'], reverse=True)
+
+
+def estimate_download_size(info):
+    """Approximate bytes the default yt-dlp format (best mp4 video + m4a audio) will fetch, or None."""
+    size = info.get('filesize') or info.get('filesize_approx')
+    if size:
+        return size
+    formats = info.get('formats') or []
+    videos = [f for f in formats if f.get('vcodec') not in (None, 'none') and f.get('ext') == 'mp4']
+    audios = [f for f in formats if f.get('vcodec') == 'none' and f.get('ext') == 'm4a']
+    video = max(videos, key=lambda f: (f.get('height') or 0, f.get('tbr') or 0), default=None)
+    if video is None:
+        return None
+    total = video.get('filesize') or video.get('filesize_approx') or 0
+    if video.get('acodec') == 'none' and audios:
+        audio = max(audios, key=lambda f: f.get('abr') or f.get('tbr') or 0)
+        total += audio.get('filesize') or audio.get('filesize_approx') or 0
+    return total or None
+
+
+def find_partial_downloads(directory):
+    """URLs of the journaled partial downloads in directory (queue them again to resume)."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    urls = []
+    for name in names:
+        if name.endswith(JOURNAL_SUFFIX):
+            journal = load_journal(os.path.join(directory, name[:-len(JOURNAL_SUFFIX)]))
+            if journal:
+                urls.append(journal.url)
+    return urls
+
+
+# ==============================================================================
+#  LINK PREFETCH — resolve captured links in the background before they're queued
+# ==============================================================================
+
+class LinkInfo:
+    """What a prefetch learned about a URL."""
+
+    def __init__(self, url):
+        self.url = url
+        self.state = "resolving"   # resolving -> ready / failed
+        self.kind = None           # "direct", "stream" or "ytdlp"
+        self.title = None
+        self.filename = None       # Output name for direct files
+        self.formats = []          # list_video_formats() for yt-dlp links
+        self.size = None           # Bytes, when the server or yt-dlp reports it
+        self.ranges = None         # Server honours byte ranges (direct files)
+        self.error = None
+        self._callbacks = []
+
+
+class LinkPrefetcher:
+    """
+    Resolves links on a small background pool as soon as they are captured:
+    direct file, stream manifest or yt-dlp, title, formats, size and range support. yt-dlp
+    results land in the InfoCache, so queuing a resolved link needs no
+    further extraction. Each URL is resolved once; a failed link is
+    forgotten once its callbacks have run, so asking again retries it.
+    At most `max_links` results are kept, least recently used dropped first.
+    """
+
+    def __init__(self, pool, info_cache, workers=PREFETCH_WORKERS, max_links=PREFETCH_MAX_LINKS):
+        self.pool = pool
+        self.info_cache = info_cache
+        self.max_links = max_links
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._links = OrderedDict()   # clean_url -> LinkInfo, least recently used first
+
+    def resolve(self, url, callback=None):
+        """Start resolving url; callback(link) runs on a pool thread when done. Returns the LinkInfo."""
+        url = clean_url(url)
+        with self._lock:
+            link = self._links.get(url)
+            if link is None:
+                link = self._links[url] = LinkInfo(url)
+                while len(self._links) > self.max_links:
+                    self._links.popitem(last=False)
+                self._executor.submit(self._resolve, link)
+            else:
+                self._links.move_to_end(url)
+            if link.state == "resolving":
+                if callback:
+                    link._callbacks.append(callback)
+                return link
+        if callback:
+            callback(link)
+        return link
+
+    def get(self, url):
+        url = clean_url(url)
+        with self._lock:
+            link = self._links.get(url)
+            if link is not None:
+                self._links.move_to_end(url)
+            return link
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _resolve(self, link):
+        state = "ready"
+        try:
+            if is_manifest_url(link.url):
+                link.kind = "stream"
+                link.filename = get_filename_from_url(link.url)
+                link.title = link.filename
+            elif is_direct_file_url(link.url):
+                self._probe(link)
+            else:
+                try:
+                    info = extract_info(link.url, self.info_cache)
+                except Exception as e:
+                    if "Unsupported URL" not in str(e) and "No video" not in str(e):
+                        raise
+                    self._probe(link)   # Not a site yt-dlp knows: plain HTTP download
+                else:
+                    link.kind = "ytdlp"
+                    link.title = info.get('title') or get_filename_from_url(link.url)
+                    link.formats = list_video_formats(info)
+                    link.size = estimate_download_size(info)
+        except Exception as e:
+            link.error = str(e)
+            state = "failed"
+        with self._lock:
+            link.state = state
+            callbacks, link._callbacks = link._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(link)
+            except Exception:
+                pass
+        if state == "failed":
+            with self._lock:
+                if self._links.get(link.url) is link:
+                    del self._links[link.url]   # Let the real extraction, or the next capture, try again
+
+    def _probe(self, link):
+        link.kind = "direct"
+        link.filename = get_filename_from_url(link.url)
+        link.title = link.filename
+        head = self.pool.head(link.url, allow_redirects=True, timeout=30)
+        head.raise_for_status()
+        link.size = int(head.headers.get('content-length', 0)) or None
+        link.ranges = head.headers.get('accept-ranges', 'none').lower() == 'bytes'
+
+
+# ==============================================================================
+#  POST-PROCESSING — ffmpeg merges and conversions, apart from the download slots
+# ==============================================================================
+
+def run_ffmpeg(args, duration=None, expected_size=None, progress_callback=None, cancel_event=None):
+    """
+    Run ffmpeg with `args` and wait for it. Progress (0..1) comes from
+    ffmpeg's -progress output: output time against `duration` seconds when
+    known, else output bytes against `expected_size`. The process is killed
+    when cancel_event is set. Returns (exit code, last error line).
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return -1, "ffmpeg not found — install it and add it to PATH"
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1'] + list(args)
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+    errors = []
+    reader = threading.Thread(target=lambda: errors.extend(proc.stderr.read().splitlines()), daemon=True)
+    reader.start()
+
+    def _watch():
+        while proc.poll() is None:
+            if cancel_event.wait(0.25):
+                proc.kill()
+                return
+
+    if cancel_event is not None:
+        threading.Thread(target=_watch, daemon=True).start()
+    for line in proc.stdout:
+        key, _, value = line.strip().partition('=')
+        try:
+            if key == 'out_time_us' and duration:
+                fraction = int(value) / 1e6 / duration
+            elif key == 'total_size' and expected_size and not duration:
+                fraction = int(value) / expected_size
+            else:
+                continue
+        except ValueError:
+            continue   # "N/A" before the first packet
+        if progress_callback:
+            progress_callback(max(0.0, min(1.0, fraction)))
+    proc.wait()
+    reader.join()
+    return proc.returncode, (errors or ["ffmpeg failed"])[-1]
+
+
+# ==============================================================================
+#  HEADLESS ENGINE — queued direct / yt-dlp downloads with progress events
+# ==============================================================================
+
+class DownloadTask:
+    """
+    One queued download and its live progress.
+    Listeners get listener(task, event) with event one of: queued, started,
+    progress, status, processing, complete, failed, cancelled. "processing"
+    means the bytes are on disk and ffmpeg is merging or converting them;
+    progress events then update post_progress. Events are sent from worker
+    threads, so GUI listeners must hand them to their own main loop.
+    """
+
+    def __init__(self, engine, url, kind, title, directory, listener=None):
+        self.engine = engine
+        self.id = 0                    # Assigned by the engine in submission order
+        self.url = url
+        self.kind = kind               # "direct", "stream" (HLS / DASH) or "ytdlp"
+        self.title = title
+        self.directory = directory
+        self.host = urllib.parse.urlparse(url).hostname or ''
+        self.listener = listener
+        self.state = "queued"          # queued -> running -> (processing) -> complete / failed / cancelled
+        self.status = ""               # Last human-readable status line
+        self.downloaded = 0
+        self.total = 0
+        self.speed = 0.0
+        self.eta = None
+        self.post_progress = None      # 0..1 while ffmpeg post-processes the download
+        self.connection_speeds = []
+        self.retries = 0
+        self.error = None
+        self.resumable = False         # A partial file and journal were kept
+        self.save_path = None
+        self.expected_checksum = None  # (algorithm, hex digest) the finished file must match
+        self.mirrors = []              # Other URLs of the same file (direct downloads)
+        self.checksums = {}            # Algorithm -> hex digest of the finished file
+        self.job = None                # DownloadJob while it is in the scheduler
+        self.primary = None            # Task already downloading the same URL, whose transfer this one shares
+        self.followers = []            # Tasks for the same URL waiting on this one's transfer
+        self.takeover = None           # (run, priority) that starts this task's own transfer if its primary is cancelled
+        self.downloaders = []          # ChunkedDownloaders running for it (video + audio for merged formats)
+        self.planned_total = 0         # Bytes expected over all of them, when known before they start
+        self.rate_limit = None         # Speed limit asked for this task (bytes/s); None for unlimited
+        self.rate_bucket = TokenBucket()   # Per-download speed limit, on top of the engine's global/host ones
+        self.cancelled = False
+        self._ytdlp_bytes = 0          # Bytes of the current yt-dlp stream already charged to the speed limit
+        self._ytdlp_done = 0           # Bytes of yt-dlp streams already finished (video before audio)
+        self._pause_event = threading.Event()
+        self._pause_event.set()
+        self._cancel_event = threading.Event()   # Wakes a yt-dlp transfer waiting on the speed limit
+
+    @property
+    def progress(self):
+        return self.downloaded / self.total if self.total else 0.0
+
+    @property
+    def is_pending(self):
+        return self.job is not None and self.job.state == "pending"
+
+    def pause(self):
+        self._pause_event.clear()
+        for downloader in list(self.downloaders):
+            downloader.pause()
+
+    def resume(self):
+        self._pause_event.set()
+        for downloader in list(self.downloaders):
+            downloader.resume()
+
+    def set_rate_limit(self, rate):
+        """
+        Cap this download at `rate` bytes/s (None for unlimited); applies
+        immediately. A transfer shared by several tasks runs at the strictest
+        of their limits.
+        """
+        self.rate_limit = rate or None
+        self.engine._apply_rate_limit(self.primary or self)
+
+    def cancel(self):
+        """Cancel the download; a task that hasn't started is just dropped from the queue."""
+        self.cancelled = True
+        if self.primary is not None and self.engine._drop_follower(self):
+            return
+        if self.job is not None and self.engine.scheduler.cancel(self.job):
+            self.state = "cancelled"
+            self.engine._emit(self, "cancelled")
+            return
+        self._cancel_event.set()
+        self._pause_event.set()   # Unblock if paused
+        for downloader in list(self.downloaders):
+            downloader.cancel()
+
+    def to_dict(self):
+        """A JSON-serialisable snapshot of the task."""
+        return {
+            'id': self.id,
+            'url': self.url,
+            'kind': self.kind,
+            'title': self.title,
+            'state': self.state,
+            'status': self.status,
+            'downloaded': self.downloaded,
+            'total': self.total,
+            'speed': round(self.speed or 0.0, 1),
+            'eta': self.eta,
+            'post_progress': None if self.post_progress is None else round(self.post_progress, 3),
+            'connections': len([s for s in self.connection_speeds if s > 0]),
+            'retries': self.retries,
+            'rate_limit': self.rate_limit,
+            'path': self.save_path,
+            'checksums': self.checksums,
+            'resumable': self.resumable,
+            'error': self.error,
+        }
+
+
+class DownloadEngine:
+    """
+    The download queue without a window.
+    Owns the keep-alive pool, learned host profiles, bandwidth limiter and
+    scheduler shared by every download, and turns URLs into DownloadTasks.
+    ffmpeg merges and MP3 conversions run on a separate CPU-sized pool, so a
+    download slot is handed to the next task as soon as the bytes are on disk.
+    Finished direct downloads go into a DownloadCache: queuing the URL again
+    asks the server whether the file changed (If-None-Match /
+    If-Modified-Since) and reuses the file if it didn't. A URL queued while
+    the same URL is still downloading shares that transfer; cancelling the
+    task that started it hands the transfer to the next one.
+    """
+
+    def __init__(self, download_dir=None, max_active=MAX_CONCURRENT_DL, listener=None):
+        self.download_dir = download_dir or get_default_download_location()
+        self.listener = listener
+        self.pool = ConnectionPool()
+        self.host_profiles = HostProfiles()
+        self.bandwidth = BandwidthLimiter()
+        self.scheduler = DownloadScheduler(max_active)
+        self.info_cache = InfoCache()
+        self.prefetcher = LinkPrefetcher(self.pool, self.info_cache)
+        self.postprocessor = ThreadPoolExecutor(max_workers=POSTPROCESS_WORKERS, thread_name_prefix="postprocess")
+        self.hash_algorithms = HASH_ALGORITHMS
+        self.verify_sidecars = True    # Look for a .sha256 (or .<algorithm> of hash_algorithms) file next to direct URLs
+        self.write_buffer = WRITE_BEHIND_BYTES
+        self.fsync = FSYNC_POLICY
+        self.download_cache = DownloadCache()
+        self._in_flight = {}           # Clean URL -> direct task transferring it
+        self._active_save_paths = set()
+        self._save_path_lock = threading.Lock()
+        self._tasks_lock = threading.Lock()
+        self._unfinished = 0
+        self._submitted = 0
+        self._idle = threading.Condition(self._tasks_lock)
+
+    def extract_info(self, url):
+        """yt-dlp metadata for url, served from the engine's InfoCache when fresh."""
+        return extract_info(url, self.info_cache)
+
+    def set_speed_limit(self, rate):
+        """Global speed limit in bytes/s shared by every transfer (None = unlimited)."""
+        self.bandwidth.set_global_rate(rate)
+
+    def set_host_speed_limit(self, host, rate):
+        """Speed limit in bytes/s shared by every transfer from host (None = unlimited)."""
+        self.bandwidth.set_host_rate(host.strip().lower(), rate)
+
+    def submit(self, url, directory=None, listener=None, priority=PRIORITY_NORMAL, checksum=None):
+        """Queue a URL, picking a direct, stream or yt-dlp download by its type."""
+        url = clean_url(url)
+        if is_manifest_url(url):
+            return self.submit_stream(url, directory=directory, listener=listener, priority=priority,
+                                      checksum=checksum)
+        if is_direct_file_url(url):
+            return self.submit_direct(url, directory=directory, listener=listener, priority=priority,
+                                      checksum=checksum)
+        return self.submit_ytdlp(url, directory=directory, listener=listener, priority=priority)
+
+    def submit_direct(self, url, filename=None, chunked=True, directory=None,
+                      listener=None, priority=PRIORITY_NORMAL, checksum=None, mirrors=None):
+        """
+        Queue a direct file download (accelerated unless chunked=False).
+        `checksum` ('sha256:HEX', 'md5:HEX', a bare digest...) is checked
+        against the finished file; raises ValueError if it can't be parsed.
+        `mirrors` are other URLs serving the same file to fetch ranges from.
+        """
+        filename = filename or get_filename_from_url(url)
+        task = DownloadTask(self, url, "direct", filename, directory or self.download_dir, listener)
+        task.expected_checksum = parse_checksum(checksum) if checksum else None
+        task.mirrors = [clean_url(mirror) for mirror in (mirrors or ())]
+        task.takeover = (lambda: self._run_direct(task, filename, chunked), priority)
+        if self._share_transfer(task):
+            return task
+        return self._submit(task, *task.takeover)
+
+    def submit_stream(self, url, filename=None, directory=None, listener=None, priority=PRIORITY_NORMAL,
+                      checksum=None):
+        """Queue an HLS (.m3u8) or DASH (.mpd) stream for the native segment engine."""
+        filename = filename or get_filename_from_url(url)
+        task = DownloadTask(self, url, "stream", filename, directory or self.download_dir, listener)
+        task.expected_checksum = parse_checksum(checksum) if checksum else None
+        return self._submit(task, lambda: self._run_stream(task, filename), priority)
+
+    def submit_ytdlp(self, url, format_string=YTDLP_DEFAULT_FORMAT, title=None, is_mp3=False,
+                     directory=None, listener=None, priority=PRIORITY_NORMAL):
+        """Queue a yt-dlp download (converted to MP3 when is_mp3)."""
+        url = clean_url(url)
+        task = DownloadTask(self, url, "ytdlp", title or get_filename_from_url(url),
+                            directory or self.download_dir, listener)
+        return self._submit(task, lambda: self._run_ytdlp(task, format_string, is_mp3), priority)
+
+    def wait(self, timeout=None):
+        """Block until every submitted task has finished. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout)
+
+    def close(self):
+        self.prefetcher.shutdown()
+        self.postprocessor.shutdown(wait=False)
+        self.pool.close()
+
+    def _emit(self, task, event):
+        listener = task.listener or self.listener
+        if listener:
+            try:
+                listener(task, event)
+            except Exception:
+                pass
+        if event == "progress" and task.followers:
+            for follower in list(task.followers):
+                follower.downloaded, follower.total = task.downloaded, task.total
+                follower.speed, follower.eta = task.speed, task.eta
+                self._emit(follower, "progress")
+        if event in ("complete", "failed", "cancelled"):
+            followers = self._end_transfer(task)
+            with self._idle:
+                self._unfinished -= 1
+                self._idle.notify_all()
+            if event == "cancelled" and followers:
+                self._hand_over(followers)   # Cancelling one copy of a URL doesn't cancel the others
+                return
+            for follower in followers:
+                self._finish_follower(follower, task, event)
+
+    def _submit(self, task, run, priority):
+        with self._idle:
+            self._unfinished += 1
+            self._submitted += 1
+            task.id = self._submitted
+        self._emit(task, "queued")
+        self._schedule(task, run, priority)
+        return task
+
+    def _schedule(self, task, run, priority):
+        def _job(job):
+            if task.cancelled:
+                task.state = "cancelled"
+                self._emit(task, "cancelled")
+                return
+            task.state = "running"
+            self._emit(task, "started")
+            run()
+
+        task.job = self.scheduler.submit(_job, task.host, priority)
+
+    def _finish(self, task, state, error=None):
+        task.state = state
+        task.error = error
+        self._emit(task, state)
+
+    # --------------------------------------------------------------------------
+    #  Shared transfers — the same URL queued twice downloads once
+    # --------------------------------------------------------------------------
+    def _share_transfer(self, task):
+        """Attach task to a running or queued transfer of the same URL. Returns False if there is none."""
+        with self._idle:
+            primary = self._in_flight.setdefault(clean_url(task.url), task)
+            if primary is task:
+                return False
+            task.primary = primary
+            primary.followers.append(task)
+            self._unfinished += 1
+            self._submitted += 1
+            task.id = self._submitted
+            task.status = f"🔗 Already downloading as #{primary.id} — sharing that transfer"
+        self._emit(task, "queued")
+        self._emit(task, "status")
+        return True
+
+    def _apply_rate_limit(self, primary):
+        """Set primary's transfer to the strictest speed limit of the tasks sharing it."""
+        with self._idle:
+            rates = [t.rate_limit for t in [primary] + primary.followers if t.rate_limit]
+        primary.rate_bucket.set_rate(min(rates, default=None))   # Shared by its downloaders
+
+    def _end_transfer(self, task):
+        """A task finished: stop routing its URL to it and hand back the tasks sharing its transfer."""
+        with self._idle:
+            key = clean_url(task.url)
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+            followers, task.followers = task.followers, []
+        return followers
+
+    def _hand_over(self, followers):
+        """
+        The transfer's primary was cancelled: the first follower still wanted
+        takes the transfer over (resuming the kept partial when it shares the
+        directory) and the others follow it instead.
+        """
+        for follower in [f for f in followers if f.cancelled]:
+            self._finish(follower, "cancelled")   # Cancelled while being handed over
+        followers = [f for f in followers if not f.cancelled]
+        if not followers:
+            return
+        successor = followers[0]
+        with self._idle:
+            primary = self._in_flight.setdefault(clean_url(successor.url), successor)
+            successor.primary = None
+            for follower in followers:
+                if follower is not primary:
+                    follower.primary = primary
+                    primary.followers.append(follower)
+        self._apply_rate_limit(primary)
+        if primary is not successor:
+            return   # The URL was queued again meanwhile; everyone shares that transfer
+        successor.status = "Taking over the cancelled transfer"
+        self._emit(successor, "status")
+        self._schedule(successor, *successor.takeover)
+
+    def _drop_follower(self, task):
+        """Cancel a task sharing another's transfer. Returns False if it is already being finished."""
+        with self._idle:
+            if task not in task.primary.followers:
+                return False
+            task.primary.followers.remove(task)
+        self._apply_rate_limit(task.primary)   # Its limit no longer holds the transfer down
+        self._finish(task, "cancelled")
+        return True
+
+    def _finish_follower(self, task, primary, event):
+        """Give a task sharing primary's transfer the same outcome (and the file, in its own directory)."""
+        if event != "complete":
+            self._finish(task, event, primary.error)
+            return
+        try:
+            task.save_path = self._place_file(primary.save_path, task.directory, task.title, task.url)
+        except OSError as e:
+            self._finish(task, "failed", f"Disk error: {e}")
+            return
+        task.checksums = dict(primary.checksums)
+        task.downloaded = task.total = primary.total
+        if task.expected_checksum:
+            algorithm, expected = task.expected_checksum
+            if algorithm not in task.checksums:
+                try:
+                    # The primary wasn't hashed with this algorithm
+                    hasher = StreamHasher((algorithm,))
+                    with open(task.save_path, 'rb') as f:
+                        hasher.update_from_file(f, os.path.getsize(task.save_path))
+                    task.checksums.update(hasher.hexdigests())
+                except OSError:
+                    pass
+            if task.checksums.get(algorithm) != expected:
+                if task.save_path != primary.save_path:
+                    self._remove_files([task.save_path])
+                task.save_path = None
+                self._finish(task, "failed", f"Checksum mismatch ({algorithm}): expected {expected}, "
+                                             f"got {task.checksums.get(algorithm) or 'nothing'}")
+                return
+        self._finish(task, "complete")
+
+    def _place_file(self, source, directory, filename, url, rename=False):
+        """
+        Make a finished file available as directory/filename: the file itself
+        when it is already in that directory, else a hardlink (or copy) under
+        a free name. With rename=True (another file with the same content)
+        the file itself only counts when it already has that name.
+        Returns the path.
+        """
+        here = os.path.normcase(os.path.abspath(directory))
+        same_dir = os.path.normcase(os.path.abspath(os.path.dirname(source))) == here
+        if same_dir and (not rename or os.path.basename(source) == filename):
+            return source
+        with self._save_path_lock:
+            save_path = resolve_save_path(directory, filename, url, self._active_save_paths)
+            self._active_save_paths.add(save_path)
+        try:
+            stale = load_journal(save_path)
+            if stale:
+                # A kept partial of the same URL (e.g. a cancelled shared transfer): the finished file replaces it
+                stale.delete()
+                os.remove(save_path)
+            link_or_copy(source, save_path)
+        finally:
+            with self._save_path_lock:
+                self._active_save_paths.discard(save_path)
+        return save_path
+
+    # --------------------------------------------------------------------------
+    #  Direct downloads
+    # --------------------------------------------------------------------------
+    def _run_direct(self, task, filename, chunked):
+        try:
+            if task.expected_checksum is None and self.verify_sidecars:
+                task.expected_checksum = self._find_checksum_sidecar(task.url, filename)
+            if self._reuse_download(task, filename):
+                return
+            success, downloader = self._download_chunked(task, task.url, task.directory, filename, chunked,
+                                                         hash_algorithms=self._hash_algorithms(task),
+                                                         mirrors=task.mirrors if chunked else None)
+            self._finish_chunked(task, downloader, success, remember=True)
+        except Exception as e:
+            self._finish(task, "failed", str(e))
+
+    def _reuse_download(self, task, filename):
+        """
+        Finish task from an earlier download instead of transferring the file
+        again: a cached file with the expected SHA-256, or the URL's cached
+        file when the server confirms it hasn't changed. Returns True if reused.
+        """
+        expected = task.expected_checksum
+        if expected and expected[0] != 'sha256':
+            return False   # The cache only knows SHA-256; download and verify
+        source = self.download_cache.find_hash(expected[1]) if expected else None
+        rename = bool(source)   # Someone else's file: it has to show up under this task's name
+        if source:
+            task.status = "♻️ Same SHA-256 as an earlier download — reusing it"
+            sha256 = expected[1]
+        else:
+            entry = self.download_cache.lookup(task.url)
+            if entry is None or (expected and entry.get('sha256') != expected[1]):
+                return False
+            task.status = "🔎 Checking for changes..."
+            self._emit(task, "status")
+            if not self._is_unchanged(task.url, entry):
+                return False
+            task.status = "♻️ Unchanged since the last download — reusing it"
+            source, sha256 = entry['path'], entry.get('sha256')
+        self._emit(task, "status")
+        task.save_path = self._place_file(source, task.directory, filename, task.url, rename)
+        task.checksums = {'sha256': sha256} if sha256 else {}
+        task.downloaded = task.total = os.path.getsize(task.save_path)
+        self._finish(task, "complete")
+        return True
+
+    def _is_unchanged(self, url, entry):
+        """Conditional HEAD with the cached validators: True if the server says the file is the same."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        if not headers:
+            return False
+        try:
+            resp = self.pool.head(url, headers=headers, allow_redirects=True, timeout=30)
+        except Exception:
+            return False
+        if resp.status_code == 304:
+            return True
+        if resp.status_code != 200 or int(resp.headers.get('content-length') or -1) != entry['size']:
+            return False
+        # The server ignored the conditions: compare the validators it sent
+        if entry.get('etag') and resp.headers.get('etag'):
+            return resp.headers['etag'] == entry['etag']
+        return bool(entry.get('last_modified')) and resp.headers.get('last-modified') == entry['last_modified']
+
+    def _hash_algorithms(self, task):
+        """The engine's digests plus the one the task's expected checksum uses."""
+        algorithms = list(self.hash_algorithms)
+        if task.expected_checksum and task.expected_checksum[0] not in algorithms:
+            algorithms.append(task.expected_checksum[0])
+        return tuple(algorithms)
+
+    def _find_checksum_sidecar(self, url, filename):
+        """
+        (algorithm, hex) from a '<url>.<algorithm>' file published next to the
+        download: '<url>.sha256' first, then one for each other algorithm in
+        hash_algorithms. None if there is no usable one. A sidecar that turns
+        up switches hashing on for that download only.
+        """
+        parts = urllib.parse.urlsplit(url)
+        for algorithm in dict.fromkeys(('sha256',) + tuple(self.hash_algorithms)):
+            sidecar_url = urllib.parse.urlunsplit((parts.scheme, parts.netloc, f"{parts.path}.{algorithm}", '', ''))
+            try:
+                with self.pool.get(sidecar_url, stream=True, timeout=10) as resp:
+                    if resp.status_code != 200 or int(resp.headers.get('content-length') or 0) > CHECKSUM_SIDECAR_MAX:
+                        continue
+                    text = resp.raw.read(CHECKSUM_SIDECAR_MAX + 1, decode_content=True)
+                if len(text) > CHECKSUM_SIDECAR_MAX:
+                    continue
+                digest = parse_checksum_file(text.decode('utf-8', 'replace'), filename)
+                if digest:
+                    return parse_checksum(f"{algorithm}:{digest}")
+            except Exception:
+                continue   # No usable sidecar for this algorithm
+        return None   # The download goes ahead unverified
+
+    def _download_chunked(self, task, url, directory, filename, chunked=True, source_url=None, **options):
+        """Run a ChunkedDownloader for task into directory/filename. Returns (success, downloader)."""
+        return self._run_downloader(task, directory, filename, source_url, lambda save_path, on_progress, on_status: (
+            ChunkedDownloader(
+                url, save_path, num_chunks=CHUNK_COUNT if chunked else 1,
+                progress_callback=on_progress, status_callback=on_status,
+                pool=self.pool, adaptive=chunked, host_profiles=self.host_profiles,
+                budget=self.scheduler.budget, limiter=self.bandwidth,
+                write_buffer=self.write_buffer, fsync=self.fsync,
+                source_url=source_url or task.url, **options
+            )
+        ))
+
+    def _download_track(self, task, track, directory, filename, source_url=None, hash_algorithms=None,
+                        own_slot=False):
+        """Fetch one manifest track: segments go to SegmentedDownloader, a single plain file to the chunked engine."""
+        if track.is_single_file:
+            return self._download_chunked(task, track.segments[0].url, directory, filename, source_url=source_url,
+                                          hash_algorithms=hash_algorithms, own_slot=own_slot)
+        return self._run_downloader(task, directory, filename, source_url, lambda save_path, on_progress, on_status: (
+            SegmentedDownloader(
+                track, save_path, progress_callback=on_progress, status_callback=on_status,
+                pool=self.pool, budget=self.scheduler.budget, limiter=self.bandwidth,
+                source_url=source_url or task.url, hash_algorithms=hash_algorithms, own_slot=own_slot
+            )
+        ))
+
+    def _run_downloader(self, task, directory, filename, source_url, make_downloader):
+        """
+        Reserve a save path, build a downloader with make_downloader(save_path,
+        on_progress, on_status), attach it to the task and run it.
+        Returns (success, downloader).
+        """
+        source_url = source_url or task.url
+        with self._save_path_lock:
+            save_path = resolve_save_path(directory, filename, source_url, self._active_save_paths)
+            self._active_save_paths.add(save_path)
+        task.save_path = save_path
+
+        def on_progress(downloaded, total):
+            self._collect_progress(task)
+            self._emit(task, "progress")
+
+        def on_status(text):
+            task.status = text
+            self._emit(task, "status")
+
+        try:
+            downloader = make_downloader(save_path, on_progress, on_status)
+            downloader.rate_bucket = task.rate_bucket   # One per-download limit over all of the task's streams
+            task.downloaders.append(downloader)
+            if task.cancelled:
+                downloader.cancel()   # Cancelled before the downloader existed
+            elif not task._pause_event.is_set():
+                downloader.pause()
+
+            success = downloader.download()
+            self._collect_progress(task)
+            return success, downloader
+        finally:
+            with self._save_path_lock:
+                self._active_save_paths.discard(save_path)
+
+    @staticmethod
+    def _collect_progress(task):
+        """Task progress summed over its downloaders, so video + audio read as one byte total."""
+        stats = [d.stats() for d in task.downloaders]
+        task.downloaded = sum(st['downloaded'] for st in stats)
+        task.total = max(sum(st['total'] for st in stats), task.planned_total)
+        task.speed = sum(st['speed'] or 0.0 for st in stats)
+        task.retries = sum(d.retries for d in task.downloaders)
+        task.connection_speeds = [c for st in stats for c in st['connection_speeds']]
+        known = all(st['total'] for st in stats)
+        task.eta = (task.total - task.downloaded) / task.speed if known and task.speed else None
+
+    def _finish_chunked(self, task, downloader, success, after=None, remember=False):
+        """
+        Finish a task from its downloader's outcome; on success, `after` is a
+        (status, job) to post-process, and with remember=True the file is
+        recorded in the download cache.
+        """
+        if success and not self._verify_checksum(task, downloader):
+            return
+        if success and remember:
+            self._remember_download(task, downloader)
+        if success:
+            if after:
+                self._postprocess(task, *after)
+            else:
+                self._finish(task, "complete")
+        elif downloader.is_resumable:
+            # Keep the partial file and its journal — queuing the URL again resumes it
+            task.resumable = True
+            self._finish(task, "cancelled" if downloader.cancelled else "failed", downloader.error)
+        elif downloader.cancelled:
+            self._discard_partial(downloader)
+            self._finish(task, "cancelled")
+        else:
+            self._finish(task, "failed", downloader.error or "Download failed")
+
+    def _remember_download(self, task, downloader):
+        """Record a finished direct download; a new version of a file fetched before from the URL replaces it."""
+        path = downloader.save_path
+        previous = self.download_cache.lookup(task.url)
+        if previous and previous['path'] != path and os.path.dirname(previous['path']) == os.path.dirname(path):
+            try:
+                os.replace(path, previous['path'])
+                path = task.save_path = previous['path']
+            except OSError:
+                pass
+        self.download_cache.remember(task.url, path, downloader.etag, downloader.last_modified,
+                                     downloader.digests.get('sha256'))
+
+    def _verify_checksum(self, task, downloader):
+        """
+        Record the digests computed during the download and check the expected
+        checksum. On a mismatch the file is deleted and the task failed.
+        """
+        task.checksums = dict(downloader.digests)
+        if not task.expected_checksum:
+            return True
+        algorithm, expected = task.expected_checksum
+        actual = task.checksums.get(algorithm)
+        if actual == expected:
+            task.status = f"✅ {algorithm.upper()} verified"
+            self._emit(task, "status")
+            return True
+        self._discard_partial(downloader)
+        task.save_path = None
+        self._finish(task, "failed", f"Checksum mismatch ({algorithm}): expected {expected}, got {actual or 'nothing'}")
+        return False
+
+    @staticmethod
+    def _discard_partial(downloader):
+        if downloader.journal:
+            downloader.journal.delete()
+        try:
+            if os.path.exists(downloader.save_path):
+                os.remove(downloader.save_path)
+        except OSError:
+            pass
+
+    # --------------------------------------------------------------------------
+    #  Post-processing
+    # --------------------------------------------------------------------------
+    def _postprocess(self, task, status, job):
+        """
+        Queue job() on the post-processing pool and return, so the caller's
+        download slot goes to the next task. The job finishes the task.
+        """
+        task.state = "processing"
+        task.status = status
+        task.post_progress = 0.0
+        task.speed, task.eta = 0.0, None
+        self._emit(task, "processing")
+
+        def _run():
+            try:
+                job()
+            except Exception as e:
+                self._finish(task, "cancelled" if task.cancelled else "failed", None if task.cancelled else str(e))
+
+        self.postprocessor.submit(_run)
+
+    def _run_postprocess_ffmpeg(self, task, inputs, args, output, duration=None, expected_size=None):
+        """
+        Run ffmpeg for a post-processing job. Returns True if it wrote `output`;
+        otherwise finishes the task. Cancelling discards the inputs as well, a
+        failure keeps them.
+        """
+        def on_progress(fraction):
+            task.post_progress = fraction
+            self._emit(task, "progress")
+
+        with self._save_path_lock:
+            self._active_save_paths.add(output)
+        try:
+            code, error = run_ffmpeg(list(args) + [output], duration, expected_size, on_progress, task._cancel_event)
+        finally:
+            with self._save_path_lock:
+                self._active_save_paths.discard(output)
+        if code == 0 and not task.cancelled:
+            task.post_progress = 1.0
+            return True
+        try:
+            os.remove(output)
+        except OSError:
+            pass
+        if task.cancelled:
+            self._remove_files(inputs)
+            self._finish(task, "cancelled")
+        else:
+            self._finish(task, "failed", f"ffmpeg: {error}")
+        return False
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _mux(self, task, inputs, directory, filename, duration=None):
+        """Post-processing job: losslessly mux separately downloaded streams into one file."""
+        with self._save_path_lock:
+            output = resolve_save_path(directory, filename, task.url, self._active_save_paths)
+        args = []
+        for path in inputs:
+            args += ['-i', path]
+        for index in range(len(inputs)):
+            args += ['-map', str(index)]
+        args += ['-c', 'copy']
+        expected = sum(os.path.getsize(path) for path in inputs)
+        if not self._run_postprocess_ffmpeg(task, inputs, args, output, duration, expected):
+            return
+        self._remove_files(inputs)
+        task.save_path = output
+        self._finish(task, "complete")
+
+    def _extract_mp3(self, task, source, duration=None):
+        """Post-processing job: convert a downloaded audio (or video) file to MP3."""
+        base, ext = os.path.splitext(source)
+        if ext.lower() == '.mp3':
+            task.save_path = source
+            self._finish(task, "complete")
+            return
+        with self._save_path_lock:
+            output = resolve_save_path(os.path.dirname(source), os.path.basename(base) + '.mp3',
+                                       task.url, self._active_save_paths)
+        args = ['-i', source, '-vn', '-c:a', 'libmp3lame', '-b:a', MP3_BITRATE]
+        if not self._run_postprocess_ffmpeg(task, [source], args, output, duration):
+            return
+        self._remove_files([source])
+        task.save_path = output
+        self._finish(task, "complete")
+
+    # --------------------------------------------------------------------------
+    #  HLS / DASH streams
+    # --------------------------------------------------------------------------
+    def _run_stream(self, task, filename):
+        """
+        Download a manifest's tracks with SegmentedDownloader (video and a
+        separate audio track at the same time, then muxed). Live, DRM and
+        other unsupported streams are handed to yt-dlp instead.
+        """
+        try:
+            tracks = load_manifest(task.url, self.pool)
+            if len(tracks) > 1 and not shutil.which('ffmpeg'):
+                raise ManifestError("separate audio and video tracks need ffmpeg")
+            if any(part.key for track in tracks for part in track.parts) and not has_fast_aes():
+                raise ManifestError("AES-128 segments need pycryptodomex")
+        except ManifestError as e:
+            task.kind = "ytdlp"
+            task.status = f"Using yt-dlp: {e}"
+            self._emit(task, "status")
+            self._run_ytdlp(task, YTDLP_DEFAULT_FORMAT, False)
+            return
+        except Exception as e:
+            self._finish(task, "failed", str(e))
+            return
+
+        base = os.path.splitext(filename)[0]
+        try:
+            if len(tracks) == 1:
+                success, downloader = self._download_track(task, tracks[0], task.directory, f"{base}.{tracks[0].ext}",
+                                                           hash_algorithms=self._hash_algorithms(task))
+                self._finish_chunked(task, downloader, success)
+                return
+            if task.expected_checksum:
+                self._finish(task, "failed", "A checksum can't be verified for a stream muxed from separate tracks")
+                return
+            results = self._fetch_streams(task, [
+                lambda own_slot, track=track: self._download_track(
+                    task, track, task.directory, f"{base}.f{track.id}.{track.ext}",
+                    source_url=f"{task.url}#{track.kind}", own_slot=own_slot
+                )
+                for track in tracks
+            ])
+            ext = 'mp4' if all(track.ext in ('mp4', 'm4a') for track in tracks) else 'mkv'
+            duration = max((track.duration or 0) for track in tracks) or None
+            self._finish_streams(task, results, task.directory, f"{base}.{ext}", duration)
+        except Exception as e:
+            self._finish(task, "cancelled" if task.cancelled else "failed", None if task.cancelled else str(e))
+
+    # --------------------------------------------------------------------------
+    #  yt-dlp downloads
+    # --------------------------------------------------------------------------
+    def _run_ytdlp(self, task, format_string, is_mp3):
+        ydl_opts = {
+            'format': format_string,
+            'outtmpl': os.path.join(task.directory, '%(title)s.%(ext)s'),
+            'progress_hooks': [lambda d: self._ytdlp_progress_hook(d, task)],
+            'quiet': True,
+            'noprogress': True,   # Progress is reported through the hook; keeps stdout clean for the CLI
+            'no_warnings': True,
+            'no_playlist': True,
+        }
+        # MP3 conversion and merging are not left to yt-dlp: they run on the
+        # post-processing pool once the download slot is free again
+        if not is_mp3:
+            ydl_opts['merge_output_format'] = 'mp4'
+        elif not shutil.which('ffmpeg'):
+            self._finish(task, "failed", "ffmpeg not found — MP3 conversion needs ffmpeg on PATH")
+            return
+
+        info = None
+        try:
+            from yt_dlp import YoutubeDL   # Imported on first use — slow, and direct downloads never need it
+            with YoutubeDL(ydl_opts) as ydl:
+                info = self.info_cache.get(task.url)
+                if info is not None and not self._download_info(ydl, task, info, is_mp3, stale_ok=True):
+                    self.info_cache.invalidate(task.url)   # Its stream URLs have probably expired
+                    info = None
+                if info is None:
+                    info = ydl.extract_info(task.url, download=False)
+                    if info.get('_type', 'video') == 'video':
+                        self.info_cache.put(task.url, YoutubeDL.sanitize_info(info, remove_private_keys=True))
+                    self._download_info(ydl, task, info, is_mp3)
+        except Exception as e:
+            if task.cancelled:
+                self._finish(task, "cancelled")
+            else:
+                self._finish(task, "failed", str(e))
+            return
+        if task.state != "running":   # Finished or handed to post-processing by the chunked engine
+            return
+        if task.cancelled:
+            self._finish(task, "cancelled")
+        elif is_mp3 and task.save_path:
+            source = task.save_path
+            self._postprocess(task, "🔄 Converting to MP3...",
+                              lambda: self._extract_mp3(task, source, info.get('duration')))
+        else:
+            self._finish(task, "complete")
+
+    def _download_info(self, ydl, task, info, is_mp3, stale_ok=False):
+        """
+        Download from an extracted or cached info dict. Progressive HTTP
+        formats go to the chunked engine; anything else, or a chunked
+        attempt that got no bytes, goes to yt-dlp's own downloader. With
+        stale_ok, returns False instead of raising if nothing was downloaded.
+        """
+        task.title = info.get('title') or task.title
+        try:
+            if self._download_progressive(ydl, task, info, is_mp3):
+                return True
+            ydl.process_ie_result(copy.deepcopy(info), download=True)
+            return True
+        except Exception:
+            if not stale_ok or task.cancelled or task.downloaded:
+                raise
+            return False
+
+    def _download_progressive(self, ydl, task, info, is_mp3=False):
+        """
+        Fetch the selected format with ChunkedDownloader when it is a single
+        progressive HTTP(S) stream, using the format's own headers, cookies and
+        request chunk size. Returns False if not eligible or nothing arrived.
+        """
+        if info.get('is_live'):
+            return False
+        selected = ydl.process_ie_result(copy.deepcopy(info), download=False)   # Format selection only
+        if selected.get('requested_formats'):
+            return self._download_merged(ydl, task, selected)
+        if not self._is_progressive(selected):
+            return False
+
+        path = ydl.prepare_filename(selected)
+        success, downloader = self._download_chunked(
+            task, selected['url'], os.path.dirname(path), os.path.basename(path),
+            **self._stream_options(ydl, selected)
+        )
+        if not success and not downloader.cancelled and downloader.bytes_done == 0:
+            self._discard_partial(downloader)   # Leave the path free for yt-dlp
+            task.downloaders.clear()
+            task.save_path = None
+            return False
+        after = None
+        if is_mp3:
+            after = ("🔄 Converting to MP3...",
+                     lambda: self._extract_mp3(task, downloader.save_path, selected.get('duration')))
+        self._finish_chunked(task, downloader, success, after)
+        return True
+
+    def _download_merged(self, ydl, task, selected):
+        """
+        Fetch the video and audio streams of a merged format at the same time,
+        each on its own ChunkedDownloader, then mux them with ffmpeg on the
+        post-processing pool. Progress is one byte total over both. Streams
+        that are not plain HTTP are fetched by yt-dlp one after the other and
+        muxed the same way. Returns False if not eligible or nothing arrived,
+        so yt-dlp's downloader takes over.
+        """
+        streams = selected['requested_formats']
+        if not shutil.which('ffmpeg') or len(streams) != 2:
+            return False
+        out_path = ydl.prepare_filename(selected)
+        directory = os.path.dirname(out_path)
+        base = os.path.splitext(os.path.basename(out_path))[0]
+        if not all(self._is_progressive(f) for f in streams):
+            inputs = self._download_formats(ydl, task, selected, directory, base)
+            self._postprocess(task, "🔄 Merging video + audio...", lambda: self._mux(
+                task, inputs, directory, os.path.basename(out_path), selected.get('duration')))
+            return True
+
+        sizes = [f.get('filesize') or f.get('filesize_approx') or 0 for f in streams]
+        task.planned_total = sum(sizes) if all(sizes) else 0
+        results = self._fetch_streams(task, [
+            lambda own_slot, fmt=fmt: self._download_chunked(
+                task, fmt['url'], directory, f"{base}.f{fmt['format_id']}.{fmt['ext']}",
+                source_url=f"{task.url}#f{fmt['format_id']}", own_slot=own_slot, **self._stream_options(ydl, fmt)
+            )
+            for fmt in streams
+        ])
+        if not all(success for success, _ in results) and not task.cancelled \
+                and sum(d.bytes_done for _, d in results) == 0:
+            for _, downloader in results:
+                self._discard_partial(downloader)   # Leave the paths free for yt-dlp
+            task.downloaders.clear()
+            task.save_path = None
+            return False
+        self._finish_streams(task, results, directory, os.path.basename(out_path), selected.get('duration'))
+        return True
+
+    @staticmethod
+    def _download_formats(ydl, task, selected, directory, base):
+        """Download each requested format with yt-dlp's own downloader, unmerged. Returns the file paths."""
+        paths = []
+        for fmt in selected['requested_formats']:
+            fmt_info = dict(selected)
+            del fmt_info['requested_formats']
+            fmt_info.update(fmt)
+            path = os.path.join(directory, f"{base}.f{fmt['format_id']}.{fmt['ext']}")
+            success, _ = ydl.dl(path, fmt_info)
+            if not success or task.cancelled:
+                raise Exception(f"Download of format {fmt['format_id']} failed")
+            paths.append(path)
+        return paths
+
+    def _fetch_streams(self, task, fetchers):
+        """
+        Run every fetcher (one per stream) at the same time. The first stream's
+        connection is covered by the task's scheduler slot; the others are
+        called with own_slot=True and take theirs from the connection budget
+        like any extra connection. When one fails the others are cancelled;
+        their partials are kept. Returns the (success, downloader) results in
+        fetcher order.
+        """
+        results = [None] * len(fetchers)
+
+        def fetch(index):
+            try:
+                results[index] = fetchers[index](index > 0)
+            except Exception as e:
+                results[index] = (False, e)
+            if not results[index][0]:
+                for downloader in list(task.downloaders):
+                    downloader.cancel()   # No point finishing the other streams
+
+        threads = [threading.Thread(target=fetch, args=(i,), daemon=True) for i in range(len(fetchers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        errors = [r[1] for r in results if isinstance(r[1], Exception)]
+        if errors:
+            raise errors[0]
+        return results
+
+    def _finish_streams(self, task, results, directory, filename, duration=None):
+        """Queue the mux of the fetched streams into directory/filename, or finish the task as failed / cancelled."""
+        downloaders = [downloader for _, downloader in results]
+        if not all(success for success, _ in results):
+            task.resumable = any(d.is_resumable for d in downloaders)
+            if task.cancelled:
+                if not task.resumable:
+                    for downloader in downloaders:
+                        self._discard_partial(downloader)
+                self._finish(task, "cancelled")
+            else:
+                error = next((d.error for d in downloaders if d.error), None)
+                self._finish(task, "failed", error or "Download failed")
+            return
+        inputs = [d.save_path for d in downloaders]
+        self._postprocess(task, "🔄 Merging video + audio...",
+                          lambda: self._mux(task, inputs, directory, filename, duration))
+
+    @staticmethod
+    def _is_progressive(fmt):
+        return bool(fmt.get('url')) and fmt.get('protocol') in ('http', 'https')
+
+    def _stream_options(self, ydl, fmt):
+        """ChunkedDownloader options for a yt-dlp format: its headers, cookies and request chunk size."""
+        headers = dict(fmt.get('http_headers') or {})
+        cookie = self._cookie_header(ydl, fmt)
+        if cookie:
+            headers['Cookie'] = cookie
+        return {
+            'headers': headers,
+            'request_size': (fmt.get('downloader_options') or {}).get('http_chunk_size'),
+        }
+
+    @staticmethod
+    def _cookie_header(ydl, fmt):
+        """Cookie header for a format URL: yt-dlp's cookie jar plus cookies stored on the format."""
+        pairs = []
+        try:
+            jar_cookies = ydl.cookiejar.get_cookie_header(fmt['url'])
+            if jar_cookies:
+                pairs.append(jar_cookies)
+        except Exception:
+            pass
+        if fmt.get('cookies'):
+            parsed = http.cookies.SimpleCookie()
+            try:
+                parsed.load(fmt['cookies'])
+            except http.cookies.CookieError:
+                pass
+            pairs.extend(f"{name}={morsel.value}" for name, morsel in parsed.items())
+        return "; ".join(pairs)
+
+    def _ytdlp_progress_hook(self, d, task):
+        """yt-dlp progress hook with pause/cancel support."""
+        if task.cancelled:
+            raise Exception("Download cancelled by user")
+
+        # Pause blocks the download thread
+        task._pause_event.wait()
+
+        if task.cancelled:
+            raise Exception("Download cancelled by user")
+
+        if d['status'] == 'downloading':
+            # Charge the new bytes to the shared speed limit; blocking here paces yt-dlp
+            downloaded = d.get('downloaded_bytes') or 0
+            if downloaded < task._ytdlp_bytes:
+                task._ytdlp_bytes = 0   # Next stream (e.g. audio after video)
+            delta = downloaded - task._ytdlp_bytes
+            task._ytdlp_bytes = downloaded
+            if delta > 0:
+                self.bandwidth.consume(task.host, delta, task._cancel_event)
+                task.rate_bucket.consume(delta, task._cancel_event)
+
+            # One byte total across the streams of a merged format, so progress never starts over
+            streams = (d.get('info_dict') or {}).get('requested_formats') or []
+            planned = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in streams)
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            task.downloaded = task._ytdlp_done + downloaded
+            task.total = max(planned, task._ytdlp_done + total)
+            task.speed = d.get('speed') or 0.0
+            task.eta = d.get('eta')
+            if d.get('filename'):
+                task.save_path = d['filename']
+            self._emit(task, "progress")
+
+        elif d['status'] == 'finished':
+            task._ytdlp_done += d.get('total_bytes') or task._ytdlp_bytes
+            task._ytdlp_bytes = 0
+            if d.get('filename'):
+                task.save_path = d['filename']
+            task.status = "🔄 Finalizing..."
+            self._emit(task, "status")
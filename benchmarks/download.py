@@ -0,0 +1,355 @@
+"""
+Download benchmark — the engine's download paths against a local HTTP range
+server that can be given latency, jitter, a per-connection bandwidth cap and
+no HEAD support, so engine changes can be measured on a reproducible link.
+
+    python benchmarks/download.py                          # 'lan' scenario, every path, 3 runs
+    python benchmarks/download.py --scenario wan --scenario capped
+    python benchmarks/download.py --latency 80 --jitter 20 --rate 2048 --size 32
+    python benchmarks/download.py --path chunked --connections 16 --buffer-kb 64
+    python benchmarks/download.py --path engine --path chunked --hash sha256
+    python benchmarks/download.py --out before.json        # save the results...
+    python benchmarks/download.py --compare before.json    # ...and diff a later run against them
+
+Paths (each run is a fresh interpreter; CPU time and peak RSS are its own):
+
+    chunked   ChunkedDownloader.download() with a fixed connection count
+    single    ChunkedDownloader._single_stream_download()
+    engine    DownloadEngine.submit_direct() as users get it: adaptive connection
+              tuning from a fresh host profile, the scheduler's connection budget,
+              the shared limiter and the engine's hash_algorithms
+    ytdlp     yt-dlp's own HTTP downloader (the fallback for non-progressive formats)
+
+--hash makes chunked, single and engine compute that digest (the engine only
+hashes by default when a checksum is expected), so both configurations can
+be measured.
+
+Every path reports throughput, time to first byte, CPU seconds and peak RSS.
+The server's latency is added before every response (HEAD included), jitter
+varies it per request, and the bandwidth cap paces each connection on its own.
+"""
+import argparse
+import http.server
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ('chunked', 'single', 'engine', 'ytdlp')
+SEND_BLOCK = 64 * 1024     # Bytes the server sends between pacing checks
+
+# name -> (latency ms, jitter ms, per-connection KB/s or 0, HEAD supported)
+SCENARIOS = {
+    'lan': (0, 0, 0, True),
+    'wan': (40, 10, 0, True),
+    'capped': (20, 5, 4096, True),   # Servers that throttle each connection
+    'no-head': (40, 10, 0, False),   # HEAD answered with 405
+}
+
+CHILD = r"""
+import json, os, resource, sys, threading, time
+sys.path.insert(0, {root!r})
+opts = {opts!r}
+out = opts['out']
+start_cpu, start = time.process_time(), time.perf_counter()
+first_byte = []
+
+def watch(progress):
+    while not first_byte and not done.is_set():
+        if progress():
+            first_byte.append(time.perf_counter() - start)
+        time.sleep(0.002)
+
+done = threading.Event()
+if opts['path'] == 'ytdlp':
+    from yt_dlp import YoutubeDL
+    start_cpu, start = time.process_time(), time.perf_counter()   # Import time isn't download time
+
+    def hook(d):
+        if not first_byte and d.get('downloaded_bytes'):
+            first_byte.append(time.perf_counter() - start)
+
+    ydl_opts = {{'outtmpl': out, 'quiet': True, 'noprogress': True, 'no_warnings': True,
+                'progress_hooks': [hook], 'overwrites': True}}
+    with YoutubeDL(ydl_opts) as ydl:
+        if ydl.download([opts['url']]):
+            sys.exit("yt-dlp download failed")
+elif opts['path'] == 'engine':
+    import aura_engine
+    engine = aura_engine.DownloadEngine(os.path.dirname(out))
+    if opts['hash']:
+        engine.hash_algorithms = tuple(opts['hash'])
+    if os.path.exists(out):
+        os.remove(out)
+    start_cpu, start = time.process_time(), time.perf_counter()
+    task = engine.submit_direct(opts['url'], filename=os.path.basename(out))
+    threading.Thread(target=watch, args=(lambda: task.downloaded,), daemon=True).start()
+    engine.wait()
+    engine.close()
+    if task.state != "complete":
+        sys.exit(task.error or task.state)
+else:
+    import aura_engine
+    kwargs = {{'num_chunks': opts['connections']}}
+    if opts['buffer_kb']:
+        kwargs['buffers'] = aura_engine.BufferPool(size=opts['buffer_kb'] * 1024)
+    if opts['request_mb']:
+        kwargs['request_size'] = opts['request_mb'] * 1024 * 1024
+    if opts['hash']:
+        kwargs['hash_algorithms'] = tuple(opts['hash'])
+    d = aura_engine.ChunkedDownloader(opts['url'], out, **kwargs)
+    threading.Thread(target=watch, args=(lambda: d.bytes_done,), daemon=True).start()
+    start_cpu, start = time.process_time(), time.perf_counter()
+    ok = d.download() if opts['path'] == 'chunked' else d._single_stream_download()
+    if not ok:
+        sys.exit(d.error or "download failed")
+elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+done.set()
+if os.path.getsize(out) != opts['size']:
+    sys.exit("wrong size: %d" % os.path.getsize(out))
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+print("RESULT " + json.dumps({{'elapsed': elapsed, 'cpu': cpu, 'rss': rss,
+                              'ttfb': first_byte[0] if first_byte else None}}), flush=True)
+"""
+
+
+class PacedHandler(http.server.BaseHTTPRequestHandler):
+    """Range server for one file, with the latency, jitter, bandwidth cap and HEAD support of `link`."""
+
+    protocol_version = 'HTTP/1.1'
+    path_on_disk = None
+    link = SCENARIOS['lan']
+
+    def do_HEAD(self):
+        if not self.link[3]:
+            self.delay()
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_body(head=True)
+
+    def do_GET(self):
+        self.send_body(head=False)
+
+    def delay(self):
+        latency, jitter = self.link[0], self.link[1]
+        wait = latency + random.uniform(-jitter, jitter)
+        if wait > 0:
+            time.sleep(wait / 1000)
+
+    def send_body(self, head):
+        self.delay()
+        if os.path.basename(self.path) != os.path.basename(self.path_on_disk):
+            self.send_response(404)   # e.g. the engine looking for a .sha256 sidecar
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        size = os.path.getsize(self.path_on_disk)
+        first, last = 0, size - 1
+        rng = self.headers.get('Range', '')
+        if rng.startswith('bytes='):
+            a, _, b = rng[6:].partition('-')
+            first, last = int(a), min(int(b) if b else size - 1, size - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(last - first + 1))
+        self.end_headers()
+        if head:
+            return
+        rate = self.link[2] * 1024
+        with open(self.path_on_disk, 'rb') as f:
+            if not rate:
+                self.connection.sendfile(f, first, last - first + 1)
+                return
+            start, sent, total = time.monotonic(), 0, last - first + 1
+            while sent < total:
+                n = min(SEND_BLOCK, total - sent)
+                self.connection.sendfile(f, first + sent, n)
+                sent += n
+                ahead = start + sent / rate - time.monotonic()
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def log_message(self, *args):
+        pass
+
+
+class PacedServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass   # Clients drop connections mid-body (work stealing, cancels); not worth a traceback
+
+
+def run_once(opts):
+    child = CHILD.format(root=ROOT, opts=opts)
+    with tempfile.TemporaryDirectory() as home:
+        # A fresh app data dir, so the engine path starts from no learned host profile or cached download
+        env = dict(os.environ, HOME=home, APPDATA=home, USERPROFILE=home)
+        proc = subprocess.run([sys.executable, "-c", child], capture_output=True, text=True, timeout=1800, env=env)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            r = json.loads(line[7:])
+            return {
+                'mb_per_s': opts['size'] / 1e6 / r['elapsed'],
+                'seconds': r['elapsed'],
+                'ttfb_ms': r['ttfb'] * 1000 if r['ttfb'] is not None else None,
+                'cpu_s': r['cpu'],
+                'peak_rss_mb': r['rss'] / 1e6,
+            }
+    raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no result")
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {
+        'min': round(min(values), 4),
+        'median': round(statistics.median(values), 4),
+        'max': round(max(values), 4),
+    }
+
+
+def has_ytdlp():
+    return importlib.util.find_spec('yt_dlp') is not None
+
+
+def run_scenario(link, args, source, size, tmp):
+    PacedHandler.link = link
+    server = PacedServer(('127.0.0.1', 0), PacedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = {}
+    try:
+        for path in args.path or PATHS:
+            if path == 'ytdlp' and not has_ytdlp():
+                results[path] = {'skipped': "yt-dlp not installed"}
+                continue
+            opts = {
+                'path': path, 'size': size, 'connections': args.connections,
+                'buffer_kb': args.buffer_kb, 'request_mb': args.request_mb, 'hash': args.hash,
+                'url': f'http://127.0.0.1:{server.server_port}/{os.path.basename(source)}',
+                'out': os.path.join(tmp, f'out-{path}.mp4'),
+            }
+            try:
+                runs = [run_once(opts) for _ in range(args.runs)]
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                results[path] = {'failed': str(e)}
+                continue
+            results[path] = {key: summarize([r[key] for r in runs]) for key in runs[0]}
+    finally:
+        server.shutdown()
+        server.server_close()
+    latency, jitter, rate, head = link
+    return {'latency_ms': latency, 'jitter_ms': jitter, 'rate_kb_s': rate, 'head': head, 'paths': results}
+
+
+def print_results(result, baseline=None):
+    hashing = ", hashing " + "+".join(result['engine']['hash']) if result['engine'].get('hash') else ""
+    print(f"{result['runs']} runs, {result['size_mb']} MB, {result['engine']['connections']} connections"
+          f"{hashing} (medians)")
+    for name, scenario in result['scenarios'].items():
+        rate = f"{scenario['rate_kb_s']} KB/s per connection" if scenario['rate_kb_s'] else "uncapped"
+        print(f"  {name}: {scenario['latency_ms']}±{scenario['jitter_ms']} ms, {rate}, "
+              f"HEAD {'on' if scenario['head'] else 'off'}")
+        old = (baseline or {}).get('scenarios', {}).get(name, {}).get('paths', {})
+        for path, r in scenario['paths'].items():
+            if 'mb_per_s' not in r:
+                print(f"    {path:<8} {r.get('skipped') or 'failed: ' + r.get('failed', '?')}")
+                continue
+            line = (f"    {path:<8} {r['mb_per_s']['median']:8.1f} MB/s   "
+                    f"TTFB {r['ttfb_ms']['median'] if r['ttfb_ms'] else float('nan'):7.1f} ms   "
+                    f"CPU {r['cpu_s']['median']:6.2f} s   peak RSS {r['peak_rss_mb']['median']:6.1f} MB")
+            before = old.get(path, {})
+            if before.get('mb_per_s'):
+                deltas = []
+                for key, label in (('mb_per_s', "speed"), ('cpu_s', "CPU"), ('peak_rss_mb', "RSS")):
+                    was = before[key]['median']
+                    if was:
+                        deltas.append(f"{label} {(r[key]['median'] - was) / was * 100:+.0f}%")
+                line += "   vs baseline: " + ", ".join(deltas)
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Aura Downloader Pro download paths on a local link.")
+    parser.add_argument('-n', '--runs', type=int, default=3)
+    parser.add_argument('--size', type=int, default=64, help="File size in MB")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="Link preset (repeatable; default: lan unless a link option is given)")
+    parser.add_argument('--latency', type=float, help="Milliseconds before every response")
+    parser.add_argument('--jitter', type=float, default=0, help="± milliseconds of random latency per request")
+    parser.add_argument('--rate', type=int, default=0, help="KB/s cap per connection (0: uncapped)")
+    parser.add_argument('--no-head', action='store_true', help="Answer HEAD with 405")
+    parser.add_argument('--path', action='append', choices=PATHS, help="Run only these paths (repeatable)")
+    parser.add_argument('--connections', type=int, help="ChunkedDownloader num_chunks of the chunked path (default: CHUNK_COUNT; the engine path tunes its own)")
+    parser.add_argument('--buffer-kb', type=int, help="Receive buffer size (default: RECV_BUFFER_SIZE; capped at MIN_SEGMENT_SIZE)")
+    parser.add_argument('--request-mb', type=int, help="Cap on bytes per Range request")
+    parser.add_argument('--hash', action='append', default=[], help="Digest to compute while downloading, "
+                        "e.g. sha256 (repeatable; default: none, like the engine without an expected checksum)")
+    parser.add_argument('--out', help="Save the results as JSON to this file")
+    parser.add_argument('--compare', help="Results JSON of an earlier run to diff against")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import aura_engine
+    args.connections = args.connections or aura_engine.CHUNK_COUNT
+
+    scenarios = {name: SCENARIOS[name] for name in args.scenario or ()}
+    if args.latency is not None or args.jitter or args.rate or args.no_head:
+        scenarios['custom'] = (args.latency or 0, args.jitter, args.rate, not args.no_head)
+    scenarios = scenarios or {'lan': SCENARIOS['lan']}
+    size = args.size * 1024 * 1024
+
+    result = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': args.runs,
+        'size_mb': args.size,
+        'engine': {
+            'connections': args.connections,
+            'buffer_kb': min(args.buffer_kb or aura_engine.RECV_BUFFER_SIZE // 1024,
+                             aura_engine.MIN_SEGMENT_SIZE // 1024),
+            'request_mb': args.request_mb,
+            'hash': args.hash,
+        },
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.mp4')
+        with open(source, 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+        PacedHandler.path_on_disk = source
+        for name, link in scenarios.items():
+            result['scenarios'][name] = run_scenario(link, args, source, size, tmp)
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Receive-path benchmark — CPU time per GB and peak memory of reading HTTP
+bodies with `iter_content` versus `readinto` into pooled buffers.
+
+    python benchmarks/receive.py                   # 256 MB over 24 connections, 3 runs
+    python benchmarks/receive.py -c 8 --size 1024  # 1 GB over 8 connections
+    python benchmarks/receive.py --json
+
+A local range server (sendfile, so it costs the client little) serves a
+random file. Each run starts a fresh interpreter that downloads it in
+`connections` concurrent Range requests and reports its own CPU time and
+peak RSS:
+
+    iter_content  resp.iter_content(65536), one new bytes object per read
+    readinto      aura_engine.body_reader() into a BufferPool buffer
+    downloader    ChunkedDownloader.download() end to end (readinto path)
+"""
+import argparse
+import http.server
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTS = ('iter_content', 'readinto', 'downloader')
+
+CHILD = r"""
+import os, resource, sys, threading, time
+sys.path.insert(0, {root!r})
+import aura_engine
+url, size, connections, variant, out = {url!r}, {size}, {connections}, {variant!r}, {out!r}
+
+def fetch(pool, buffers, first, last):
+    resp = pool.get(url, headers={{'Range': 'bytes=%d-%d' % (first, last)}}, stream=True, timeout=60)
+    with resp, open(out, 'r+b') as f:
+        f.seek(first)
+        if variant == 'iter_content':
+            for data in resp.iter_content(chunk_size=65536):
+                f.write(data)
+        else:
+            readinto = aura_engine.body_reader(resp)
+            buffer = buffers.acquire()
+            view = memoryview(buffer)
+            try:
+                while True:
+                    n = readinto(view)
+                    if not n:
+                        break
+                    f.write(view[:n])
+            finally:
+                view.release()
+                buffers.release(buffer)
+
+with open(out, 'wb') as f:
+    f.truncate(size)
+start_cpu, start = time.process_time(), time.perf_counter()
+if variant == 'downloader':
+    d = aura_engine.ChunkedDownloader(url, out, num_chunks=connections, preallocate=False)
+    if not d.download():
+        sys.exit(d.error)
+else:
+    pool = aura_engine.ConnectionPool()
+    buffers = aura_engine.BufferPool(count=connections)
+    step = -(-size // connections)
+    threads = [threading.Thread(target=fetch, args=(pool, buffers, i, min(i + step, size) - 1))
+               for i in range(0, size, step)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+if os.path.getsize(out) != size:
+    sys.exit("wrong size")
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("RESULT", elapsed, cpu, rss * (1 if sys.platform == 'darwin' else 1024), flush=True)
+"""
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    path_on_disk = None
+
+    def do_HEAD(self):
+        self.send_body(head=True)
+
+    def do_GET(self):
+        self.send_body(head=False)
+
+    def send_body(self, head):
+        size = os.path.getsize(self.path_on_disk)
+        first, last = 0, size - 1
+        rng = self.headers.get('Range', '')
+        if rng.startswith('bytes='):
+            a, _, b = rng[6:].partition('-')
+            first, last = int(a), min(int(b) if b else size - 1, size - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(last - first + 1))
+        self.end_headers()
+        if not head:
+            with open(self.path_on_disk, 'rb') as f:
+                self.connection.sendfile(f, first, last - first + 1)
+
+    def log_message(self, *args):
+        pass
+
+
+class RangeServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass   # Clients drop connections mid-body (work stealing); not worth a traceback
+
+
+def run_once(url, size, connections, variant, out):
+    child = CHILD.format(root=ROOT, url=url, size=size, connections=connections, variant=variant, out=out)
+    proc = subprocess.run([sys.executable, "-c", child], capture_output=True, text=True, timeout=600)
+    for line in proc.stdout.splitlines():
+        parts = line.split()
+        if parts and parts[0] == "RESULT":
+            elapsed, cpu, rss = map(float, parts[1:])
+            return {'seconds': elapsed, 'cpu_s_per_gb': cpu / (size / 1e9),
+                    'mb_per_s': size / 1e6 / elapsed, 'peak_rss_mb': rss / 1e6}
+    raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no result")
+
+
+def summarize(values):
+    return {
+        'min': round(min(values), 4),
+        'median': round(statistics.median(values), 4),
+        'max': round(max(values), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Aura Downloader Pro receive paths.")
+    parser.add_argument('-n', '--runs', type=int, default=3)
+    parser.add_argument('-c', '--connections', type=int, default=24)
+    parser.add_argument('--size', type=int, default=256, help="File size in MB")
+    parser.add_argument('--variant', action='append', choices=VARIANTS, help="Run only these (repeatable)")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+    size = args.size * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.bin')
+        with open(source, 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+        RangeHandler.path_on_disk = source
+        server = RangeServer(('127.0.0.1', 0), RangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_port}/source.bin'
+        try:
+            results = {}
+            for variant in args.variant or VARIANTS:
+                runs = [run_once(url, size, args.connections, variant, os.path.join(tmp, 'out.bin'))
+                        for _ in range(args.runs)]
+                results[variant] = {key: summarize([r[key] for r in runs]) for key in runs[0]}
+        except RuntimeError as e:
+            sys.exit(f"receive benchmark failed: {e}")
+        finally:
+            server.shutdown()
+
+    result = {'runs': args.runs, 'connections': args.connections, 'size_mb': args.size, 'variants': results}
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{args.runs} runs, {args.size} MB over {args.connections} connections (medians)")
+    for variant, r in results.items():
+        print(f"  {variant:<13} {r['cpu_s_per_gb']['median']:6.2f} CPU s/GB   "
+              f"{r['mb_per_s']['median']:7.0f} MB/s   peak RSS {r['peak_rss_mb']['median']:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Soak test — pushes thousands of downloads through DownloadEngine against a
+local server that injects connection resets, truncated bodies, 5xx answers
+and stalled connections, and watches the process for leaks.
+
+    python benchmarks/soak.py                           # 2000 items in waves of 200
+    python benchmarks/soak.py --items 10000 --jobs 8
+    python benchmarks/soak.py --duration 180            # keep going for 3 hours
+    python benchmarks/soak.py --reset 0.1 --stall 0.05  # a much worse link
+    python benchmarks/soak.py --out soak.json --compare last-soak.json
+
+Every item is a distinct file with a known SHA-256 (passed as the expected
+checksum), so a corrupted download fails its item instead of passing
+silently. After each wave, with the engine idle again, the harness samples
+RSS, open file descriptors, live threads and leftover files in the download
+directory: `.aura_chunk_*` temp chunks, journals and temp files of finished
+items. Then it deletes that wave's files. Leaks are flagged as:
+
+    threads / fds  still above the post-warm-up level (plus slack) at the end
+    rss            growing faster than --rss-slope MB per 1000 items over the
+                   second half of the run (buffer pools and the bounded
+                   download cache are still filling during the first)
+    leftovers      any file left behind by a finished item
+    failed         more items failed than --max-failed (default 0: the engine
+                   is expected to retry its way through every injected fault)
+
+The server runs in its own process so its sockets and threads don't count.
+The failing URLs and their errors are printed. The exit status is 1 if a
+leak, too many failed items (or, with --compare, a regression) is flagged.
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BLOB_SIZE = 16 * 1024 * 1024   # Random bytes every item is cut from (server and harness build the same blob)
+FAULTS = ('reset', 'truncate', 'error', 'stall')
+
+
+def make_blob(seed):
+    return random.Random(seed).randbytes(BLOB_SIZE)
+
+
+def item_slice(n, size):
+    """Where item n's bytes start in the blob."""
+    return (n * 104729) % (BLOB_SIZE - size)
+
+
+# ==============================================================================
+#  FAULT SERVER — runs in a child process (soak.py --serve)
+# ==============================================================================
+
+class FaultHandler(http.server.BaseHTTPRequestHandler):
+    """Serves /soak/<n>/<size>/<name>, failing each request with the configured odds."""
+
+    protocol_version = 'HTTP/1.1'
+    blob = b''
+    odds = {}
+    stall_seconds = 2.0
+
+    def do_HEAD(self):
+        self.respond(head=True)
+
+    def do_GET(self):
+        self.respond(head=False)
+
+    def pick_fault(self, head):
+        roll = random.random()
+        for fault in FAULTS:
+            if head and fault != 'error':
+                continue
+            roll -= self.odds.get(fault, 0)
+            if roll < 0:
+                return fault
+        return None
+
+    def respond(self, head):
+        parts = self.path.split('/')
+        if len(parts) != 5 or parts[1] != 'soak':
+            self.send_error(404)
+            return
+        n, size = int(parts[2]), int(parts[3])
+        fault = self.pick_fault(head)
+        if fault == 'error':
+            status = random.choice((500, 502, 503))
+            self.send_response(status)
+            if status == 503:
+                self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        first, last = 0, size - 1
+        rng = self.headers.get('Range', '')
+        if rng.startswith('bytes='):
+            a, _, b = rng[6:].partition('-')
+            first, last = int(a), min(int(b) if b else size - 1, size - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(last - first + 1))
+        self.send_header('ETag', f'"soak-{n}-{size}"')
+        self.end_headers()
+        if head:
+            return
+        start = item_slice(n, size)
+        body = memoryview(self.blob)[start + first:start + last + 1]
+        cut = random.randrange(len(body)) if fault else len(body)
+        self.wfile.write(body[:cut])
+        if fault == 'stall':
+            self.wfile.flush()
+            time.sleep(self.stall_seconds)
+            self.wfile.write(body[cut:])
+        elif fault == 'reset':
+            self.wfile.flush()
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.connection.close()
+            self.close_connection = True
+        elif fault == 'truncate':
+            self.wfile.flush()
+            self.connection.shutdown(socket.SHUT_WR)
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class FaultServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass   # Injected resets and clients giving up on stalls
+
+
+def serve(args):
+    FaultHandler.blob = make_blob(args.seed)
+    FaultHandler.odds = {fault: getattr(args, fault) for fault in FAULTS}
+    FaultHandler.stall_seconds = args.stall_seconds
+    random.seed(args.seed + 1)
+    server = FaultServer(('127.0.0.1', 0), FaultHandler)
+    print(server.server_port, flush=True)
+    server.serve_forever()
+
+
+# ==============================================================================
+#  HARNESS
+# ==============================================================================
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss   # Peak only, without /proc
+        return peak * (1 if sys.platform == 'darwin' else 1024) / 1e6
+
+
+def open_fds():
+    for path in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            pass
+    return None
+
+
+def leftovers(directory):
+    """Files finished items should not have left behind."""
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith('.aura_chunk_') or name.endswith(('.aura', '.aura.tmp', '.tmp', '.part')):
+            found.append(name)
+    return found
+
+
+def slope(xs, ys):
+    """Least-squares slope of ys over xs."""
+    if len(xs) < 2:
+        return 0.0
+    mx, my = statistics.mean(xs), statistics.mean(ys)
+    den = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / den if den else 0.0
+
+
+def run_wave(engine, base_url, blob, first, count, sizes, rnd, directory):
+    """Submit items first..first+count-1, wait for them, check and delete their files."""
+    tasks = []
+    for n in range(first, first + count):
+        size = rnd.randint(*sizes)
+        start = item_slice(n, size)
+        digest = hashlib.sha256(memoryview(blob)[start:start + size]).hexdigest()
+        tasks.append(engine.submit(f'{base_url}/soak/{n}/{size}/item{n}.bin', checksum=f'sha256:{digest}'))
+    engine.wait()
+    outcome = {'complete': 0, 'failed': 0, 'cancelled': 0, 'retries': 0, 'errors': {}, 'failures': []}
+    left = []
+    for task in tasks:
+        outcome[task.state] = outcome.get(task.state, 0) + 1
+        outcome['retries'] += task.retries
+        if task.state != 'complete':
+            error = (task.error or '?').split(' (after')[0][:60]
+            outcome['errors'][error] = outcome['errors'].get(error, 0) + 1
+            outcome['failures'].append({'url': task.url, 'state': task.state, 'error': task.error})
+        if not task.save_path:
+            continue
+        if task.state == 'complete':
+            left += [name for name in leftovers(directory)
+                     if name.startswith(os.path.basename(task.save_path))]
+        else:
+            journal = task.save_path + '.aura'   # Resumable partials are kept by design; the harness clears them
+            if os.path.exists(journal):
+                os.remove(journal)
+        if os.path.exists(task.save_path):
+            os.remove(task.save_path)
+    left += [name for name in leftovers(directory) if name.startswith('.aura_chunk_')]
+    outcome['leftovers'] = sorted(set(left))
+    for name in outcome['leftovers']:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+    return outcome
+
+
+def verdict(samples, args):
+    """Leak and regression findings from the per-wave samples."""
+    findings = []
+    failed = sum(len(s.get('failures', ())) for s in samples)
+    if failed > args.max_failed:
+        findings.append(f"failed: {failed} items did not complete (threshold {args.max_failed})")
+    if len(samples) < 3:
+        return findings
+    warm = samples[1]   # After the first wave: pools, caches and imports are warm
+    last = samples[-1]
+    if last['threads'] > warm['threads'] + args.thread_slack:
+        findings.append(f"threads: {warm['threads']} after warm-up, {last['threads']} at the end")
+    if last['fds'] is not None and warm['fds'] is not None and last['fds'] > warm['fds'] + args.fd_slack:
+        findings.append(f"fds: {warm['fds']} after warm-up, {last['fds']} at the end")
+    steady = samples[max(1, len(samples) // 2):]
+    per_1000 = slope([s['items'] for s in steady], [s['rss_mb'] for s in steady]) * 1000
+    if per_1000 > args.rss_slope and last['rss_mb'] - steady[0]['rss_mb'] > args.rss_slope:
+        findings.append(f"rss: growing {per_1000:.1f} MB per 1000 items "
+                        f"({warm['rss_mb']:.0f} -> {steady[0]['rss_mb']:.0f} -> {last['rss_mb']:.0f} MB)")
+    left = sum(len(s['leftovers']) for s in samples)
+    if left:
+        names = sorted({name for s in samples for name in s['leftovers']})[:5]
+        findings.append(f"leftovers: {left} files left by finished items (e.g. {', '.join(names)})")
+    return findings
+
+
+def regressions(result, baseline):
+    found = []
+    for key, label, worse in (('items_per_s', "throughput", -1), ('final_rss_mb', "final RSS", 1)):
+        old, new = baseline.get(key), result.get(key)
+        if old and new and (new - old) / old * worse > 0.2:
+            found.append(f"{label}: {old:.1f} -> {new:.1f} ({(new - old) / old * 100:+.0f}%)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak DownloadEngine under injected network faults and flag leaks.")
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--duration', type=float, help="Minutes to keep running waves (overrides --items)")
+    parser.add_argument('--wave', type=int, default=200, help="Items submitted together between samples")
+    parser.add_argument('-j', '--jobs', type=int, default=8, help="Downloads running at once")
+    parser.add_argument('--min-kb', type=int, default=64)
+    parser.add_argument('--max-kb', type=int, default=4096)
+    parser.add_argument('--reset', type=float, default=0.02, help="Share of GETs reset mid-body")
+    parser.add_argument('--truncate', type=float, default=0.02, help="Share of GETs closed early")
+    parser.add_argument('--error', type=float, default=0.03, help="Share of requests answered 500/502/503")
+    parser.add_argument('--stall', type=float, default=0.01, help="Share of GETs that stall mid-body")
+    parser.add_argument('--stall-seconds', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--thread-slack', type=int, default=2)
+    parser.add_argument('--fd-slack', type=int, default=16)
+    parser.add_argument('--max-failed', type=int, default=0, help="Failed items tolerated before the run fails")
+    parser.add_argument('--rss-slope', type=float, default=5.0, help="Tolerated MB of RSS growth per 1000 items")
+    parser.add_argument('--out', help="Save the samples and findings as JSON")
+    parser.add_argument('--compare', help="Results JSON of an earlier soak to check for regressions")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+        return
+
+    home = tempfile.TemporaryDirectory()   # Keep the engine's caches and profiles out of the real app-data dir
+    os.environ['HOME'] = os.environ['APPDATA'] = os.environ['USERPROFILE'] = home.name
+    sys.path.insert(0, ROOT)
+    import aura_engine
+
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve'] + [
+        f'--{name}={getattr(args, name.replace("-", "_"))}'
+        for name in ('reset', 'truncate', 'error', 'stall', 'stall-seconds', 'seed')
+    ], stdout=subprocess.PIPE, text=True)
+    samples, findings = [], []
+    try:
+        base_url = f'http://127.0.0.1:{server.stdout.readline().strip()}'
+        blob = make_blob(args.seed)
+        rnd = random.Random(args.seed + 2)
+        sizes = (args.min_kb * 1024, args.max_kb * 1024)
+        with tempfile.TemporaryDirectory() as directory:
+            engine = aura_engine.DownloadEngine(directory, max_active=args.jobs)
+            started = time.monotonic()
+            deadline = started + args.duration * 60 if args.duration else None
+            samples.append({'items': 0, 'seconds': 0, 'rss_mb': rss_mb(), 'fds': open_fds(),
+                            'threads': threading.active_count(), 'leftovers': []})
+            done = 0
+            while (done < args.items) if deadline is None else (time.monotonic() < deadline):
+                count = args.wave if deadline else min(args.wave, args.items - done)
+                outcome = run_wave(engine, base_url, blob, done, count, sizes, rnd, directory)
+                done += count
+                sample = {'items': done, 'seconds': round(time.monotonic() - started, 1),
+                          'rss_mb': round(rss_mb(), 1), 'fds': open_fds(), 'threads': threading.active_count()}
+                sample.update(outcome)
+                samples.append(sample)
+                if not args.json:
+                    print(f"{done:6d} items {sample['seconds']:7.0f}s  rss {sample['rss_mb']:6.1f} MB  "
+                          f"fds {sample['fds']}  threads {sample['threads']}  "
+                          f"ok {outcome['complete']} failed {outcome['failed']} retries {outcome['retries']}  "
+                          f"leftovers {len(outcome['leftovers'])}", flush=True)
+            engine.close()
+            elapsed = time.monotonic() - started
+    finally:
+        server.kill()
+        server.wait()
+        home.cleanup()
+
+    findings = verdict(samples, args)
+    result = {
+        'items': samples[-1]['items'],
+        'seconds': round(elapsed, 1),
+        'items_per_s': round(samples[-1]['items'] / elapsed, 2) if elapsed else None,
+        'final_rss_mb': samples[-1]['rss_mb'],
+        'failed': sum(len(s.get('failures', ())) for s in samples),
+        'failures': [failure for s in samples for failure in s.get('failures', ())],
+        'faults': {fault: getattr(args, fault) for fault in FAULTS},
+        'samples': samples,
+        'findings': findings,
+    }
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            findings += regressions(result, json.load(f))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        errors = {}
+        for s in samples:
+            for error, count in s.get('errors', {}).items():
+                errors[error] = errors.get(error, 0) + count
+        print(f"{result['items']} items in {result['seconds']:.0f}s ({result['items_per_s']} items/s), "
+              f"{result['failed']} failed")
+        for error, count in sorted(errors.items(), key=lambda e: -e[1])[:5]:
+            print(f"  {count:5d} × {error}")
+        for failure in result['failures'][:20]:
+            print(f"  ✗ {failure['url']} [{failure['state']}]: {failure['error']}")
+        if len(result['failures']) > 20:
+            print(f"  … and {len(result['failures']) - 20} more (see --out)")
+        print("No leaks or failures found" if not findings else "LEAKS / FAILURES / REGRESSIONS:")
+        for finding in findings:
+            print(f"  ⚠️  {finding}")
+    sys.exit(1 if findings else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup benchmark — time from launching a fresh interpreter to the first
+mapped Aura Downloader Pro window.
+
+    python benchmarks/startup.py              # 10 runs, warm asset cache
+    python benchmarks/startup.py --cold -n 5  # empty app-data dir every run
+    python benchmarks/startup.py --json
+
+Each run reports when `import main` finished and when the window became
+visible, both measured from just before the child process was spawned.
+Needs a display (on Linux CI, run it under xvfb-run).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import sys, time
+sys.path.insert(0, {root!r})
+import main
+print("IMPORTED", time.time(), flush=True)
+app = main.AuraDownloaderPro()
+app.wait_visibility(app)
+print("SHOWN", time.time(), "ytdlp" if "yt_dlp" in sys.modules else "-", flush=True)
+app.destroy()
+"""
+
+
+def run_once(cold):
+    env = dict(os.environ)
+    tmp = None
+    if cold:
+        # A fresh app-data dir: no cached icon/logo assets, no host profiles
+        tmp = tempfile.TemporaryDirectory()
+        env['HOME'] = env['APPDATA'] = env['USERPROFILE'] = tmp.name
+    try:
+        start = time.time()
+        proc = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT)], env=env,
+                              capture_output=True, text=True, timeout=120)
+        marks = {}
+        for line in proc.stdout.splitlines():
+            parts = line.split()
+            if parts and parts[0] in ("IMPORTED", "SHOWN"):
+                marks[parts[0]] = float(parts[1]) - start
+                if parts[0] == "SHOWN":
+                    marks['yt_dlp_loaded'] = parts[2] == "ytdlp"
+        if "SHOWN" not in marks:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "window never shown")
+        return marks
+    finally:
+        if tmp:
+            tmp.cleanup()
+
+
+def summarize(values):
+    return {
+        'min': round(min(values), 4),
+        'median': round(statistics.median(values), 4),
+        'max': round(max(values), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Aura Downloader Pro time to first window.")
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument('--cold', action='store_true', help="Start every run with an empty app-data dir")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    try:
+        runs = [run_once(args.cold) for _ in range(args.runs)]
+    except RuntimeError as e:
+        sys.exit(f"startup benchmark failed: {e}")
+
+    result = {
+        'runs': args.runs,
+        'cold': args.cold,
+        'import_s': summarize([r['IMPORTED'] for r in runs]),
+        'first_window_s': summarize([r['SHOWN'] for r in runs]),
+        'yt_dlp_imported_at_startup': any(r['yt_dlp_loaded'] for r in runs),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{args.runs} runs ({'cold' if args.cold else 'warm'} asset cache)")
+    for key, label in (('import_s', "import main"), ('first_window_s', "first window")):
+        s = result[key]
+        print(f"  {label:<13} min {s['min']*1000:7.1f} ms   median {s['median']*1000:7.1f} ms   max {s['max']*1000:7.1f} ms")
+    print(f"  yt-dlp imported at startup: {'yes' if result['yt_dlp_imported_at_startup'] else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,33 +2,50 @@ import os
 import sys
 import subprocess
 import threading
-import re
-import urllib.parse
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import importlib.util
+
+REQUIRED_PACKAGES = [   # (pip name, import name)
+    ("customtkinter", "customtkinter"),
+    ("yt-dlp", "yt_dlp"),
+    ("requests", "requests"),
+    ("Pillow", "PIL"),
+    ("pycryptodomex", "Cryptodome"),   # Fast AES-128 for encrypted HLS streams
+]
 
 # Auto-install dependencies if missing to ensure smooth experience for the user
 def install_and_import(package, import_name=None):
     if import_name is None:
         import_name = package
-    try:
-        __import__(import_name)
-    except ImportError:
+    if importlib.util.find_spec(import_name) is None:   # Looks the package up without importing it
         print(f"Installing missing required package: {package}...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", package])
 
-install_and_import("customtkinter")
-install_and_import("yt-dlp", "yt_dlp")
-install_and_import("requests")
-install_and_import("Pillow", "PIL")
+
+def ensure_dependencies():
+    """Install whatever is missing. Kept off the startup path: runs only when an import fails, or in the background."""
+    for package, import_name in REQUIRED_PACKAGES:
+        try:
+            install_and_import(package, import_name)
+        except Exception:
+            pass
+
+
+try:
+    import customtkinter, PIL, requests   # noqa: F401 — already imported on a normal start
+except ImportError:
+    ensure_dependencies()
 
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import tkinter as tk
-from yt_dlp import YoutubeDL
-import requests
 from PIL import Image
 
+from aura_engine import (
+    DownloadEngine, get_default_download_location, get_app_data_dir, clean_url,
+    is_direct_file_url, is_manifest_url, get_filename_from_url, is_url, format_speed, format_eta,
+    list_video_formats, find_partial_downloads, YTDLP_DEFAULT_FORMAT,
+)
+
 # Set modern aesthetic
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
@@ -64,24 +81,26 @@ CLR_LINK_CARD     = "#161e2c"   # Link card in notepad
 CLR_QUEUE_BG      = "#0e1420"   # Queue item background
 CLR_PROGRESS_FG   = "#00aaff"   # Progress bar fill
 CLR_PROGRESS_BG   = "#1a2030"   # Progress bar background
+CLR_POST_FG       = "#d4780a"   # Post-processing (merge / MP3) bar fill
 
 # ==============================================================================
 #  CONSTANTS
 # ==============================================================================
-CHUNK_COUNT = 8           # Number of parallel chunks for accelerated downloads
-MAX_CONCURRENT_DL = 3     # Max concurrent downloads in the queue
 CLIPBOARD_POLL_MS = 1000  # Clipboard check interval in milliseconds
-
-# Known direct-download file extensions
-DIRECT_FILE_EXTENSIONS = {
-    '.exe', '.msi', '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2', '.xz',
-    '.iso', '.img', '.dmg',
-    '.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm',
-    '.mp3', '.flac', '.wav', '.aac', '.ogg',
-    '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx',
-    '.apk', '.deb', '.rpm', '.appimage',
-    '.bin', '.dat', '.torrent',
-    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp', '.ico', '.tiff',
+UI_TICK_MS = 66           # UI refresh interval (~15 Hz) for coalesced worker updates
+QUEUE_HISTORY_LIMIT = 200 # Finished items kept in the queue list; older ones are removed
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_FILE = "aura-downloder-pro.png"
+ICON_SIZE = 64            # Window icon size (pixels)
+HEADER_LOGO_SIZE = 55     # Header logo size; cached at 2x for HiDPI scaling
+SPEED_LIMIT_CHOICES = {   # Global and per-download speed limit options offered in the UI (bytes/s)
+    "Unlimited": None,
+    "512 KB/s": 512 * 1024,
+    "1 MB/s": 1024 * 1024,
+    "2 MB/s": 2 * 1024 * 1024,
+    "5 MB/s": 5 * 1024 * 1024,
+    "10 MB/s": 10 * 1024 * 1024,
+    "25 MB/s": 25 * 1024 * 1024,
 }
 
 # ==============================================================================
@@ -116,218 +135,82 @@ $notify.dispose()
         pass
 
 
-def get_default_download_location():
-    if os.name == 'nt':
-        user_profile = os.environ.get('USERPROFILE')
-        if user_profile:
-            return os.path.join(user_profile, 'Downloads')
-    return os.path.join(os.path.expanduser('~'), 'Downloads')
-
-
-def clean_url(url):
+def get_logo_asset(size, fmt):
     """
-    Remove playlist parameters from YouTube URLs so it focuses on the single video.
-    Strips: list, index, start_radio, etc.
+    Path of the logo resized to size x size, cached in the app data dir.
+    Only built when missing, so normal startups skip decoding the 1.4 MB PNG.
+    The cache key includes the logo's byte size (mtimes don't survive a
+    one-file build unpacking itself on every launch).
     """
-    url = url.strip()
-    parsed = urllib.parse.urlparse(url)
-
-    # Only strip for YouTube domains
-    yt_domains = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'youtu.be')
-    if parsed.hostname and parsed.hostname.lower() in yt_domains:
-        params = urllib.parse.parse_qs(parsed.query)
-        # Remove playlist-related params
-        for key in ['list', 'index', 'start_radio', 'rdm', 'playnext']:
-            params.pop(key, None)
-        clean_query = urllib.parse.urlencode(params, doseq=True)
-        parsed = parsed._replace(query=clean_query)
-        url = urllib.parse.urlunparse(parsed)
-    return url
-
-
-def is_direct_file_url(url):
-    """Check if a URL points to a direct downloadable file."""
+    src = os.path.join(APP_DIR, LOGO_FILE)
     try:
-        parsed = urllib.parse.urlparse(url)
-        path = parsed.path.lower()
-        return any(path.endswith(ext) for ext in DIRECT_FILE_EXTENSIONS)
-    except Exception:
-        return False
-
-
-def get_filename_from_url(url):
-    """Extract a filename from a URL."""
-    parsed = urllib.parse.urlparse(url)
-    path = parsed.path
-    name = os.path.basename(path)
-    if not name:
-        name = "downloaded_file"
-    return urllib.parse.unquote(name)
+        src_size = os.path.getsize(src)
+    except OSError:
+        return None
+    cache_dir = os.path.join(get_app_data_dir(), "assets")
+    dest = os.path.join(cache_dir, f"logo_{size}_{src_size}.{fmt.lower()}")
+    if not os.path.exists(dest):
+        os.makedirs(cache_dir, exist_ok=True)
+        img = Image.open(src).resize((size, size), Image.LANCZOS)
+        tmp = dest + ".tmp"
+        if fmt == 'ICO':
+            img.save(tmp, format=fmt, sizes=[(size, size)])
+        else:
+            img.save(tmp, format=fmt)
+        os.replace(tmp, dest)
+    return dest
 
 
-def is_url(text):
-    """Check if text looks like a URL."""
-    text = text.strip()
-    return bool(re.match(r'^https?://', text, re.IGNORECASE))
+def format_task_progress(task):
+    """Queue-item status line for a running DownloadTask."""
+    if task.state == "processing":
+        return f"{task.status} {(task.post_progress or 0.0)*100:.0f}%"
+    text = f"⏳ {task.progress*100:.1f}% | {format_speed(task.speed)} | ETA: {format_eta(task.eta)}"
+    active = [s for s in task.connection_speeds if s > 0]
+    if len(active) > 1:
+        text += f" | {len(active)} conns {format_speed(min(active))}–{format_speed(max(active))}"
+    return text
 
 
 # ==============================================================================
-#  CHUNKED DOWNLOADER ENGINE — with Pause / Resume / Cancel
+#  UI EVENT BUS — coalesced hand-off from worker threads to the Tk main loop
 # ==============================================================================
 
-class ChunkedDownloader:
+class UIEventBus:
     """
-    Downloads a file from a direct URL using multiple concurrent connections.
-    Splits the file into CHUNK_COUNT parts, downloads them in parallel,
-    and stitches them back together for maximum speed.
-    Supports pause, resume, and cancel.
+    The single queue from worker threads to the UI.
+    Progress/status updates are merged per target (the latest value of each
+    field wins) and one-off calls are kept in order. The main loop drains both
+    on a fixed tick, so UI cost scales with the number of items, not with bytes.
     """
 
-    def __init__(self, url, save_path, num_chunks=CHUNK_COUNT,
-                 progress_callback=None, status_callback=None):
-        self.url = url
-        self.save_path = save_path
-        self.num_chunks = num_chunks
-        self.progress_callback = progress_callback
-        self.status_callback = status_callback
-        self.total_size = 0
-        self.downloaded_bytes = [0] * num_chunks
-        self.cancelled = False
-        self._pause_event = threading.Event()
-        self._pause_event.set()  # Start in un-paused state
+    def __init__(self):
         self._lock = threading.Lock()
-
-    def pause(self):
-        """Pause the download."""
-        self._pause_event.clear()
-        self._report_status("⏸️ Paused")
-
-    def resume(self):
-        """Resume the download."""
-        self._pause_event.set()
-        self._report_status("⏳ Resuming...")
-
-    def cancel(self):
-        """Cancel the download."""
-        self.cancelled = True
-        self._pause_event.set()  # Unblock any paused threads
-
-    @property
-    def is_paused(self):
-        return not self._pause_event.is_set()
-
-    def _report_status(self, text):
-        if self.status_callback:
-            self.status_callback(text)
-
-    def _report_progress(self):
-        if self.progress_callback:
-            total_dl = sum(self.downloaded_bytes)
-            self.progress_callback(total_dl, self.total_size)
-
-    def _download_chunk(self, chunk_index, start, end, temp_path):
-        """Download a single chunk of the file."""
-        headers = {'Range': f'bytes={start}-{end}'}
-        try:
-            resp = requests.get(self.url, headers=headers, stream=True, timeout=60)
-            resp.raise_for_status()
-            with open(temp_path, 'wb') as f:
-                for data in resp.iter_content(chunk_size=65536):
-                    # Check pause
-                    self._pause_event.wait()
-                    if self.cancelled:
-                        return False
-                    f.write(data)
-                    with self._lock:
-                        self.downloaded_bytes[chunk_index] += len(data)
-                    self._report_progress()
-            return True
-        except Exception as e:
-            if not self.cancelled:
-                self._report_status(f"Chunk {chunk_index + 1} error: {e}")
-            return False
-
-    def download(self):
-        """Execute the chunked download. Returns True on success."""
-        self._report_status("Analyzing file...")
-
-        try:
-            head = requests.head(self.url, allow_redirects=True, timeout=30)
-            self.total_size = int(head.headers.get('content-length', 0))
-            accept_ranges = head.headers.get('accept-ranges', 'none').lower()
-        except Exception as e:
-            self._report_status(f"Error: {e}")
-            return False
-
-        if accept_ranges != 'bytes' or self.total_size < 1024 * 1024:
-            return self._single_stream_download()
-
-        self._report_status(f"Splitting into {self.num_chunks} chunks ({self.total_size / (1024*1024):.1f} MB)...")
-
-        chunk_size = self.total_size // self.num_chunks
-        temp_dir = os.path.dirname(self.save_path)
-        temp_files = []
-        futures = []
-
-        with ThreadPoolExecutor(max_workers=self.num_chunks) as executor:
-            for i in range(self.num_chunks):
-                start = i * chunk_size
-                end = (start + chunk_size - 1) if i < self.num_chunks - 1 else self.total_size - 1
-                temp_path = os.path.join(temp_dir, f".aura_chunk_{i}_{os.path.basename(self.save_path)}")
-                temp_files.append(temp_path)
-                futures.append(executor.submit(self._download_chunk, i, start, end, temp_path))
-
-            results = [f.result() for f in futures]
-
-        if self.cancelled or not all(results):
-            for tf in temp_files:
-                try:
-                    os.remove(tf)
-                except OSError:
-                    pass
-            return False
-
-        # Stitch chunks together
-        self._report_status("🔗 Stitching file parts together...")
-        try:
-            with open(self.save_path, 'wb') as out_file:
-                for tf in temp_files:
-                    with open(tf, 'rb') as chunk_file:
-                        while True:
-                            data = chunk_file.read(1024 * 1024)
-                            if not data:
-                                break
-                            out_file.write(data)
-                    os.remove(tf)
-        except Exception as e:
-            self._report_status(f"Stitch error: {e}")
-            return False
-
-        self._report_status("✅ Download complete!")
-        return True
-
-    def _single_stream_download(self):
-        """Fallback: single-stream download."""
-        self._report_status("Downloading (single stream)...")
-        try:
-            resp = requests.get(self.url, stream=True, timeout=120)
-            resp.raise_for_status()
-            self.total_size = int(resp.headers.get('content-length', 0))
-
-            with open(self.save_path, 'wb') as f:
-                for data in resp.iter_content(chunk_size=65536):
-                    self._pause_event.wait()
-                    if self.cancelled:
-                        return False
-                    f.write(data)
-                    with self._lock:
-                        self.downloaded_bytes[0] += len(data)
-                    self._report_progress()
-            return True
-        except Exception as e:
-            if not self.cancelled:
-                self._report_status(f"Download error: {e}")
-            return False
+        self._updates = {}   # id(target) -> (target, {field: value})
+        self._calls = []
+
+    def post(self, target, **fields):
+        """Merge field updates for target; applied via target.apply_updates(**fields)."""
+        with self._lock:
+            entry = self._updates.get(id(target))
+            if entry is None:
+                self._updates[id(target)] = (target, dict(fields))
+                return
+            pending = entry[1]
+            for key, value in fields.items():
+                pending.pop(key, None)   # Re-insert so fields apply in the order last posted
+                pending[key] = value
+
+    def call(self, func, *args):
+        """Run func(*args) on the UI thread at the next tick, after pending updates."""
+        with self._lock:
+            self._calls.append((func, args))
+
+    def drain(self):
+        with self._lock:
+            updates, self._updates = self._updates, {}
+            calls, self._calls = self._calls, []
+        return list(updates.values()), calls
 
 
 # ==============================================================================
@@ -343,11 +226,8 @@ class DownloadQueueItem(ctk.CTkFrame):
 
         self.title_text = title
         self.url = url
-        self._downloader = None          # Reference to ChunkedDownloader (direct downloads)
-        self._ytdlp_paused = False       # For yt-dlp pause emulation
-        self._ytdlp_cancelled = False    # For yt-dlp cancel
-        self._pause_event = threading.Event()
-        self._pause_event.set()
+        self._task = None                # DownloadTask driving this item
+        self._on_reorder = None
 
         # Row 0: Title + control buttons
         top_row = ctk.CTkFrame(self, fg_color="transparent")
@@ -364,13 +244,48 @@ class DownloadQueueItem(ctk.CTkFrame):
         btn_frame = ctk.CTkFrame(top_row, fg_color="transparent")
         btn_frame.grid(row=0, column=1, padx=(5, 0))
 
+        # Queue order buttons — only useful while the item is still waiting
+        order_frame = ctk.CTkFrame(btn_frame, fg_color="transparent")
+        order_frame.grid(row=0, column=0, padx=(0, 6))
+        self.up_btn = ctk.CTkButton(
+            order_frame, text="▲", width=26, height=26,
+            font=("Segoe UI", 11), corner_radius=6,
+            fg_color=CLR_BTN_NEUTRAL, hover_color=CLR_BTN_NEUTRAL_H,
+            command=lambda: self._on_move(-1)
+        )
+        self.up_btn.grid(row=0, column=0, padx=1)
+        self.down_btn = ctk.CTkButton(
+            order_frame, text="▼", width=26, height=26,
+            font=("Segoe UI", 11), corner_radius=6,
+            fg_color=CLR_BTN_NEUTRAL, hover_color=CLR_BTN_NEUTRAL_H,
+            command=lambda: self._on_move(1)
+        )
+        self.down_btn.grid(row=0, column=1, padx=1)
+        self.next_btn = ctk.CTkButton(
+            order_frame, text="⏭", width=26, height=26,
+            font=("Segoe UI", 11), corner_radius=6,
+            fg_color=CLR_BTN_PRIMARY, hover_color=CLR_BTN_PRIMARY_H,
+            command=self._on_run_next
+        )
+        self.next_btn.grid(row=0, column=2, padx=1)
+
+        # Per-download speed limit, on top of the global one
+        self.limit_menu = ctk.CTkOptionMenu(
+            btn_frame, values=list(SPEED_LIMIT_CHOICES), width=96, height=26,
+            font=("Segoe UI", 10), command=self._on_limit,
+            fg_color=CLR_BTN_NEUTRAL, button_color=CLR_BTN_NEUTRAL,
+            button_hover_color=CLR_BTN_NEUTRAL_H, corner_radius=6
+        )
+        self.limit_menu.set("Unlimited")
+        self.limit_menu.grid(row=0, column=1, padx=(0, 4))
+
         self.pause_btn = ctk.CTkButton(
             btn_frame, text="⏸", width=30, height=26,
             font=("Segoe UI", 13), corner_radius=6,
             fg_color=CLR_BTN_NEUTRAL, hover_color=CLR_BTN_NEUTRAL_H,
             command=self._on_pause
         )
-        self.pause_btn.grid(row=0, column=0, padx=2)
+        self.pause_btn.grid(row=0, column=2, padx=2)
 
         self.resume_btn = ctk.CTkButton(
             btn_frame, text="▶", width=30, height=26,
@@ -378,7 +293,7 @@ class DownloadQueueItem(ctk.CTkFrame):
             fg_color=CLR_BTN_SUCCESS, hover_color=CLR_BTN_SUCCESS_H,
             command=self._on_resume
         )
-        self.resume_btn.grid(row=0, column=1, padx=2)
+        self.resume_btn.grid(row=0, column=3, padx=2)
         self.resume_btn.configure(state="disabled")
 
         self.cancel_btn = ctk.CTkButton(
@@ -387,7 +302,7 @@ class DownloadQueueItem(ctk.CTkFrame):
             fg_color=CLR_BTN_DANGER, hover_color=CLR_BTN_DANGER_H,
             command=self._on_cancel
         )
-        self.cancel_btn.grid(row=0, column=2, padx=2)
+        self.cancel_btn.grid(row=0, column=4, padx=2)
 
         # Row 1: Progress bar
         self.progress_bar = ctk.CTkProgressBar(
@@ -404,40 +319,71 @@ class DownloadQueueItem(ctk.CTkFrame):
         )
         self.status_label.grid(row=2, column=0, padx=10, pady=(0, 6), sticky="ew")
 
-    def set_downloader(self, downloader):
-        """Attach a ChunkedDownloader instance for pause/resume/cancel."""
-        self._downloader = downloader
+        # Row 3: Post-processing bar (merge / MP3), shown once the download itself is done
+        self.post_bar = ctk.CTkProgressBar(
+            self, height=4, corner_radius=2,
+            progress_color=CLR_POST_FG, fg_color=CLR_PROGRESS_BG
+        )
+        self.post_bar.set(0)
+
+    def set_task(self, task, on_reorder=None):
+        """Attach the engine task for pause/resume/cancel and reordering while queued."""
+        self._task = task
+        self._on_reorder = on_reorder
+
+    @property
+    def is_pending(self):
+        return self._task is not None and self._task.is_pending
+
+    def mark_started(self):
+        """The scheduler picked this item up: queue-order controls no longer apply."""
+        for btn in (self.up_btn, self.down_btn, self.next_btn):
+            btn.configure(state="disabled")
+        self.update_status("⏳ Downloading...")
+
+    def mark_processing(self, text):
+        """Bytes are on disk and ffmpeg is working: pausing no longer applies, the post bar takes over."""
+        self.pause_btn.configure(state="disabled")
+        self.resume_btn.configure(state="disabled")
+        self.update_progress(1.0)
+        self.post_bar.set(0)
+        self.post_bar.grid(row=3, column=0, padx=10, pady=(0, 6), sticky="ew")
+        self.update_status(text)
+
+    def _on_move(self, offset):
+        if self.is_pending and self._task.engine.scheduler.move(self._task.job, offset) and self._on_reorder:
+            self._on_reorder()
+
+    def _on_run_next(self):
+        if self.is_pending and self._task.engine.scheduler.run_next(self._task.job) and self._on_reorder:
+            self._on_reorder()
+
+    def _on_limit(self, choice):
+        if self._task:
+            self._task.set_rate_limit(SPEED_LIMIT_CHOICES.get(choice))
 
     def _on_pause(self):
         self.pause_btn.configure(state="disabled")
         self.resume_btn.configure(state="normal")
-        if self._downloader:
-            self._downloader.pause()
-        else:
-            # yt-dlp pause emulation
-            self._ytdlp_paused = True
-            self._pause_event.clear()
-            self.update_status("⏸️ Paused")
+        if self._task:
+            self._task.pause()
+        self.update_status("⏸️ Paused")
 
     def _on_resume(self):
         self.resume_btn.configure(state="disabled")
         self.pause_btn.configure(state="normal")
-        if self._downloader:
-            self._downloader.resume()
-        else:
-            self._ytdlp_paused = False
-            self._pause_event.set()
-            self.update_status("⏳ Resuming...")
+        if self._task:
+            self._task.resume()
+        self.update_status("⏳ Resuming...")
 
     def _on_cancel(self):
         self.pause_btn.configure(state="disabled")
         self.resume_btn.configure(state="disabled")
         self.cancel_btn.configure(state="disabled")
-        if self._downloader:
-            self._downloader.cancel()
-        else:
-            self._ytdlp_cancelled = True
-            self._pause_event.set()  # Unblock if paused
+        for btn in (self.up_btn, self.down_btn, self.next_btn, self.limit_menu):
+            btn.configure(state="disabled")
+        if self._task:
+            self._task.cancel()
         self.update_status("❌ Cancelled")
 
     def update_progress(self, value):
@@ -446,26 +392,46 @@ class DownloadQueueItem(ctk.CTkFrame):
         except Exception:
             pass
 
+    def apply_updates(self, **fields):
+        """Apply coalesced updates from the UI event bus, in the order they were posted."""
+        for key, value in fields.items():
+            if key == 'progress':
+                self.update_progress(value)
+            elif key == 'status':
+                self.update_status(value)
+            elif key == 'task':
+                if value.state == "processing":
+                    self.post_bar.set(value.post_progress or 0.0)
+                else:
+                    self.update_progress(value.progress)
+                self.update_status(format_task_progress(value))
+
     def update_status(self, text):
         try:
             self.status_label.configure(text=text)
         except Exception:
             pass
 
-    def mark_complete(self):
+    def mark_complete(self, note=""):
         """Disable all controls and show completed state."""
         self.pause_btn.configure(state="disabled")
         self.resume_btn.configure(state="disabled")
         self.cancel_btn.configure(state="disabled")
-        self.update_status("✅ Complete!")
+        for btn in (self.up_btn, self.down_btn, self.next_btn, self.limit_menu):
+            btn.configure(state="disabled")
+        self.update_status(f"✅ Complete!{' (' + note + ')' if note else ''}")
         self.update_progress(1.0)
+        self.post_bar.grid_remove()
 
     def mark_failed(self, msg=""):
         """Disable all controls and show failed state."""
         self.pause_btn.configure(state="disabled")
         self.resume_btn.configure(state="disabled")
         self.cancel_btn.configure(state="disabled")
-        self.update_status(f"❌ Failed{': ' + msg[:40] if msg else ''}")
+        for btn in (self.up_btn, self.down_btn, self.next_btn, self.limit_menu):
+            btn.configure(state="disabled")
+        self.update_status(f"❌ Failed{': ' + msg[:80] if msg else ''}")
+        self.post_bar.grid_remove()
 
 
 # ==============================================================================
@@ -492,21 +458,22 @@ class AuraDownloaderPro(ctk.CTk):
         self.clipboard_links = []
         self.last_clipboard = ""
         self.download_queue_widgets = []
-        self.download_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DL)
+        self.engine = DownloadEngine(self.download_dir)
+        self.ui_bus = UIEventBus()
 
         # Build UI
         self._create_layout()
+        self._restore_partial_downloads()
         self._start_clipboard_monitor()
+        self._ui_tick()
+        # Dependency check (and yt-dlp install if it's missing) once the window is up
+        self.after(2000, lambda: threading.Thread(target=ensure_dependencies, daemon=True).start())
 
     def _set_app_icon(self):
-        """Set the window icon from the logo PNG."""
+        """Set the window icon from the cached logo icon."""
         try:
-            logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aura-downloder-pro.png")
-            if os.path.exists(logo_path):
-                img = Image.open(logo_path)
-                icon_img = img.resize((64, 64), Image.LANCZOS)
-                ico_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".aura_icon.ico")
-                icon_img.save(ico_path, format='ICO', sizes=[(64, 64)])
+            ico_path = get_logo_asset(ICON_SIZE, 'ICO')
+            if ico_path:
                 self.iconbitmap(ico_path)
         except Exception:
             pass
@@ -546,12 +513,13 @@ class AuraDownloaderPro(ctk.CTk):
 
         # Logo
         try:
-            logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aura-downloder-pro.png")
-            if os.path.exists(logo_path):
+            logo_path = get_logo_asset(HEADER_LOGO_SIZE * 2, 'PNG')
+            if logo_path:
+                img = Image.open(logo_path)
                 logo_img = ctk.CTkImage(
-                    light_image=Image.open(logo_path),
-                    dark_image=Image.open(logo_path),
-                    size=(55, 55)
+                    light_image=img,
+                    dark_image=img,
+                    size=(HEADER_LOGO_SIZE, HEADER_LOGO_SIZE)
                 )
                 logo_label = ctk.CTkLabel(self.header_frame, image=logo_img, text="")
                 logo_label.grid(row=0, column=0, padx=(20, 10), pady=12)
@@ -623,6 +591,25 @@ class AuraDownloaderPro(ctk.CTk):
         )
         self.browse_btn.grid(row=0, column=2, padx=10, pady=8)
 
+        limit_label = ctk.CTkLabel(
+            self.path_frame, text="Limit:",
+            font=("Segoe UI", 12, "bold"), text_color=CLR_TEXT
+        )
+        limit_label.grid(row=0, column=3, padx=(5, 5), pady=8)
+
+        self.limit_menu = ctk.CTkOptionMenu(
+            self.path_frame, values=list(SPEED_LIMIT_CHOICES), width=110, height=32,
+            command=self._set_speed_limit,
+            fg_color=CLR_BTN_NEUTRAL, button_color=CLR_BTN_NEUTRAL,
+            button_hover_color=CLR_BTN_NEUTRAL_H, corner_radius=8
+        )
+        self.limit_menu.set("Unlimited")
+        self.limit_menu.grid(row=0, column=4, padx=(0, 10), pady=8)
+
+    def _set_speed_limit(self, choice):
+        """Apply the global speed limit to every running and future transfer."""
+        self.engine.set_speed_limit(SPEED_LIMIT_CHOICES.get(choice))
+
     def _create_qualities_section(self):
         self.qualities_frame = ctk.CTkScrollableFrame(
             self.left_frame, label_text="  Available Options (Click to Download)",
@@ -718,6 +705,7 @@ class AuraDownloaderPro(ctk.CTk):
         hint_label.grid(row=2, column=0, padx=8, pady=(0, 8))
 
         self.link_widgets = []
+        self.link_details = {}   # url -> label showing what the prefetch found
 
     def _add_link_to_notepad(self, url):
         """Add a detected URL to the clipboard notepad."""
@@ -737,7 +725,14 @@ class AuraDownloaderPro(ctk.CTk):
             link_frame, text=display_url, font=("Segoe UI", 10),
             anchor="w", text_color=CLR_TEXT
         )
-        url_label.grid(row=0, column=0, padx=8, pady=6, sticky="w")
+        url_label.grid(row=0, column=0, padx=8, pady=(6, 0), sticky="w")
+
+        detail_label = ctk.CTkLabel(
+            link_frame, text="⏳ Resolving...", font=("Segoe UI", 9),
+            anchor="w", text_color=CLR_TEXT_DIM
+        )
+        detail_label.grid(row=1, column=0, columnspan=2, padx=8, pady=(0, 4), sticky="w")
+        self.link_details[url] = detail_label
 
         btn_frame = ctk.CTkFrame(link_frame, fg_color="transparent")
         btn_frame.grid(row=0, column=1, padx=(0, 5), pady=4)
@@ -759,6 +754,28 @@ class AuraDownloaderPro(ctk.CTk):
         delete_btn.grid(row=0, column=1, padx=2)
 
         self.link_widgets.append((link_frame, url))
+        self.engine.prefetcher.resolve(url, lambda link, u=url: self.ui_bus.call(self._show_link_info, u, link))
+
+    def _show_link_info(self, url, link):
+        """Fill in a link card once the background prefetch has resolved it."""
+        label = self.link_details.get(url)
+        if label is None:
+            return
+        if link.state == "failed":
+            text = f"⚠ {link.error[:40]}"
+        else:
+            icon = {"ytdlp": "🎬", "stream": "📺"}.get(link.kind, "📄")
+            text = f"{icon} {link.title[:28]}"
+            if link.size:
+                text += f" · {link.size / (1024*1024):.1f} MB"
+            if link.kind == "ytdlp" and link.formats:
+                text += f" · up to {link.formats[0]['height']}p"
+            elif link.ranges is False:
+                text += " · no resume"
+        try:
+            label.configure(text=text)
+        except Exception:
+            pass
 
     def _paste_link(self, url):
         """Paste a link from notepad into the URL bar and auto-fetch."""
@@ -770,20 +787,34 @@ class AuraDownloaderPro(ctk.CTk):
         """Delete a single link from the notepad."""
         if url in self.clipboard_links:
             self.clipboard_links.remove(url)
+        self.link_details.pop(url, None)
         frame.destroy()
         self.link_widgets = [(f, u) for f, u in self.link_widgets if u != url]
 
+    def _restore_partial_downloads(self):
+        """Put the URLs of journaled partial downloads back in the notepad so they can be resumed."""
+        for url in find_partial_downloads(self.download_dir):
+            self._add_link_to_notepad(url)
+
     def _clear_all_links(self):
         for frame, _ in self.link_widgets:
             frame.destroy()
         self.link_widgets.clear()
+        self.link_details.clear()
         self.clipboard_links.clear()
 
     def _download_all_links(self):
         if not self.clipboard_links:
             messagebox.showinfo("No Links", "No links in the notepad to download.")
             return
-        for url in list(self.clipboard_links):
+
+        # Smallest known size first so short downloads finish early; unknown sizes go last
+        def size_order(url):
+            link = self.engine.prefetcher.get(url)
+            size = link.size if link else None
+            return (size is None, size or 0)
+
+        for url in sorted(self.clipboard_links, key=size_order):
             self._queue_smart_download(url)
 
     # ==========================================================================
@@ -817,7 +848,35 @@ class AuraDownloaderPro(ctk.CTk):
         self.status_label.configure(text=f"Status: {text}")
         if progress is not None:
             self.progress_bar.set(progress)
-        self.update_idletasks()
+
+    def apply_updates(self, **fields):
+        """Apply coalesced status-bar updates from the UI event bus, in the order they were posted."""
+        for key, value in fields.items():
+            if key == 'progress':
+                self.progress_bar.set(value)
+            elif key == 'status':
+                self.status_label.configure(text=f"Status: {value}")
+            elif key == 'task' and value.state == "processing":
+                self.update_status(f"{value.title[:40]}: {format_task_progress(value)}")
+            elif key == 'task':
+                self.update_status(f"Downloading {value.title[:40]}: {value.progress*100:.1f}% | "
+                                   f"{format_speed(value.speed)} | ETA: {format_eta(value.eta)}",
+                                   value.progress)
+
+    def _ui_tick(self):
+        """Drain the UI event bus at a fixed rate."""
+        updates, calls = self.ui_bus.drain()
+        for target, fields in updates:
+            try:
+                target.apply_updates(**fields)
+            except Exception:
+                pass
+        for func, args in calls:
+            try:
+                func(*args)
+            except Exception:
+                pass
+        self.after(UI_TICK_MS, self._ui_tick)
 
     # ==========================================================================
     #  SMART FETCH — DETECT URL TYPE & STRIP PLAYLIST
@@ -845,8 +904,13 @@ class AuraDownloaderPro(ctk.CTk):
             btn.destroy()
         self.quality_buttons.clear()
 
-        if is_direct_file_url(url):
+        link = self.engine.prefetcher.get(url)
+        if is_manifest_url(url):
+            self.after(0, self._display_stream_download, url)
+        elif is_direct_file_url(url):
             self.after(0, self._display_direct_download, url)
+        elif link and link.state == "ready" and link.kind == "direct":
+            self.after(0, self._display_generic_download, url)   # Prefetch found yt-dlp can't handle it
         else:
             threading.Thread(target=self.fetch_info, args=(url,), daemon=True).start()
 
@@ -866,7 +930,7 @@ class AuraDownloaderPro(ctk.CTk):
 
         dl_btn = ctk.CTkButton(
             self.qualities_frame,
-            text=f"  Accelerated Download (x{CHUNK_COUNT} chunks)",
+            text="  Accelerated Download (auto-tuned connections)",
             command=lambda: self._queue_direct_download(url, filename),
             height=45, font=("Segoe UI", 14, "bold"), corner_radius=8,
             fg_color=CLR_BTN_WARN, hover_color=CLR_BTN_WARN_H
@@ -884,64 +948,48 @@ class AuraDownloaderPro(ctk.CTk):
         normal_btn.grid(row=2, column=0, pady=5, padx=15, sticky="ew")
         self.quality_buttons.append(normal_btn)
 
+    def _display_stream_download(self, url):
+        """Show download options for an HLS / DASH manifest URL."""
+        filename = get_filename_from_url(url)
+        self.update_status(f"Stream manifest detected: {filename}", 0)
+        self.fetch_btn.configure(state="normal")
+
+        info_label = ctk.CTkLabel(
+            self.qualities_frame,
+            text=f"  Stream: {filename}",
+            font=("Segoe UI", 14, "bold"), text_color=CLR_ACCENT, anchor="w"
+        )
+        info_label.grid(row=0, column=0, padx=15, pady=(5, 10), sticky="w")
+        self.quality_buttons.append(info_label)
+
+        dl_btn = ctk.CTkButton(
+            self.qualities_frame,
+            text="  Stream Download (best quality, parallel segments)",
+            command=lambda: self._queue_stream_download(url, filename),
+            height=45, font=("Segoe UI", 14, "bold"), corner_radius=8,
+            fg_color=CLR_BTN_WARN, hover_color=CLR_BTN_WARN_H
+        )
+        dl_btn.grid(row=1, column=0, pady=5, padx=15, sticky="ew")
+        self.quality_buttons.append(dl_btn)
+
     # ==========================================================================
     #  YT-DLP FETCH (YouTube + 1000s of sites)
     # ==========================================================================
     def fetch_info(self, url):
-        ydl_opts_info = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': "in_playlist",
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'nocheckcertificate': True,
-            'no_playlist': True,
-            'simulate': True,
-        }
-
         try:
-            with YoutubeDL(ydl_opts_info) as ydl:
-                info = ydl.extract_info(url, download=False)
+            info = self.engine.extract_info(url)
         except Exception as e:
             error_msg = str(e)
             if "Unsupported URL" in error_msg or "No video" in error_msg:
-                self.after(0, self._display_generic_download, url)
+                self.ui_bus.call(self._display_generic_download, url)
             else:
-                self.after(0, self.fetch_failed, f"Failed to fetch: {e}")
+                self.ui_bus.call(self.fetch_failed, f"Failed to fetch: {e}")
             return
 
         self.video_info = info
         title = info.get('title', 'Unknown_Video')
-        formats = info.get('formats', [])
-
-        video_formats = []
-        for f in formats:
-            if f.get('vcodec') != 'none' and f.get('resolution') and f.get('ext') == 'mp4':
-                fmt_id = f.get('format_id')
-                resolution = f.get('resolution')
-                height = f.get('height', 0)
-                fps = f.get('fps', '')
-                filesize = f.get('filesize') or f.get('filesize_approx')
-
-                size_str = f"{filesize / (1024*1024):.2f} MB" if filesize else "Size Unknown"
-                fps_str = f"{fps}fps" if fps else ""
-
-                video_formats.append({
-                    'format_id': fmt_id,
-                    'resolution': resolution,
-                    'height': height,
-                    'fps': fps_str,
-                    'size_str': size_str,
-                    'ext': f.get('ext')
-                })
-
-        unique_res = {}
-        for f in video_formats:
-            h = f['height']
-            if h not in unique_res:
-                unique_res[h] = f
-
-        self.sorted_formats = sorted(unique_res.values(), key=lambda x: x['height'], reverse=True)
-        self.after(0, self.display_qualities, title, url)
+        self.sorted_formats = list_video_formats(info)
+        self.ui_bus.call(self.display_qualities, title, url)
 
     def _display_generic_download(self, url):
         """Fallback for unsupported sites: allow generic HTTP download."""
@@ -983,9 +1031,7 @@ class AuraDownloaderPro(ctk.CTk):
             btn = ctk.CTkButton(
                 self.qualities_frame,
                 text="  Download Best Available Video",
-                command=lambda: self._queue_ytdlp_download(
-                    url, "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best", title
-                ),
+                command=lambda: self._queue_ytdlp_download(url, YTDLP_DEFAULT_FORMAT, title),
                 height=40, font=("Segoe UI", 13, "bold"), corner_radius=8,
                 fg_color=CLR_BTN_PRIMARY, hover_color=CLR_BTN_PRIMARY_H
             )
@@ -1021,17 +1067,87 @@ class AuraDownloaderPro(ctk.CTk):
         self.download_queue_widgets.append(item)
         return item
 
+    def _track(self, queue_item):
+        """Engine listener that forwards a task's events to its queue item via the UI bus."""
+        def listener(task, event):
+            if event == "started":
+                self.ui_bus.call(queue_item.mark_started)
+            elif event == "progress":
+                self.ui_bus.post(queue_item, task=task)
+                self.ui_bus.post(self, task=task)
+            elif event == "status":
+                self.ui_bus.post(queue_item, status=task.status)
+            elif event == "processing":
+                self.ui_bus.call(queue_item.mark_processing, task.status)
+            elif event in ("complete", "failed", "cancelled"):
+                self.ui_bus.call(self._task_finished, queue_item, task)
+        return listener
+
+    def _task_finished(self, queue_item, task):
+        """Show the outcome of a finished task on its queue item and the status bar."""
+        name = os.path.basename(task.save_path) if task.save_path else task.title
+        if task.state == "complete":
+            note = f"{task.retries} retries" if task.retries else ""
+            queue_item.mark_complete(note)
+            self.update_status(f"Saved: {name[:40]}", 0)
+            show_notification("Download Complete", f"Saved: {name[:40]}")
+        elif task.state == "cancelled":
+            if task.resumable:
+                queue_item.update_status("❌ Cancelled — partial kept, queue again to resume")
+            else:
+                queue_item.update_status("❌ Cancelled")
+        elif task.resumable:
+            queue_item.mark_failed(f"{task.error or 'partial kept'} — queue again to resume")
+        else:
+            err = task.error or "Download failed"
+            queue_item.mark_failed(err)
+            if task.kind == "ytdlp":
+                extra_msg = ""
+                if "ffprobe" in err or "ffmpeg" in err:
+                    extra_msg = "\n\nNote: For MP3, install 'ffmpeg' and add it to PATH."
+                messagebox.showerror("Download Error", f"{err}{extra_msg}")
+        self._prune_queue()
+
+    def _prune_queue(self):
+        """Drop the oldest finished items beyond QUEUE_HISTORY_LIMIT so long sessions stay light."""
+        finished = [w for w in self.download_queue_widgets
+                    if w._task is not None and w._task.state in ("complete", "failed", "cancelled")]
+        stale = finished[:max(0, len(finished) - QUEUE_HISTORY_LIMIT)]
+        if not stale:
+            return
+        for widget in stale:
+            self.download_queue_widgets.remove(widget)
+            widget.destroy()
+        self._regrid_queue()
+
+    def _regrid_queue(self):
+        """Lay out the queue: started items first, then waiting items in the order they will run."""
+        order = {job: i for i, job in enumerate(self.engine.scheduler.pending())}
+        started = [w for w in self.download_queue_widgets if not w.is_pending]
+        waiting = sorted((w for w in self.download_queue_widgets if w.is_pending),
+                         key=lambda w: order.get(w._task.job, len(order)))
+        self.download_queue_widgets = started + waiting
+        for row, widget in enumerate(self.download_queue_widgets):
+            widget.grid(row=row, column=0, padx=5, pady=4, sticky="ew")
+
     def _queue_smart_download(self, url):
         url = clean_url(url)
-        if is_direct_file_url(url):
+        link = self.engine.prefetcher.get(url)
+        if link and link.state == "ready":
+            # Already resolved in the background — no probing or extraction needed here
+            if link.kind == "direct":
+                self._queue_direct_download(url, link.filename)
+            elif link.kind == "stream":
+                self._queue_stream_download(url, link.filename)
+            else:
+                self._queue_ytdlp_download(url, YTDLP_DEFAULT_FORMAT, link.title)
+        elif is_manifest_url(url):
+            self._queue_stream_download(url, get_filename_from_url(url))
+        elif is_direct_file_url(url):
             filename = get_filename_from_url(url)
             self._queue_direct_download(url, filename)
         else:
-            self._queue_ytdlp_download(
-                url,
-                "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
-                get_filename_from_url(url)
-            )
+            self._queue_ytdlp_download(url, YTDLP_DEFAULT_FORMAT, get_filename_from_url(url))
 
     def _queue_ytdlp_download(self, url, format_string, title, is_mp3=False):
         """Queue a yt-dlp download with pause/resume/cancel support."""
@@ -1039,145 +1155,26 @@ class AuraDownloaderPro(ctk.CTk):
         dl_type = "MP3" if is_mp3 else "Video"
         queue_item = self._add_queue_widget(f"[{dl_type}] {title}", url)
         show_notification(f"{dl_type} Download Queued", f"{title[:40]}...")
-
-        def _run():
-            queue_item.update_status("⏳ Downloading...")
-            save_dir = self.download_dir
-
-            ydl_opts = {
-                'format': format_string,
-                'outtmpl': os.path.join(save_dir, '%(title)s.%(ext)s'),
-                'progress_hooks': [lambda d: self._ytdlp_progress_hook(d, queue_item)],
-                'quiet': True,
-                'no_warnings': True,
-                'no_playlist': True,
-            }
-
-            if is_mp3:
-                ydl_opts['postprocessors'] = [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }]
-            else:
-                ydl_opts['merge_output_format'] = 'mp4'
-
-            try:
-                with YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-
-                if queue_item._ytdlp_cancelled:
-                    self.after(0, queue_item.update_status, "❌ Cancelled")
-                    return
-
-                self.after(0, queue_item.mark_complete)
-                self.after(0, self.update_status, f"Download complete: {title[:40]}...", 0)
-                show_notification("Download Complete", f"{title[:40]}... saved!")
-            except Exception as e:
-                if queue_item._ytdlp_cancelled:
-                    self.after(0, queue_item.update_status, "❌ Cancelled")
-                    return
-                self.after(0, queue_item.mark_failed, str(e)[:50])
-                error_str = str(e)
-                extra_msg = ""
-                if "ffprobe" in error_str or "ffmpeg" in error_str:
-                    extra_msg = "\n\nNote: For MP3, install 'ffmpeg' and add it to PATH."
-                self.after(0, lambda: messagebox.showerror("Download Error", f"{e}{extra_msg}"))
-
-        self.download_executor.submit(_run)
+        task = self.engine.submit_ytdlp(url, format_string, title, is_mp3=is_mp3,
+                                        directory=self.download_dir, listener=self._track(queue_item))
+        queue_item.set_task(task, on_reorder=self._regrid_queue)
 
     def _queue_direct_download(self, url, filename, chunked=True):
         """Queue a direct file download with pause/resume/cancel."""
         mode = "Accelerated" if chunked else "Standard"
         queue_item = self._add_queue_widget(f"[{mode}] {filename}", url)
         show_notification("Download Queued", f"{filename}")
-
-        def _run():
-            save_path = os.path.join(self.download_dir, filename)
-
-            base, ext = os.path.splitext(save_path)
-            counter = 1
-            while os.path.exists(save_path):
-                save_path = f"{base}_{counter}{ext}"
-                counter += 1
-
-            def on_progress(downloaded, total):
-                if total > 0:
-                    pct = downloaded / total
-                    mb_dl = downloaded / (1024 * 1024)
-                    mb_total = total / (1024 * 1024)
-                    speed_text = f"⏳ {mb_dl:.1f} / {mb_total:.1f} MB ({pct*100:.1f}%)"
-                    self.after(0, queue_item.update_progress, pct)
-                    self.after(0, queue_item.update_status, speed_text)
-                    self.after(0, self.update_status, f"Downloading {filename}: {pct*100:.1f}%", pct)
-
-            def on_status(text):
-                self.after(0, queue_item.update_status, text)
-
-            num_c = CHUNK_COUNT if chunked else 1
-            downloader = ChunkedDownloader(
-                url, save_path, num_chunks=num_c,
-                progress_callback=on_progress, status_callback=on_status
-            )
-            queue_item.set_downloader(downloader)
-
-            if chunked:
-                success = downloader.download()
-            else:
-                success = downloader._single_stream_download()
-
-            if success:
-                self.after(0, queue_item.mark_complete)
-                self.after(0, self.update_status, f"Saved: {os.path.basename(save_path)}", 0)
-                show_notification("Download Complete", f"Saved: {os.path.basename(save_path)}")
-            else:
-                if downloader.cancelled:
-                    self.after(0, queue_item.update_status, "❌ Cancelled")
-                    # Clean up partial file
-                    try:
-                        if os.path.exists(save_path):
-                            os.remove(save_path)
-                    except OSError:
-                        pass
-                else:
-                    self.after(0, queue_item.mark_failed, "Download failed")
-
-        self.download_executor.submit(_run)
-
-    def _ytdlp_progress_hook(self, d, queue_item):
-        """yt-dlp progress hook with pause/cancel support."""
-        # Check for cancel
-        if queue_item._ytdlp_cancelled:
-            raise Exception("Download cancelled by user")
-
-        # Check for pause — block the download thread
-        queue_item._pause_event.wait()
-
-        if queue_item._ytdlp_cancelled:
-            raise Exception("Download cancelled by user")
-
-        if d['status'] == 'downloading':
-            percent_str = d.get('_percent_str', '0.0%').replace('%', '').strip()
-            percent_str = re.sub(r'\x1b\[[0-9;]*m', '', percent_str)
-            try:
-                percent = float(percent_str) / 100.0
-            except ValueError:
-                percent = 0.0
-
-            speed = d.get('_speed_str', 'N/A')
-            eta = d.get('_eta_str', 'N/A')
-            speed = re.sub(r'\x1b\[[0-9;]*m', '', speed)
-            eta = re.sub(r'\x1b\[[0-9;]*m', '', eta)
-
-            status_text = f"⏳ {percent*100:.1f}% | {speed} | ETA: {eta}"
-            self.after(0, queue_item.update_progress, percent)
-            self.after(0, queue_item.update_status, status_text)
-            self.after(0, self.update_status,
-                       f"Downloading... {percent*100:.1f}% | {speed} | ETA: {eta}", percent)
-
-        elif d['status'] == 'finished':
-            self.after(0, queue_item.update_status, "🔄 Finalizing/Converting...")
-            self.after(0, self.update_status, "Finalizing file...", 1.0)
+        task = self.engine.submit_direct(url, filename, chunked=chunked,
+                                         directory=self.download_dir, listener=self._track(queue_item))
+        queue_item.set_task(task, on_reorder=self._regrid_queue)
+
+    def _queue_stream_download(self, url, filename):
+        """Queue an HLS / DASH stream for the native segment engine."""
+        queue_item = self._add_queue_widget(f"[Stream] {filename}", url)
+        show_notification("Stream Download Queued", f"{filename}")
+        task = self.engine.submit_stream(url, filename, directory=self.download_dir,
+                                         listener=self._track(queue_item))
+        queue_item.set_task(task, on_reorder=self._regrid_queue)
 
 
 # ==============================================================================